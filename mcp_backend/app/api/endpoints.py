@@ -4,31 +4,138 @@ import time
 import traceback
 import os
 import asyncio
+from tempfile import SpooledTemporaryFile
 from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import quote
 
 from fastapi import APIRouter, HTTPException, Body, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from loguru import logger
 
 from app.api.jsonrpc import jsonrpc, JSONRPCError, InvalidParams, router as jsonrpc_router
-from app.services.mcp_client import client_manager
+from app.services.mcp_client import ToolCancelledError, ToolTimeoutError, client_manager, paginate
 from app.services.llm_service import llm_service_manager, ProviderManager
 from app.services.session_service import session_manager, Message, SESSION_DIR
 from app.core.config import settings
 from app.models.mcp_server_config import MCPServerConfig
 from app.models.llm_provider_config import LLMProviderConfig
 from app.api.i18n import router as i18n_router
+from app.utils.progress import ProgressBroker
+from app.utils.streaming import decode_base64_to_spool, iter_file_range, parse_range
 
 router = APIRouter()
 
 # 创建ProviderManager实例
 provider_manager = ProviderManager(llm_service_manager)
 
+# 对话的流式输出通道：stream_token -> 文本增量和工具调用事件（队列较大，避免丢失文本增量）
+chat_streams = ProgressBroker(max_queue=4096)
+
 # 添加JSON-RPC路由
 router.include_router(jsonrpc_router)
 
 # 添加i18n路由
 router.include_router(i18n_router)
 
+# 按目录版本缓存的派生数据：server_id -> (catalog_version, 数据)
+_llm_tools_cache: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+_status_snapshot_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+def _format_llm_tools(server_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """将MCP工具格式化为LLM可用的function定义"""
+    llm_tools = []
+    for tool in server_tools:
+        tool_name = tool.get("name")
+        description = tool.get("description", "无描述")
+        
+        # 格式化输入模式
+        input_schema = tool.get("input_schema", {})
+        parameters = {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+        
+        if "properties" in input_schema:
+            for param_name, param_info in input_schema["properties"].items():
+                parameters["properties"][param_name] = {
+                    "type": param_info.get("type", "string"),
+                    "description": param_info.get("description", "无描述")
+                }
+        
+        if "required" in input_schema:
+            parameters["required"] = input_schema["required"]
+        
+        llm_tools.append({
+            "type": "function",
+            "function": {
+                "name": tool_name,
+                "description": description,
+                "parameters": parameters
+            }
+        })
+    return llm_tools
+
+async def get_llm_tools(server_id: str) -> List[Dict[str, Any]]:
+    """获取服务器工具的LLM格式定义，目录版本未变化时直接复用"""
+    version = client_manager.get_catalog_version(server_id)
+    cached = _llm_tools_cache.get(server_id)
+    if cached and version is not None and cached[0] == version:
+        return cached[1]
+    
+    llm_tools = _format_llm_tools(await client_manager.get_server_tools(server_id))
+    if version is not None:
+        _llm_tools_cache[server_id] = (version, llm_tools)
+    return llm_tools
+
+async def get_catalog_snapshot(server_id: str) -> Dict[str, Any]:
+    """获取服务器工具/资源的状态摘要，目录版本未变化时直接复用"""
+    version = client_manager.get_catalog_version(server_id)
+    cached = _status_snapshot_cache.get(server_id)
+    if cached and version is not None and cached[0] == version:
+        return cached[1]
+    
+    tools = await client_manager.get_server_tools(server_id)
+    resources = await client_manager.get_server_resources(server_id)
+    snapshot = {
+        "tools_count": len(tools),
+        "tools_list": [
+            {"name": tool.get("name", "未知"), "description": tool.get("description", "")}
+            for tool in tools
+        ],
+        "resources_count": len(resources),
+        "resources_list": [
+            {"name": resource.get("name", "未知"), "uri": resource.get("uri", "")}
+            for resource in resources
+        ]
+    }
+    if version is not None:
+        _status_snapshot_cache[server_id] = (version, snapshot)
+    return snapshot
+
+def _blob_href(server_id: str, resource_uri: str, index: int) -> str:
+    """大二进制内容块的流式下载地址"""
+    return (
+        f"{settings.API_V1_STR}/resources/{quote(server_id, safe='')}/blob"
+        f"?uri={quote(resource_uri, safe='')}&index={index}"
+    )
+
+def _inline_resource_contents(server_id: str, resource_uri: str, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """超过内联上限的blob内容块替换为下载链接，避免在JSON-RPC响应中传输大段base64"""
+    result = []
+    for index, part in enumerate(contents):
+        blob = part.get("blob")
+        if blob is not None and len(blob) > settings.MCP_RESOURCE_INLINE_BLOB_MAX_BYTES:
+            part = {
+                "uri": part.get("uri"),
+                "mimeType": part.get("mimeType"),
+                "size": len(blob) * 3 // 4 - blob[-2:].count("="),
+                "href": _blob_href(server_id, resource_uri, index)
+            }
+        result.append(part)
+    return result
+
 # JSON-RPC接口
 @router.post("/jsonrpc")
 async def handle_jsonrpc(request_data: Dict[str, Any] = Body(...)):
@@ -36,6 +143,100 @@ async def handle_jsonrpc(request_data: Dict[str, Any] = Body(...)):
     response = await jsonrpc.handle_request(request_data)
     return response
 
+# 资源内容块的流式下载，支持Range请求
+@router.get("/resources/{server_id}/blob")
+async def stream_resource_blob(server_id: str, uri: str, request: Request, index: int = 0):
+    """以二进制流返回资源的一个内容块
+
+    base64只解码一次，写入超过内存上限后落盘的临时文件，再按块发送；支持单区间Range请求。
+    """
+    try:
+        contents = await client_manager.read_resource_contents(server_id, uri)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"读取资源失败: {server_id} {uri}, 错误: {str(e)}")
+        raise HTTPException(status_code=502, detail=str(e))
+    
+    if index < 0 or index >= len(contents):
+        raise HTTPException(status_code=404, detail=f"资源内容块不存在: {index}")
+    part = contents[index]
+    
+    if "blob" in part:
+        try:
+            spool = await run_in_threadpool(
+                decode_base64_to_spool, part["blob"], settings.MCP_RESOURCE_SPOOL_MAX_MEMORY
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+    else:
+        spool = SpooledTemporaryFile(max_size=settings.MCP_RESOURCE_SPOOL_MAX_MEMORY)
+        spool.write(part.get("text", "").encode("utf-8"))
+    size = spool.tell()
+    
+    headers = {"Accept-Ranges": "bytes"}
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        spool.close()
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    
+    return StreamingResponse(
+        iter_file_range(spool, start, end),
+        status_code=status_code,
+        media_type=part.get("mimeType") or "application/octet-stream",
+        headers=headers
+    )
+
+# 工具调用进度的SSE订阅
+@router.get("/tools/progress/{progress_token}")
+async def stream_tool_progress(progress_token: str):
+    """以 text/event-stream 推送带该进度令牌的工具调用的进度事件
+
+    可以在发起 mcp.call_tool 之前订阅；调用结束后推送 completed / failed / timeout / cancelled 事件并关闭流。
+    """
+    async def events():
+        async for event in client_manager.progress.subscribe(progress_token, keepalive=15.0):
+            if event is None:
+                # 保活注释，防止代理关闭空闲连接
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# 对话流式输出的SSE订阅
+@router.get("/chat/stream/{stream_token}")
+async def stream_chat(stream_token: str):
+    """以 text/event-stream 推送带该令牌的 chat.chat_with_tools 调用的输出
+
+    需要在发起对话之前订阅。content 事件携带文本增量，tool 事件表示开始执行工具，
+    对话结束后推送 completed / failed 事件并关闭流；JSON-RPC 响应仍返回完整结果。
+    """
+    async def events():
+        async for event in chat_streams.subscribe(stream_token, keepalive=15.0):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 注册JSON-RPC方法
 async def register_jsonrpc_methods():
     """注册所有JSON-RPC方法"""
@@ -306,8 +507,8 @@ async def register_jsonrpc_methods():
             
             logger.info(f"正在连接到MCP服务器: {server_id} ({server_config.name})")
             
-            # 对于 SSE 连接，使用异步任务并立即返回，避免阻塞前端
-            if server_config.type == "sse":
+            # 对于远程（SSE / Streamable HTTP）连接，使用异步任务并立即返回，避免阻塞前端
+            if server_config.is_remote:
                 # 检查服务器是否已经在连接中
                 if getattr(connect_to_server, f"connecting_{server_id}", False):
                     return {"success": True, "message": "连接中", "status": "connecting"}
@@ -375,9 +576,36 @@ async def register_jsonrpc_methods():
         return {"servers": connected_servers}
     jsonrpc.register_method("mcp.get_connected_servers", get_connected_servers)
     
+    # 获取启动自动连接进度
+    async def get_readiness():
+        """获取启动时各MCP服务器的自动连接进度"""
+        return client_manager.get_readiness()
+    jsonrpc.register_method("mcp.get_readiness", get_readiness)
+    
     # 获取所有MCP服务器状态及工具信息
-    async def get_mcp_servers_with_tools():
-        """获取所有MCP服务器的状态、工具和资源信息"""
+    async def get_mcp_servers_with_tools(include_schema: bool = False, limit: Optional[int] = None):
+        """获取所有MCP服务器的状态、工具和资源信息
+        
+        默认只返回工具的名称和描述，include_schema为True时附带input_schema；
+        指定limit时每个服务器只返回前limit个工具和资源，其余通过 mcp.list_tools / mcp.list_resources 分页获取。
+        """
+        def first_page(items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+            return paginate(items, None, limit) if limit else (items, None)
+        
+        def fill_tools(server_info: Dict[str, Any], tools: List[Dict[str, Any]]) -> None:
+            page, next_cursor = first_page(tools)
+            if not include_schema:
+                page = [{"name": tool.get("name"), "description": tool.get("description")} for tool in page]
+            server_info["tools"] = page
+            server_info["tools_count"] = len(tools)
+            server_info["tools_next_cursor"] = next_cursor
+        
+        def fill_resources(server_info: Dict[str, Any], resources: List[Dict[str, Any]]) -> None:
+            page, next_cursor = first_page(resources)
+            server_info["resources"] = page
+            server_info["resources_count"] = len(resources)
+            server_info["resources_next_cursor"] = next_cursor
+        
         try:
             # 从配置中获取所有服务器
             all_servers = settings.mcp_servers
@@ -401,8 +629,20 @@ async def register_jsonrpc_methods():
                     "prompts_list": []  # Prompt列表
                 }
                 
-                # 检查是否正在连接中（对于SSE连接）
-                if server_config.type == "sse" and getattr(connect_to_server, f"connecting_{server_id}", False):
+                # 休眠的服务器直接返回缓存的目录，不为查询状态唤醒进程
+                if client_manager.is_server_hibernating(server_id):
+                    server_info["status"] = "hibernated"
+                    fill_tools(server_info, await client_manager.get_server_tools(server_id))
+                    fill_resources(server_info, await client_manager.get_server_resources(server_id))
+                    prompts = await client_manager.get_server_prompts(server_id)
+                    server_info["prompts_count"] = len(prompts)
+                    server_info["prompts_list"] = prompts
+                    result["servers"].append(server_info)
+                    continue
+                
+                # 检查是否正在连接中（远程服务器异步连接或启动自动连接）
+                if (server_config.is_remote and getattr(connect_to_server, f"connecting_{server_id}", False)) \
+                        or client_manager.is_server_connecting(server_id):
                     server_info["status"] = "connecting"
                     result["servers"].append(server_info)
                     continue
@@ -410,20 +650,19 @@ async def register_jsonrpc_methods():
                 # 检查是否已连接
                 if client_manager.is_server_connected(server_id):
                     server_info["status"] = "online"
+                    server_info["health"] = client_manager.get_server_health_state(server_id)
                     
                     # 获取工具列表
                     try:
                         tools = await client_manager.get_server_tools(server_id)
-                        server_info["tools"] = tools
-                        server_info["tools_count"] = len(tools)
+                        fill_tools(server_info, tools)
                     except Exception as e:
                         logger.error(f"获取服务器 {server_id} 工具列表失败: {e}")
                         
                     # 获取资源列表
                     try:
                         resources = await client_manager.get_server_resources(server_id)
-                        server_info["resources"] = resources
-                        server_info["resources_count"] = len(resources)
+                        fill_resources(server_info, resources)
                         logger.info(f"服务器 {server_id} 资源数量: {len(resources)}")
                     except Exception as e:
                         logger.error(f"获取服务器 {server_id} 资源列表失败: {e}")
@@ -439,27 +678,26 @@ async def register_jsonrpc_methods():
                     except Exception as e:
                         logger.error(f"获取服务器 {server_id} Prompts列表失败: {e}")
                 else:
-                    # 尝试连接服务器（仅对非SSE连接尝试）
-                    if server_config.type != "sse":
+                    # 尝试连接服务器（仅对非远程连接尝试）
+                    if not server_config.is_remote:
                         try:
                             logger.info(f"尝试连接服务器: {server_id}")
                             connected = await client_manager.connect_to_server(server_id, server_config.dict())
                             if connected:
                                 server_info["status"] = "online"
+                                server_info["health"] = client_manager.get_server_health_state(server_id)
                                 
                                 # 获取工具列表
                                 try:
                                     tools = await client_manager.get_server_tools(server_id)
-                                    server_info["tools"] = tools
-                                    server_info["tools_count"] = len(tools)
+                                    fill_tools(server_info, tools)
                                 except Exception as e:
                                     logger.error(f"获取服务器 {server_id} 工具列表失败: {e}")
                                     
                                 # 获取资源列表
                                 try:
                                     resources = await client_manager.get_server_resources(server_id)
-                                    server_info["resources"] = resources
-                                    server_info["resources_count"] = len(resources)
+                                    fill_resources(server_info, resources)
                                 except Exception as e:
                                     logger.error(f"获取服务器 {server_id} 资源列表失败: {e}")
                         except Exception as e:
@@ -507,30 +745,13 @@ async def register_jsonrpc_methods():
                 # 检查是否已连接
                 if client_manager.is_server_connected(server_id):
                     status_info["status"] = "online"
+                    status_info["health"] = client_manager.get_server_health_state(server_id)
                     
-                    # 获取工具列表
+                    # 获取工具和资源列表（按目录版本缓存）
                     try:
-                        tools = await client_manager.get_server_tools(server_id)
-                        status_info["tools_count"] = len(tools)
-                        # 添加工具名称列表
-                        status_info["tools_list"] = [
-                            {"name": tool.get("name", "未知"), "description": tool.get("description", "")}
-                            for tool in tools
-                        ]
+                        status_info.update(await get_catalog_snapshot(server_id))
                     except Exception as e:
-                        logger.error(f"获取服务器 {server_id} 工具列表失败: {e}")
-                        
-                    # 获取资源列表
-                    try:
-                        resources = await client_manager.get_server_resources(server_id)
-                        status_info["resources_count"] = len(resources)
-                        # 添加资源名称列表
-                        status_info["resources_list"] = [
-                            {"name": resource.get("name", "未知"), "uri": resource.get("uri", "")}
-                            for resource in resources
-                        ]
-                    except Exception as e:
-                        logger.error(f"获取服务器 {server_id} 资源列表失败: {e}")
+                        logger.error(f"获取服务器 {server_id} 工具和资源列表失败: {e}")
                     
                     # 获取Prompts列表
                     try:
@@ -540,6 +761,18 @@ async def register_jsonrpc_methods():
                         status_info["prompts_list"] = prompts_response
                     except Exception as e:
                         logger.error(f"获取服务器 {server_id} Prompts列表失败: {e}")
+                elif client_manager.is_server_connecting(server_id):
+                    status_info["status"] = "connecting"
+                elif client_manager.is_server_hibernating(server_id):
+                    # 休眠的服务器直接返回缓存的目录，不为查询状态唤醒进程
+                    status_info["status"] = "hibernated"
+                    try:
+                        status_info.update(await get_catalog_snapshot(server_id))
+                        prompts = await client_manager.get_server_prompts(server_id)
+                        status_info["prompts_count"] = len(prompts)
+                        status_info["prompts_list"] = prompts
+                    except Exception as e:
+                        logger.error(f"获取服务器 {server_id} 缓存目录失败: {e}")
                 else:
                     # 尝试连接服务器
                     try:
@@ -547,30 +780,13 @@ async def register_jsonrpc_methods():
                         connected = await client_manager.connect_to_server(server_id, server_config.dict())
                         if connected:
                             status_info["status"] = "online"
+                            status_info["health"] = client_manager.get_server_health_state(server_id)
                             
-                            # 获取工具列表
+                            # 获取工具和资源列表（按目录版本缓存）
                             try:
-                                tools = await client_manager.get_server_tools(server_id)
-                                status_info["tools_count"] = len(tools)
-                                # 添加工具名称列表
-                                status_info["tools_list"] = [
-                                    {"name": tool.get("name", "未知"), "description": tool.get("description", "")}
-                                    for tool in tools
-                                ]
+                                status_info.update(await get_catalog_snapshot(server_id))
                             except Exception as e:
-                                logger.error(f"获取服务器 {server_id} 工具列表失败: {e}")
-                                
-                            # 获取资源列表
-                            try:
-                                resources = await client_manager.get_server_resources(server_id)
-                                status_info["resources_count"] = len(resources)
-                                # 添加资源名称列表
-                                status_info["resources_list"] = [
-                                    {"name": resource.get("name", "未知"), "uri": resource.get("uri", "")}
-                                    for resource in resources
-                                ]
-                            except Exception as e:
-                                logger.error(f"获取服务器 {server_id} 资源列表失败: {e}")
+                                logger.error(f"获取服务器 {server_id} 工具和资源列表失败: {e}")
                     except Exception as e:
                         logger.error(f"连接服务器 {server_id} 失败: {e}")
                 
@@ -597,26 +813,118 @@ async def register_jsonrpc_methods():
         return tools
     jsonrpc.register_method("mcp.list_tools", list_tools)
     
-    # 调用工具
-    async def call_tool(server_id: str, tool_name: str, arguments: Dict[str, Any]):
-        result = await client_manager.call_tool(server_id, tool_name, arguments)
-        return result
+    # 调用工具，timeout（秒）覆盖配置的默认时限；
+    # 附带progress_token时可通过 /tools/progress/{progress_token} 订阅进度，并用 mcp.cancel_tool_call 取消
+    async def call_tool(server_id: str, tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = None,
+                        progress_token: Optional[str] = None):
+        try:
+            result = await client_manager.execute_tool(
+                server_id, tool_name, arguments, timeout=timeout, progress_token=progress_token
+            )
+            return result.to_dict()
+        except ToolTimeoutError as e:
+            raise JSONRPCError(408, str(e))
+        except ToolCancelledError as e:
+            raise JSONRPCError(409, str(e))
     jsonrpc.register_method("mcp.call_tool", call_tool)
     
+    # 取消带进度令牌的进行中工具调用
+    async def cancel_tool_call(progress_token: str):
+        cancelled = client_manager.cancel_tool_call(progress_token)
+        return {"success": cancelled}
+    jsonrpc.register_method("mcp.cancel_tool_call", cancel_tool_call)
+    
+    # 批量并发执行工具调用，结果按输入顺序返回
+    async def call_tools_batch(calls: List[Dict[str, Any]], timeout: Optional[float] = None,
+                               progress_token: Optional[str] = None):
+        if not isinstance(calls, list):
+            raise InvalidParams("calls 必须是列表")
+        
+        # 每个未连接的服务器只连接一次，连接失败的服务器上的调用在结果中记为错误
+        for server_id in dict.fromkeys(item.get("server_id") for item in calls if isinstance(item, dict)):
+            if not server_id or server_id in client_manager.list_servers():
+                continue
+            server_config = next((s for s in settings.mcp_servers if s.id == server_id), None)
+            if not server_config:
+                continue
+            logger.info(f"批量调用: 服务器 {server_id} 未连接，尝试连接...")
+            if not await client_manager.connect_to_server(server_id, server_config.dict()):
+                logger.error(f"批量调用: 无法连接到服务器 {server_id}")
+        
+        start_time = time.time()
+        try:
+            results = await client_manager.execute_tools_batch(
+                [item if isinstance(item, dict) else {} for item in calls],
+                timeout=timeout,
+                progress_token=progress_token
+            )
+        except ToolCancelledError as e:
+            raise JSONRPCError(409, str(e))
+        except ValueError as e:
+            raise InvalidParams(str(e))
+        
+        succeeded = sum(1 for item in results if item["success"])
+        return {
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "execution_time": time.time() - start_time
+        }
+    jsonrpc.register_method("mcp.call_tools_batch", call_tools_batch)
+    
+    # 清除工具结果缓存
+    async def purge_tool_cache(server_id: Optional[str] = None, tool_name: Optional[str] = None):
+        purged = client_manager.purge_tool_cache(server_id, tool_name)
+        logger.info(f"已清除工具结果缓存: server={server_id}, tool={tool_name}, 条目数={purged}")
+        return {"success": True, "purged": purged}
+    jsonrpc.register_method("mcp.purge_tool_cache", purge_tool_cache)
+    
+    # 获取工具结果缓存统计
+    async def get_tool_cache_stats():
+        return client_manager.get_tool_cache_stats()
+    jsonrpc.register_method("mcp.get_tool_cache_stats", get_tool_cache_stats)
+    
+    # 获取服务器的健康状态与心跳延迟直方图
+    async def get_server_health(server_id: Optional[str] = None):
+        return client_manager.get_server_health(server_id)
+    jsonrpc.register_method("mcp.get_server_health", get_server_health)
+    
+    # 获取服务器的并发与排队统计
+    async def get_server_load(server_id: Optional[str] = None):
+        return client_manager.get_server_load(server_id)
+    jsonrpc.register_method("mcp.get_server_load", get_server_load)
+    
     # ---- 资源相关方法 ----
     
     # 获取服务器提供的资源列表
-    async def list_resources(server_id: str):
+    async def list_resources(server_id: str, cursor: Optional[str] = None, limit: Optional[int] = None):
+        # 指定了分页参数时只返回一页
+        if cursor is not None or limit is not None:
+            try:
+                return await client_manager.list_resources_page(server_id, cursor, limit)
+            except ValueError as e:
+                raise InvalidParams(str(e))
         resources = await client_manager.list_resources(server_id)
         return resources
     jsonrpc.register_method("mcp.list_resources", list_resources)
     
     # 读取资源
     async def read_resource(server_id: str, resource_uri: str):
-        content, mime_type = await client_manager.read_resource(server_id, resource_uri)
-        return {"content": content, "mimeType": mime_type}
+        contents = await client_manager.read_resource_contents(server_id, resource_uri)
+        contents = _inline_resource_contents(server_id, resource_uri, contents)
+        first = contents[0] if contents else {}
+        return {
+            "content": first.get("text", first.get("blob", "")),
+            "mimeType": first.get("mimeType", "text/plain"),
+            "contents": contents
+        }
     jsonrpc.register_method("mcp.read_resource", read_resource)
     
+    # 获取资源内容缓存统计
+    async def get_resource_cache_stats():
+        return client_manager.get_resource_cache_stats()
+    jsonrpc.register_method("mcp.get_resource_cache_stats", get_resource_cache_stats)
+    
     # ---- 提示模板相关方法 ----
     
     # 获取服务器提供的提示模板列表
@@ -626,8 +934,8 @@ async def register_jsonrpc_methods():
     jsonrpc.register_method("mcp.list_prompts", list_prompts)
     
     # 获取提示模板
-    async def get_prompt(server_id: str, prompt_name: str, arguments: Dict[str, Any]):
-        result = await client_manager.get_prompt(server_id, prompt_name, arguments)
+    async def get_prompt(server_id: str, prompt_name: str, arguments: Optional[Dict[str, Any]] = None):
+        result = await client_manager.get_prompt(server_id, prompt_name, arguments or {})
         return result
     jsonrpc.register_method("mcp.get_prompt", get_prompt)
     
@@ -638,6 +946,23 @@ async def register_jsonrpc_methods():
         return [provider.dict() for provider in settings.llm_providers]
     jsonrpc.register_method("llm.get_providers", get_llm_providers)
     
+    # 获取模型组配置及各成员的观测延迟
+    async def get_llm_model_groups():
+        groups = []
+        for group in llm_service_manager.model_groups.values():
+            data = group.dict()
+            for member in data["members"]:
+                histogram = llm_service_manager.latency.get((member["provider"], member["model"]))
+                member["latency"] = histogram.snapshot() if histogram else None
+            groups.append(data)
+        return groups
+    jsonrpc.register_method("llm.get_model_groups", get_llm_model_groups)
+    
+    # 获取各供应商/模型的速率限制额度与排队等待统计
+    async def get_llm_rate_limit_stats():
+        return llm_service_manager.get_rate_limit_stats()
+    jsonrpc.register_method("llm.get_rate_limit_stats", get_llm_rate_limit_stats)
+    
     # 创建LLM供应商
     async def create_llm_provider(provider_data: Dict[str, Any]):
         try:
@@ -654,8 +979,7 @@ async def register_jsonrpc_methods():
             providers_data.append(new_provider.dict())
             
             # 保存到配置文件
-            with open(settings.LLM_CONFIG_PATH, "w") as f:
-                json.dump(providers_data, f, indent=2)
+            settings.save_llm_providers(providers_data)
             
             # 添加到LLM服务管理器
             llm_service_manager.add_provider(new_provider)
@@ -719,8 +1043,7 @@ async def register_jsonrpc_methods():
             providers_data[provider_index] = updated_provider.dict()
             
             # 保存到配置文件
-            with open(settings.LLM_CONFIG_PATH, "w") as f:
-                json.dump(providers_data, f, indent=2)
+            settings.save_llm_providers(providers_data)
             
             # 更新LLM服务管理器
             llm_service_manager.remove_provider(provider_name)
@@ -750,8 +1073,7 @@ async def register_jsonrpc_methods():
             del providers_data[provider_index]
             
             # 保存到配置文件
-            with open(settings.LLM_CONFIG_PATH, "w") as f:
-                json.dump(providers_data, f, indent=2)
+            settings.save_llm_providers(providers_data)
             
             # 从LLM服务管理器中移除
             llm_service_manager.remove_provider(provider_name)
@@ -1106,7 +1428,8 @@ async def register_jsonrpc_methods():
         user_message: str,
         provider_name: str,
         model: str,
-        server_id: Optional[str] = None
+        server_id: Optional[str] = None,
+        stream_token: Optional[str] = None
     ) -> Dict[str, Any]:
         """使用工具进行对话
         
@@ -1116,10 +1439,65 @@ async def register_jsonrpc_methods():
             provider_name: LLM供应商名称
             model: 模型名称
             server_id: MCP服务器ID（可选）
+            stream_token: 流式输出令牌（可选），指定时LLM以流式调用，输出通过 /chat/stream/{stream_token} 推送
             
         Returns:
             Dict[str, Any]: 对话响应
         """
+        if not stream_token:
+            return await run_chat_with_tools(session_id, user_message, provider_name, model, server_id)
+        
+        try:
+            chat_streams.begin(stream_token)
+        except ValueError as e:
+            raise InvalidParams(str(e))
+        try:
+            result = await run_chat_with_tools(session_id, user_message, provider_name, model, server_id,
+                                               stream_token=stream_token)
+        except BaseException as e:
+            chat_streams.end(stream_token, {"type": "failed", "error": str(e)})
+            raise
+        chat_streams.end(stream_token, {"type": "completed", "content": result.get("content", "")})
+        return result
+    
+    async def complete_chat(
+        provider_name: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        stream_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """调用LLM；指定了stream_token时以流式调用，并把文本增量推送给订阅者"""
+        if not stream_token:
+            return await provider_manager.chat_with_tools(
+                provider_name=provider_name,
+                model=model,
+                messages=messages,
+                tools=tools
+            )
+        
+        result: Dict[str, Any] = {"error": "LLM流式响应意外结束"}
+        async for event in provider_manager.stream_chat_with_tools(
+            provider_name=provider_name,
+            model=model,
+            messages=messages,
+            tools=tools
+        ):
+            if event["type"] == "done":
+                result = event["result"]
+            else:
+                chat_streams.publish(stream_token, event)
+        return result
+    
+    async def run_chat_with_tools(
+        session_id: str,
+        user_message: str,
+        provider_name: str,
+        model: str,
+        server_id: Optional[str] = None,
+        stream_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """chat.chat_with_tools 的实现：调用LLM、执行工具调用并总结结果"""
         start_time = time.time()
         logger.info(f"开始对话: session_id={session_id}, provider={provider_name}, model={model}")
         try:
@@ -1157,8 +1535,10 @@ async def register_jsonrpc_methods():
             mcp_tools = []
             if server_id:
                 try:
-                    # 确保服务器已连接
-                    if not client_manager.is_server_connected(server_id):
+                    # 确保服务器已连接（已有目录的休眠服务器使用缓存的目录，调用工具时再唤醒）
+                    if not client_manager.is_server_connected(server_id) and not (
+                            client_manager.is_server_hibernating(server_id) and
+                            client_manager.has_cached_tools(server_id)):
                         server_config = next((s for s in settings.mcp_servers if s.id == server_id), None)
                         if not server_config:
                             raise InvalidParams(f"找不到服务器配置: {server_id}")
@@ -1167,40 +1547,8 @@ async def register_jsonrpc_methods():
                         if not connected:
                             raise RuntimeError(f"无法连接到服务器: {server_id}")
                     
-                    # 获取工具列表
-                    server_tools = await client_manager.get_server_tools(server_id)
-                    
-                    # 格式化为LLM可用的工具格式
-                    for tool in server_tools:
-                        tool_name = tool.get("name")
-                        description = tool.get("description", "无描述")
-                        
-                        # 格式化输入模式
-                        input_schema = tool.get("input_schema", {})
-                        parameters = {
-                            "type": "object",
-                            "properties": {},
-                            "required": []
-                        }
-                        
-                        if "properties" in input_schema:
-                            for param_name, param_info in input_schema["properties"].items():
-                                parameters["properties"][param_name] = {
-                                    "type": param_info.get("type", "string"),
-                                    "description": param_info.get("description", "无描述")
-                                }
-                        
-                        if "required" in input_schema:
-                            parameters["required"] = input_schema["required"]
-                        
-                        mcp_tools.append({
-                            "type": "function",
-                            "function": {
-                                "name": tool_name,
-                                "description": description,
-                                "parameters": parameters
-                            }
-                        })
+                    # 获取LLM格式的工具定义（按目录版本缓存）
+                    mcp_tools = await get_llm_tools(server_id)
                     
                     logger.info(f"获取到 {len(mcp_tools)} 个MCP工具")
                 except Exception as e:
@@ -1211,31 +1559,39 @@ async def register_jsonrpc_methods():
             try:
                 if mcp_tools:
                     logger.info(f"使用MCP工具进行对话: {len(mcp_tools)}个工具")
-                    response = await provider_manager.chat_with_tools(
+                    response = await complete_chat(
                         provider_name=provider_name,
                         model=model,
                         messages=messages,
-                        tools=mcp_tools
+                        tools=mcp_tools,
+                        stream_token=stream_token
                     )
                 else:
                     logger.info("直接使用LLM进行聊天 (无MCP工具)")
-                    response = await provider_manager.chat_with_tools(
+                    response = await complete_chat(
                         provider_name=provider_name,
                         model=model,
-                        messages=messages
+                        messages=messages,
+                        stream_token=stream_token
                     )
                     
                 if "error" in response:
                     error_msg = response["error"]
+                    # 供应商错误分类见 llm_service.classify_status / classify_exception
+                    error_type = response.get("error_type")
                     # 检查是否是缺少name字段的错误
                     if "'name'" in error_msg:
                         error_msg = "大模型响应格式错误：工具调用缺少必要字段。请重试或联系管理员。"
                     # 检查是否是其他常见错误并提供友好的错误消息
-                    elif "rate limit" in error_msg.lower():
+                    elif error_type == "circuit_open":
+                        error_msg = "服务暂不可用：LLM供应商连续出错，已暂停请求，请稍后再试。"
+                    elif error_type == "rate_limit" or "rate limit" in error_msg.lower():
                         error_msg = "请求频率超限：服务商限制了请求频率，请稍后再试。"
-                    elif "unauthorized" in error_msg.lower() or "auth" in error_msg.lower():
+                    elif error_type in ("overloaded", "server_error"):
+                        error_msg = "服务繁忙：服务商暂时无法处理请求，已自动重试，请稍后再试。"
+                    elif error_type == "auth" or "unauthorized" in error_msg.lower() or "auth" in error_msg.lower():
                         error_msg = "授权验证失败：API密钥可能无效或已过期，请检查配置。"
-                    elif "timeout" in error_msg.lower():
+                    elif error_type == "timeout" or "timeout" in error_msg.lower():
                         error_msg = "请求超时：服务响应时间过长，请稍后再试。"
                         
                     logger.error(f"LLM调用失败: {error_msg}")
@@ -1255,42 +1611,14 @@ async def register_jsonrpc_methods():
                             # 验证工具和参数
                             logger.info(f"验证MCP工具: {tool_name}")
                             
-                            # 查找工具所属的服务器
-                            tool_servers = []
-                            for srv in settings.mcp_servers:
-                                if client_manager.is_server_connected(srv.id):
-                                    try:
-                                        srv_tools = await client_manager.get_server_tools(srv.id)
-                                        if any(t["name"] == tool_name for t in srv_tools):
-                                            tool_servers.append(srv.id)
-                                    except Exception as srv_err:
-                                        logger.warning(f"无法从服务器 {srv.id} 获取工具: {str(srv_err)}")
-                            
-                            # 如果找到多个服务器有相同工具，优先使用指定的服务器
-                            target_server_id = server_id
-                            if not target_server_id and tool_servers:
-                                target_server_id = tool_servers[0]
-                                logger.info(f"自动选择服务器: {target_server_id} 用于工具 {tool_name}")
-                            
-                            if not target_server_id:
-                                # 尝试连接所有配置的服务器
-                                logger.info("尝试连接所有配置的服务器以查找工具...")
-                                for srv in settings.mcp_servers:
-                                    if not client_manager.is_server_connected(srv.id):
-                                        try:
-                                            connected = await client_manager.connect_to_server(srv.id, srv.dict())
-                                            if connected:
-                                                srv_tools = await client_manager.get_server_tools(srv.id)
-                                                if any(t["name"] == tool_name for t in srv_tools):
-                                                    target_server_id = srv.id
-                                                    logger.info(f"新连接的服务器 {srv.id} 包含工具 {tool_name}")
-                                                    break
-                                        except Exception as conn_err:
-                                            logger.warning(f"连接服务器 {srv.id} 失败: {str(conn_err)}")
-                            
-                            if not target_server_id:
-                                # 工具不存在，记录错误并继续处理
-                                error_msg = f"找不到包含工具 {tool_name} 的服务器"
+                            # 通过全局路由索引查找工具所属的服务器，优先使用指定的服务器
+                            try:
+                                target_server_id, tool_name = client_manager.resolve_tool(
+                                    tool_name, preferred_server=server_id
+                                )
+                            except ValueError as route_error:
+                                # 工具不存在或存在歧义，记录错误并继续处理
+                                error_msg = str(route_error)
                                 logger.error(f"[工具调用错误] {error_msg}")
                                 
                                 # 记录错误结果
@@ -1328,41 +1656,33 @@ async def register_jsonrpc_methods():
                             )
                             
                             # 执行工具调用
+                            if stream_token:
+                                chat_streams.publish(stream_token, {"type": "tool", "tool": tool_name})
                             try:
                                 tool_result = await client_manager.execute_tool(
                                     target_server_id,
                                     tool_name,
-                                    tool_args
+                                    tool_args,
+                                    caller=session_id
                                 )
                                 
                                 logger.info(f"工具 {tool_name} 执行成功!")
+                                logger.info(f"结果预览: {tool_result.preview(300)}")
                                 
-                                # 预处理工具结果，确保可以序列化
-                                try:
-                                    # 尝试JSON序列化，检查是否可以序列化
-                                    json.dumps(tool_result)
-                                    result_preview = json.dumps(tool_result, ensure_ascii=False)[:300]
-                                    logger.info(f"结果预览: {result_preview}...")
-                                except (TypeError, json.JSONDecodeError) as e:
-                                    logger.warning(f"工具结果无法序列化为JSON: {str(e)}")
-                                    # 如果不能序列化，转换为字符串
-                                    tool_result = str(tool_result)
-                                    logger.info(f"转换为字符串结果: {tool_result[:300]}...")
-                                
-                                # 记录工具结果
+                                # 会话和LLM使用文本形式，非文本内容块以占位说明代替
                                 await session_manager.add_message(
                                     session_id=session_id,
                                     role="tool",
                                     content={
                                         "name": tool_name,
-                                        "result": tool_result
+                                        "result": tool_result.text
                                     }
                                 )
                                 
                                 results.append({
                                     "tool": tool_name,
                                     "success": True,
-                                    "result": tool_result
+                                    "result": tool_result.text
                                 })
                             except Exception as exec_error:
                                 error_msg = f"工具执行失败: {str(exec_error)}"
@@ -1408,10 +1728,11 @@ async def register_jsonrpc_methods():
                     updated_messages = await session_manager.get_messages(session_id)
                     
                     logger.info("总结工具执行结果...")
-                    summary = await provider_manager.chat_with_tools(
+                    summary = await complete_chat(
                         provider_name=provider_name,
                         model=model,
-                        messages=updated_messages
+                        messages=updated_messages,
+                        stream_token=stream_token
                     )
                     
                     if "error" in summary:
@@ -1572,13 +1893,16 @@ async def register_jsonrpc_methods():
                 raise JSONRPCError(500, "未知错误：无法获取或创建会话")
 
     @jsonrpc.method("mcp.direct_tool_call")
-    async def direct_tool_call(server_id: str = None, tool_name: str = None, arguments: Dict[str, Any] = None):
+    async def direct_tool_call(server_id: str = None, tool_name: str = None, arguments: Dict[str, Any] = None,
+                               timeout: Optional[float] = None, progress_token: Optional[str] = None):
         """直接调用MCP工具
         
         Args:
             server_id: MCP服务器ID
             tool_name: 工具名称
             arguments: 工具参数
+            timeout: 调用时限（秒），覆盖配置的默认时限，0表示不限制
+            progress_token: 进度令牌，用于订阅进度和取消调用（可选）
             
         Returns:
             Dict: 工具执行结果
@@ -1613,9 +1937,8 @@ async def register_jsonrpc_methods():
                     
                 logger.info(f"已成功连接到服务器: {server_id}")
             
-            # 获取工具列表
-            tools = await client_manager.get_server_tools(server_id)
-            tool = next((t for t in tools if t["name"] == tool_name), None)
+            # 从工具缓存中查找工具
+            tool = client_manager.get_tool(server_id, tool_name)
             
             if not tool:
                 logger.error(f"工具 {tool_name} 不存在于服务器 {server_id}")
@@ -1627,20 +1950,41 @@ async def register_jsonrpc_methods():
             # 执行工具调用
             try:
                 start_time = time.time()
-                result = await client_manager.execute_tool(server_id, tool_name, arguments)
+                result = await client_manager.execute_tool(
+                    server_id, tool_name, arguments, timeout=timeout, progress_token=progress_token
+                )
                 end_time = time.time()
                 
                 # 记录执行结果
                 logger.info(f"工具 {tool_name} 执行成功")
                 logger.info(f"执行时间: {end_time - start_time:.2f}秒")
-                logger.info(f"结果: {json.dumps(result, ensure_ascii=False)[:1000]}...")
+                logger.info(f"结果: {result.preview(1000)}")
                 
-                return {
+                response = {
                     "success": True,
-                    "result": result,
+                    "result": result.text,
+                    "is_error": result.is_error,
                     "execution_time": end_time - start_time
                 }
+                # 图片、音频、二进制资源等无法用文本表达的内容以原始内容块返回
+                if result.has_non_text:
+                    response["content"] = result.content
+                return response
                 
+            except ToolTimeoutError as e:
+                logger.warning(f"工具 {tool_name} 执行超时: {str(e)}")
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "timed_out": True
+                }
+            except ToolCancelledError as e:
+                logger.info(f"工具 {tool_name} 已取消")
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "cancelled": True
+                }
             except Exception as e:
                 logger.error(f"工具 {tool_name} 执行失败: {str(e)}", exc_info=True)
                 return {
@@ -1653,19 +1997,22 @@ async def register_jsonrpc_methods():
             raise RuntimeError(f"工具调用失败: {str(e)}")
 
     @jsonrpc.method("mcp.list_tools")
-    async def list_mcp_tools(server_id: str):
+    async def list_mcp_tools(server_id: str, cursor: Optional[str] = None, limit: Optional[int] = None):
         """
         获取MCP服务器提供的工具列表
         
         参数:
             server_id: 服务器ID
+            cursor: 分页游标（可选），为上一页返回的nextCursor
+            limit: 每页数量（可选）
             
         返回:
-            List[Dict]: 工具列表
+            List[Dict]: 工具列表；指定cursor或limit时返回 {"tools", "nextCursor", "total"}
         """
         try:
-            # 检查服务器是否已连接
-            if not client_manager.is_server_connected(server_id):
+            # 检查服务器是否已连接（休眠的服务器直接使用缓存的目录）
+            if not client_manager.is_server_connected(server_id) and \
+                    not client_manager.is_server_hibernating(server_id):
                 # 尝试连接服务器
                 server_config = next((s for s in settings.mcp_servers if s.id == server_id), None)
                 if not server_config:
@@ -1676,6 +2023,13 @@ async def register_jsonrpc_methods():
                 if not success:
                     raise JSONRPCError(500, f"连接服务器失败: {server_id}")
             
+            # 指定了分页参数时只返回一页
+            if cursor is not None or limit is not None:
+                try:
+                    return await client_manager.list_tools_page(server_id, cursor, limit)
+                except ValueError as e:
+                    raise InvalidParams(str(e))
+            
             # 获取工具列表
             tools = await client_manager.get_server_tools(server_id)
             
@@ -1743,9 +2097,9 @@ async def register_jsonrpc_methods():
             if not server_config:
                 return {"status": "unknown", "message": f"服务器配置未找到: {server_id}"}
             
-            # 只处理SSE类型的服务器
-            if server_config.type != "sse":
-                return {"status": "not_sse", "message": "不是SSE类型的服务器"}
+            # 只处理远程（SSE / Streamable HTTP）服务器
+            if not server_config.is_remote:
+                return {"status": "not_sse", "message": "不是远程类型的服务器"}
             
             # 检查是否正在连接中
             if getattr(connect_to_server, f"connecting_{server_id}", False):
@@ -1777,13 +2131,8 @@ async def startup_event():
     """服务启动事件，注册所有JSON-RPC方法"""
     await register_jsonrpc_methods()
     
-    # 自动连接配置的MCP服务器
-    for server in settings.mcp_servers:
-        try:
-            logger.info(f"自动连接到MCP服务器: {server.name}")
-            await client_manager.connect_to_server(server.id, server.dict())
-        except Exception as e:
-            logger.error(f"无法自动连接到MCP服务器 {server.name}: {e}")
-            
+    # 在后台并发连接配置的MCP服务器，不阻塞HTTP服务启动；进度见 /ready
+    client_manager.start_auto_connect(settings.mcp_servers)
+    
     # 注意：不要在这里注册chat.with_tools别名，因为函数可能尚未定义
     # 而是在register_jsonrpc_methods函数的末尾注册别名 
\ No newline at end of file
@@ -8,6 +8,7 @@ from loguru import logger
 # 导入配置模型
 from app.models.mcp_server_config import MCPServerConfig
 from app.models.llm_provider_config import LLMProviderConfig
+from app.models.llm_model_group import ModelGroupConfig
 
 # 获取根目录
 ROOT_DIR = Path(__file__).parent.parent.parent.parent
@@ -21,15 +22,82 @@ class Settings(BaseSettings):
     
     # 会话设置
     SESSION_TIMEOUT_SECONDS: int = 300  # 会话超时时间（5分钟）
-    
+
+    # MCP连接监管设置
+    MCP_RECONNECT_BASE_DELAY: float = 1.0  # 重连退避基础时间（秒）
+    MCP_RECONNECT_MAX_DELAY: float = 60.0  # 重连退避上限（秒）
+    MCP_LIVENESS_CHECK_INTERVAL: float = 30.0  # 心跳ping间隔（秒），0表示关闭
+    MCP_LIVENESS_CHECK_TIMEOUT: float = 10.0  # 心跳ping超时（秒）
+    MCP_HEALTH_DEGRADED_LATENCY: float = 2.0  # 心跳延迟超过该值（秒）时标记为degraded
+    MCP_HEALTH_OFFLINE_FAILURES: int = 3  # 心跳连续失败达到该次数时标记为offline并重连
+    MCP_READY_WAIT_TIMEOUT: float = 15.0  # 请求等待服务器重连就绪的最长时间（秒）
+    MCP_STARTUP_CONCURRENCY: int = 4  # 启动时并发连接的服务器数量上限
+    MCP_STARTUP_CONNECT_TIMEOUT: float = 30.0  # 启动时单个服务器的连接时限（秒）
+    MCP_CATALOG_REFRESH_INTERVAL: float = 300.0  # 不发送list_changed通知的服务器的目录刷新间隔（秒），0表示关闭
+    MCP_CATALOG_PAGE_SIZE: int = 100  # 目录列表接口的默认分页大小
+    MCP_CATALOG_MAX_PAGE_SIZE: int = 1000  # 目录列表接口的最大分页大小
+    MCP_IDLE_TIMEOUT: float = 600.0  # idle_timeout 服务器无调用多久后休眠（秒）
+    MCP_IDLE_CHECK_INTERVAL: float = 30.0  # 空闲休眠检查间隔（秒）
+    MCP_SERVER_MAX_IN_FLIGHT: int = 8  # 单个服务器同时处理的最大请求数
+    MCP_SERVER_MAX_QUEUE: int = 64  # 单个服务器等待并发槽位的最大排队数，超出时立即返回繁忙错误
+
+    # 远程MCP服务器（sse / streamable_http）共享的HTTP连接池
+    MCP_HTTP_MAX_CONNECTIONS: int = 100  # 连接池的最大连接数（每个SSE会话长期占用一个连接）
+    MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 保持空闲复用的最大连接数
+    MCP_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接的保留时间（秒）
+    MCP_HTTP_CONNECT_TIMEOUT: float = 10.0  # 建立连接的超时（秒）
+    MCP_HTTP_TIMEOUT: float = 30.0  # 普通HTTP请求的读写超时（秒）
+    MCP_HTTP_SSE_READ_TIMEOUT: float = 300.0  # SSE流两次事件之间的最长等待（秒）
+    MCP_HTTP2: bool = False  # 是否启用HTTP/2（需要安装 h2）
+    MCP_TOOL_CALL_TIMEOUT: float = 120.0  # 工具调用的默认时限（秒，包含排队等待），0表示不限制
+    MCP_BATCH_MAX_CALLS: int = 1000  # mcp.call_tools_batch 单次请求的最大调用数
+
+    # LLM供应商HTTP连接池（每个供应商一个长期复用的连接池）
+    LLM_HTTP_MAX_CONNECTIONS: int = 50  # 单个供应商的最大连接数
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10  # 保持空闲复用的最大连接数
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 120.0  # 空闲连接的保留时间（秒）
+    LLM_HTTP_CONNECT_TIMEOUT: float = 10.0  # 建立连接的超时（秒）
+    LLM_HTTP_READ_TIMEOUT: float = 120.0  # 等待响应数据的超时（秒），模型生成较慢时需要调大
+    LLM_HTTP_TOTAL_TIMEOUT: float = 300.0  # 单次请求的总时限（秒），0表示不限制
+    LLM_HTTP2: bool = True  # 是否启用HTTP/2（需要安装 h2，未安装时回退到HTTP/1.1）
+    LLM_HTTP_WARMUP: bool = True  # 启动时预先建立到各供应商的连接
+    LLM_RETRY_MAX_ATTEMPTS: int = 3  # 限流、过载、服务端错误和网络错误的最大尝试次数（包括首次请求）
+    LLM_RETRY_BASE_DELAY: float = 0.5  # 重试退避基础时间（秒）
+    LLM_RETRY_MAX_DELAY: float = 8.0  # 重试退避上限（秒）
+    LLM_RETRY_AFTER_MAX: float = 30.0  # Retry-After 要求等待超过该时间（秒）时不再重试，直接返回错误
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 供应商连续失败达到该次数时熔断
+    LLM_CIRCUIT_RESET_TIMEOUT: float = 30.0  # 熔断后多久（秒）放行一个探测请求
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # 成员的延迟样本达到该数量后才按其p95延迟对冲
+    LLM_HEDGE_DEFAULT_DELAY: float = 10.0  # 延迟样本不足时的对冲等待时间（秒）
+    LLM_RATE_LIMIT_MAX_WAIT: float = 60.0  # 达到供应商速率限制（rpm/tpm）时最长排队等待时间（秒）
+    LLM_RATE_LIMIT_DEFAULT_COMPLETION_TOKENS: int = 1024  # 未指定max_tokens时，TPM预估中计入的输出token数
+
+    # MCP工具结果缓存设置
+    MCP_TOOL_CACHE_MAX_ENTRIES: int = 1024  # 缓存条目上限，超出后按LRU淘汰
+    MCP_TOOL_CACHE_DEFAULT_TTL: float = 60.0  # 根据工具注解自动缓存时的TTL（秒）
+    MCP_TOOL_CACHE_FROM_ANNOTATIONS: bool = True  # 是否根据readOnlyHint/idempotentHint自动缓存
+
+    # MCP prompt渲染结果缓存设置（目录变化时失效）
+    MCP_PROMPT_CACHE_MAX_ENTRIES: int = 256  # 缓存条目上限
+    MCP_PROMPT_CACHE_TTL: float = 300.0  # 渲染结果的缓存时间（秒），0表示不缓存
+
+    # MCP资源内容缓存设置
+    MCP_RESOURCE_CACHE_MAX_ENTRIES: int = 512  # 缓存的资源数量上限
+    MCP_RESOURCE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 缓存内容的总大小上限，超出后按LRU淘汰
+    MCP_RESOURCE_CACHE_TTL: float = 30.0  # 服务器不支持订阅时的缓存时间（秒），0表示关闭资源缓存
+    MCP_RESOURCE_INLINE_BLOB_MAX_BYTES: int = 256 * 1024  # JSON-RPC响应中内联的base64内容上限，超出时改为下载链接
+    MCP_RESOURCE_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024  # 流式下载时解码内容在内存中保留的上限，超出后转存临时文件
+
     # 配置文件路径
     CONFIG_DIR: Path = ROOT_DIR / ".config"
     SERVERS_CONFIG_PATH: Path = CONFIG_DIR / "servers.json"
     LLM_CONFIG_PATH: Path = CONFIG_DIR / "llm.json"
+    MCP_CATALOG_CACHE_DIR: Path = CONFIG_DIR / "catalogs"  # lazy服务器最近一次获取的目录，启动时加载而不启动进程
     
     # 动态加载的配置
     mcp_servers: List[MCPServerConfig] = []
     llm_providers: List[LLMProviderConfig] = []
+    llm_model_groups: List[ModelGroupConfig] = []
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -93,6 +161,7 @@ class Settings(BaseSettings):
     def load_llm_providers(self) -> List[LLMProviderConfig]:
         """加载LLM供应商配置"""
         self.llm_providers = []  # 重置配置
+        self.llm_model_groups = []
         try:
             if self.LLM_CONFIG_PATH.exists():
                 with open(self.LLM_CONFIG_PATH, "r") as f:
@@ -120,8 +189,12 @@ class Settings(BaseSettings):
                             logger.info(f"已加载单个LLM供应商配置: {provider['name']}")
                         except Exception as e:
                             logger.error(f"解析LLM供应商配置失败: {e}")
-                    elif isinstance(data, list):
+                    elif isinstance(data, list) or (isinstance(data, dict) and "providers" in data):
                         # 多个供应商配置: [{配置1}, {配置2}, ...]
+                        # 或带模型组的配置: {providers: [{配置1}, ...], modelGroups: [{模型组1}, ...]}
+                        if isinstance(data, dict):
+                            self.llm_model_groups = self._parse_model_groups(data.get("modelGroups", []))
+                            data = data["providers"]
                         loaded_providers = []
                         for item in data:
                             try:
@@ -145,5 +218,27 @@ class Settings(BaseSettings):
             logger.error(f"加载LLM供应商配置时出错: {e}")
             return []
 
+    def _parse_model_groups(self, items: List[Dict[str, Any]]) -> List[ModelGroupConfig]:
+        """解析模型组配置，跳过无效的模型组"""
+        groups = []
+        for item in items:
+            try:
+                groups.append(ModelGroupConfig(**item))
+                logger.info(f"已加载模型组: {item.get('name')}")
+            except Exception as e:
+                logger.error(f"解析模型组配置失败: {e}")
+        return groups
+    
+    def save_llm_providers(self, providers_data: List[Dict[str, Any]]) -> None:
+        """保存LLM供应商配置，配置了模型组时以 {providers, modelGroups} 格式一并保存"""
+        data: Any = providers_data
+        if self.llm_model_groups:
+            data = {
+                "providers": providers_data,
+                "modelGroups": [group.dict() for group in self.llm_model_groups]
+            }
+        with open(self.LLM_CONFIG_PATH, "w") as f:
+            json.dump(data, f, indent=2)
+
 # 创建全局设置实例
 settings = Settings() 
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import sys
 import os
@@ -118,6 +119,10 @@ async def startup():
             llm_service_manager.add_provider(provider)
             logger.info(f"已加载LLM供应商: {provider.name}")
             logger.info(f"可用模型: {provider.models}")
+        llm_service_manager.set_model_groups(settings.llm_model_groups)
+        if settings.LLM_HTTP_WARMUP:
+            # 在后台预热连接，不阻塞启动
+            app.state.llm_warmup_task = asyncio.create_task(llm_service_manager.warmup_all())
         
         # 注册JSON-RPC方法
         logger.info("正在注册JSON-RPC方法...")
@@ -144,6 +149,9 @@ async def shutdown():
         logger.info(f"当前连接的服务器: {connected_servers}")
         await client_manager.disconnect_all()
         
+        # 关闭LLM供应商连接池
+        await llm_service_manager.close_all()
+        
         logger.info(get_message("success.stopped"))
         logger.info("="*50)
     except Exception as e:
@@ -154,6 +162,14 @@ async def shutdown():
 async def health_check():
     return {"status": "ok"}
 
+# 就绪检查端点：报告启动时各MCP服务器的自动连接进度
+@app.get("/ready")
+async def readiness_check():
+    from app.services.mcp_client import client_manager
+    
+    readiness = client_manager.get_readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
 @app.get("/")
 async def root():
     """根路径，返回API信息"""
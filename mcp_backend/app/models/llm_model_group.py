@@ -0,0 +1,23 @@
+from typing import List, Optional
+from pydantic import BaseModel, validator
+
+class ModelGroupMember(BaseModel):
+    """模型组成员：一个供应商/模型组合"""
+    provider: str
+    model: str
+
+class ModelGroupConfig(BaseModel):
+    """模型组配置：按优先级排列的一组等价的供应商/模型组合
+    
+    对话时可以用模型组名称代替供应商名称，请求按顺序发往成员，成员出错时切换到下一个成员，认证、请求格式等错误直接返回。
+    """
+    name: str
+    members: List[ModelGroupMember]
+    hedge: bool = False  # 当前成员超过其观测p95延迟仍未返回时，向下一个成员发送对冲请求，采用先返回的结果
+    hedgeDelay: Optional[float] = None  # 延迟样本不足时使用的对冲等待时间（秒），为空时使用全局设置
+    
+    @validator('members')
+    def validate_members(cls, v):
+        if not v:
+            raise ValueError("模型组至少需要一个成员")
+        return v
@@ -1,6 +1,11 @@
 from typing import Dict, List, Optional
 from pydantic import BaseModel, validator
 
+class ModelRateLimit(BaseModel):
+    """单个模型的速率限制"""
+    rpm: Optional[int] = None  # 每分钟请求数
+    tpm: Optional[int] = None  # 每分钟token数
+
 class LLMProviderConfig(BaseModel):
     """LLM 供应商配置模型"""
     name: str
@@ -8,6 +13,10 @@ class LLMProviderConfig(BaseModel):
     apiKey: str
     apiBase: Optional[str] = None
     models: List[str] = []
+    rpm: Optional[int] = None  # 供应商的每分钟请求数上限（所有模型合计），为空表示不限制
+    tpm: Optional[int] = None  # 供应商的每分钟token数上限（所有模型合计），为空表示不限制
+    modelRateLimits: Optional[Dict[str, ModelRateLimit]] = None  # 模型名 -> 该模型单独的速率限制
+    rateLimitMaxWait: Optional[float] = None  # 达到速率限制时最长排队等待时间（秒），为空时使用全局设置
     
     @validator('type')
     def validate_type(cls, v):
@@ -6,16 +6,30 @@ class MCPServerConfig(BaseModel):
     """MCP 服务器配置模型"""
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
-    type: str  # "stdio" 或 "sse"
+    type: str  # "stdio"、"sse" 或 "streamable_http"
     command: Optional[str] = None  # 对于 stdio 类型的服务器
     args: Optional[List[str]] = None  # 对于 stdio 类型的服务器
-    url: Optional[str] = None  # 对于 sse 类型的服务器
+    url: Optional[str] = None  # 对于 sse / streamable_http 类型的服务器
+    headers: Optional[Dict[str, str]] = None  # 远程服务器请求附带的HTTP头（如认证信息）
     env: Optional[Dict[str, str]] = None  # 环境变量
+    heartbeat_interval: Optional[float] = None  # 心跳ping间隔（秒），为空时使用全局设置，0表示关闭
+    catalog_refresh_interval: Optional[float] = None  # 目录定期刷新间隔（秒），为空时使用全局设置
+    tool_cache: Optional[Dict[str, float]] = None  # 工具名 -> 结果缓存TTL（秒），0表示不缓存
+    coalesce_tool_calls: bool = False  # 是否合并所有工具的相同并发调用（可缓存的工具总是合并）
+    tool_timeout: Optional[float] = None  # 该服务器工具调用的默认时限（秒），0表示不限制，为空时使用全局设置
+    tool_timeouts: Optional[Dict[str, float]] = None  # 工具名 -> 调用时限（秒），优先于 tool_timeout
+    max_in_flight: Optional[int] = None  # 同时发往该服务器的最大请求数，为空时使用全局设置
+    max_queue: Optional[int] = None  # 等待并发槽位的最大排队数，为空时使用全局设置
+    resource_cache_ttl: Optional[float] = None  # 不支持订阅时资源内容的缓存时间（秒），0表示不缓存，为空时使用全局设置
+    replicas: int = 1  # stdio服务器的进程副本数，工具调用在副本间负载均衡
+    warm_standby: bool = False  # stdio服务器是否保持一个已初始化的热备进程，主实例断开时立即切换
+    lifecycle: str = "eager"  # eager: 启动时连接; lazy: 首次使用时连接; idle_timeout: 空闲超时后休眠
+    idle_timeout: Optional[float] = None  # idle_timeout 生命周期的空闲时间（秒），为空时使用全局设置
 
     @validator('type')
     def validate_type(cls, v):
-        if v not in ["stdio", "sse"]:
-            raise ValueError(f"不支持的服务器类型: {v}，支持的类型为 stdio 和 sse")
+        if v not in ["stdio", "sse", "streamable_http"]:
+            raise ValueError(f"不支持的服务器类型: {v}，支持的类型为 stdio、sse 和 streamable_http")
         return v
 
     @validator('command')
@@ -24,12 +38,29 @@ class MCPServerConfig(BaseModel):
             raise ValueError("stdio 类型的服务器必须指定 command")
         return v
 
+    @validator('replicas')
+    def validate_replicas(cls, v):
+        if v < 1:
+            raise ValueError("replicas 必须大于等于 1")
+        return v
+
+    @validator('lifecycle')
+    def validate_lifecycle(cls, v):
+        if v not in ["eager", "lazy", "idle_timeout"]:
+            raise ValueError(f"不支持的生命周期: {v}，支持的值为 eager、lazy 和 idle_timeout")
+        return v
+
     @validator('url')
     def validate_url(cls, v, values):
-        if values.get('type') == 'sse' and not v:
-            raise ValueError("sse 类型的服务器必须指定 url")
+        if values.get('type') in ('sse', 'streamable_http') and not v:
+            raise ValueError(f"{values.get('type')} 类型的服务器必须指定 url")
         return v
 
+    @property
+    def is_remote(self) -> bool:
+        """是否为通过HTTP连接的远程服务器"""
+        return self.type in ("sse", "streamable_http")
+
     def to_parameters(self) -> Dict[str, Any]:
         """将配置转换为连接参数"""
         if self.type == "stdio":
@@ -38,9 +69,10 @@ class MCPServerConfig(BaseModel):
                 "args": self.args or [],
                 "env": self.env
             }
-        elif self.type == "sse":
+        elif self.is_remote:
             return {
                 "url": self.url,
+                "headers": self.headers,
                 "env": self.env
             }
         return {}
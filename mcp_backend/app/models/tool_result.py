@@ -0,0 +1,82 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def _field(part: Any, name: str, default: Any = None) -> Any:
+    """读取内容块的字段，兼容MCP SDK的模型对象和普通字典"""
+    if isinstance(part, dict):
+        return part.get(name, default)
+    return getattr(part, name, default)
+
+
+class ToolResult:
+    """MCP工具调用结果的信封
+
+    保留服务器返回的原始内容块（文本、图片、音频、嵌入资源），文本、预览和字典形式
+    都在首次使用时计算并缓存：日志只截取预览，不再为记录日志而编码整个结果，
+    大结果只在返回给调用方时编码一次。
+    """
+
+    __slots__ = ("parts", "is_error", "_text", "_content")
+
+    def __init__(self, parts: Sequence[Any], is_error: bool = False) -> None:
+        self.parts: List[Any] = list(parts)
+        self.is_error: bool = is_error
+        self._text: Optional[str] = None
+        self._content: Optional[List[Dict[str, Any]]] = None
+
+    @classmethod
+    def from_mcp(cls, result: Any) -> "ToolResult":
+        """从 CallToolResult 创建"""
+        return cls(_field(result, "content") or [], bool(_field(result, "isError", False)))
+
+    @property
+    def text(self) -> str:
+        """供LLM和会话记录使用的文本：文本块原样拼接，非文本块以占位说明代替"""
+        if self._text is None:
+            self._text = "\n".join(self._part_text(part) for part in self.parts)
+        return self._text
+
+    @property
+    def content(self) -> List[Dict[str, Any]]:
+        """可JSON序列化的内容块列表（MCP格式）"""
+        if self._content is None:
+            self._content = [
+                part.model_dump(mode="json", exclude_none=True) if hasattr(part, "model_dump") else dict(part)
+                for part in self.parts
+            ]
+        return self._content
+
+    @property
+    def has_non_text(self) -> bool:
+        """是否包含文本以外的内容块"""
+        return any(_field(part, "type") != "text" for part in self.parts)
+
+    def preview(self, limit: int = 500) -> str:
+        """截取文本的前 limit 个字符，用于日志"""
+        text = self.text
+        if len(text) <= limit:
+            return text
+        return f"{text[:limit]}...（共 {len(text)} 字符）"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为 CallToolResult 格式的字典"""
+        return {"content": self.content, "isError": self.is_error}
+
+    @staticmethod
+    def _part_text(part: Any) -> str:
+        part_type = _field(part, "type")
+        if part_type == "text":
+            return _field(part, "text") or ""
+        if part_type == "resource":
+            resource = _field(part, "resource")
+            text = _field(resource, "text")
+            if text is not None:
+                return text
+            return f"[资源: {_field(resource, 'uri')} ({_field(resource, 'mimeType') or 'application/octet-stream'})]"
+        if part_type in ("image", "audio"):
+            label = "图片" if part_type == "image" else "音频"
+            return f"[{label}: {_field(part, 'mimeType') or '未知类型'}]"
+        return f"[{part_type or '未知'}内容]"
+
+    def __repr__(self) -> str:
+        return f"ToolResult(parts={len(self.parts)}, is_error={self.is_error})"
@@ -4,15 +4,116 @@ import logging
 import uuid
 import traceback
 import re
-from typing import Dict, List, Optional, Any, Tuple
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 from loguru import logger
 
+from app.core.config import settings
+from app.models.llm_model_group import ModelGroupConfig, ModelGroupMember
 from app.models.llm_provider_config import LLMProviderConfig
+from app.utils.backoff import backoff_delay, parse_retry_after
+from app.utils.chat_stream import ChatStreamAccumulator, parse_sse_data
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.histogram import LatencyHistogram
+from app.utils.rate_limiter import RateLimiter, RateLimitWaitError
+
+# 各供应商未配置apiBase时使用的地址
+DEFAULT_API_BASES = {
+    "openai": "https://api.openai.com",
+    "openrouter": "https://openrouter.ai",
+    "deepseek": "https://api.deepseek.com",
+    "qwen": "https://dashscope.aliyuncs.com"
+}
+
+
+# LLM补全延迟的分桶上界（秒）
+LLM_LATENCY_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0)
+
+# 可重试的错误类型；其中除限流外都计入熔断器
+RETRYABLE_ERRORS = ("rate_limit", "overloaded", "server_error", "timeout", "network")
+
+# 模型组中不切换成员的错误类型：认证失败和请求格式错误（包括上下文超长）换成员也会重复出现；
+# 其余错误（暂不可用、熔断、未分类的异常、无法解析的响应）都切换到下一个成员
+NON_FAILOVER_ERRORS = ("auth", "bad_request")
+
+
+def should_failover(result: Dict[str, Any]) -> bool:
+    """模型组成员的对话结果是否应切换到下一个成员"""
+    return "error" in result and result.get("error_type") not in NON_FAILOVER_ERRORS
+
+
+def estimate_request_tokens(messages: List[Dict[str, Any]],
+                            tools: Optional[List[Dict[str, Any]]],
+                            max_tokens: Optional[int]) -> int:
+    """粗略预估一次请求消耗的token数，用于TPM限流
+    
+    输入按每3个字符1个token估算（英文约4个字符1个token，中文约1个字1个token，宁可高估），
+    输出按 max_tokens 计算。请求完成后以供应商返回的实际用量修正。
+    """
+    text = json.dumps(messages, ensure_ascii=False)
+    if tools:
+        text += json.dumps(tools, ensure_ascii=False)
+    return len(text) // 3 + (max_tokens or settings.LLM_RATE_LIMIT_DEFAULT_COMPLETION_TOKENS)
+
+
+def classify_status(status_code: int) -> str:
+    """按HTTP状态码对供应商错误分类：rate_limit、overloaded、server_error、timeout、auth、bad_request"""
+    if status_code == 429:
+        return "rate_limit"
+    if status_code in (503, 529):
+        return "overloaded"
+    if status_code >= 500:
+        return "server_error"
+    if status_code == 408:
+        return "timeout"
+    if status_code in (401, 403):
+        return "auth"
+    return "bad_request"
+
+
+def classify_exception(error: BaseException) -> str:
+    """对请求异常分类：circuit_open、timeout、network、unknown"""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, httpx.HTTPError):
+        return "network"
+    return "unknown"
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    """创建供应商使用的长期连接池，LLM_HTTP2 开启但未安装 h2 时回退到 HTTP/1.1"""
+    http2 = settings.LLM_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.debug("未安装 h2 (pip install httpx[http2])，LLM请求使用 HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_HTTP_READ_TIMEOUT,
+            connect=settings.LLM_HTTP_CONNECT_TIMEOUT
+        )
+    )
+
 
 class LLMService:
-    """LLM服务类，负责与不同LLM供应商的API交互"""
+    """LLM服务类，负责与不同LLM供应商的API交互
+    
+    每个供应商持有一个长期复用的 httpx 连接池，多轮对话（包括工具调用后的总结请求）
+    复用已建立的 TCP/TLS 连接，不再为每次请求重新握手。
+    限流、过载和网络错误按退避策略重试；供应商连续出错时由熔断器直接拒绝请求。
+    """
     
     def __init__(self, provider_config: LLMProviderConfig):
         self.config = provider_config
@@ -20,6 +121,108 @@ class LLMService:
         self.api_key = provider_config.apiKey
         self.base_url = provider_config.apiBase
         self.models = provider_config.models
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            f"LLM供应商 {self.name}",
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_CIRCUIT_RESET_TIMEOUT
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """供应商的连接池，首次使用时创建"""
+        if self._client is None or self._client.is_closed:
+            self._client = _create_http_client()
+        return self._client
+    
+    def _request_timeout(self) -> asyncio.Timeout:
+        """单次请求的总时限（连接池只能限制连接和每次读取的等待时间）"""
+        return asyncio.timeout(settings.LLM_HTTP_TOTAL_TIMEOUT or None)
+    
+    async def _send(self, method: str, url: str, stream: bool = False, **kwargs: Any) -> httpx.Response:
+        """发送请求，对可重试的错误（限流、过载、服务端错误、超时、网络错误）按带抖动的指数退避重试
+        
+        响应带 Retry-After 时按其等待，等待时间超过 LLM_RETRY_AFTER_MAX 时不再重试。
+        最终结果为过载、服务端错误或网络错误时计入熔断器失败，成功响应关闭熔断器，
+        限流和客户端错误不改变熔断器的计数。
+        
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            stream: 是否以流式读取响应体，为True时由调用方关闭响应
+            **kwargs: 传给 httpx 的请求参数
+            
+        Returns:
+            httpx.Response: 成功的响应，或不可重试/重试用尽后的错误响应
+            
+        Raises:
+            CircuitOpenError: 供应商熔断中
+            httpx.HTTPError: 重试用尽后的网络错误
+        """
+        self.breaker.before_call()
+        max_attempts = max(1, settings.LLM_RETRY_MAX_ATTEMPTS)
+        attempt = 0
+        try:
+            while True:
+                response: Optional[httpx.Response] = None
+                retry_after: Optional[float] = None
+                try:
+                    response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+                except httpx.HTTPError as e:
+                    error_type = classify_exception(e)
+                    error = f"{type(e).__name__}: {str(e)}"
+                    transport_error: Optional[httpx.HTTPError] = e
+                else:
+                    if response.status_code < 400:
+                        self.breaker.record_success()
+                        return response
+                    error_type = classify_status(response.status_code)
+                    error = f"HTTP {response.status_code}"
+                    retry_after = parse_retry_after(response.headers.get("retry-after"))
+                    transport_error = None
+                
+                attempt += 1
+                delay = retry_after if retry_after is not None else backoff_delay(
+                    attempt - 1, settings.LLM_RETRY_BASE_DELAY, settings.LLM_RETRY_MAX_DELAY
+                )
+                if (error_type not in RETRYABLE_ERRORS or attempt >= max_attempts
+                        or delay > settings.LLM_RETRY_AFTER_MAX):
+                    if error_type in RETRYABLE_ERRORS and error_type != "rate_limit":
+                        self.breaker.record_failure(error)
+                    else:
+                        # 限流和客户端错误既不说明供应商已恢复，也不说明其故障：
+                        # 不清零连续失败计数，只释放半开状态的探测名额
+                        self.breaker.release()
+                    if transport_error is not None:
+                        raise transport_error
+                    return response
+                
+                logger.warning(f"{self.name} 请求失败（{error}），{delay:.2f} 秒后进行第 {attempt} 次重试")
+                if response is not None:
+                    await response.aclose()
+                await asyncio.sleep(delay)
+        except BaseException:
+            # 被取消或超过总时限时释放熔断器的探测名额
+            self.breaker.release()
+            raise
+    
+    async def warmup(self) -> None:
+        """预先建立到供应商的连接，失败时忽略（首次请求时再建立）"""
+        base_url = self.base_url or DEFAULT_API_BASES.get(self.name.lower())
+        if not base_url:
+            return
+        try:
+            async with asyncio.timeout(settings.LLM_HTTP_CONNECT_TIMEOUT):
+                await self.client.head(base_url)
+            logger.info(f"已预热LLM供应商连接: {self.name}")
+        except Exception as e:
+            logger.warning(f"预热LLM供应商 {self.name} 连接失败: {str(e) or type(e).__name__}")
+    
+    async def close(self) -> None:
+        """关闭连接池"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
     
     async def get_completion(self, 
                              messages: List[Dict[str, Any]], 
@@ -33,16 +236,7 @@ class LLMService:
             model_to_use = model if model else self.models[0]
             
             # 验证消息格式
-            if not isinstance(messages, list):
-                raise ValueError("消息必须是列表格式")
-            
-            for msg in messages:
-                if not isinstance(msg, dict):
-                    raise ValueError("每条消息必须是字典格式")
-                if "role" not in msg:
-                    raise ValueError("每条消息必须包含role字段")
-                if "content" not in msg and "tool_calls" not in msg:
-                    raise ValueError("每条消息必须包含content或tool_calls字段")
+            self._validate_messages(messages)
             
             # 根据不同的供应商进行适配
             if self.name.lower() == "openai":
@@ -62,6 +256,162 @@ class LLMService:
             logger.error(error_msg, exc_info=True)
             return {"error": error_msg}
     
+    async def stream_completion(self, 
+                                messages: List[Dict[str, Any]], 
+                                model: Optional[str] = None,
+                                temperature: float = 0.7,
+                                max_tokens: Optional[int] = None,
+                                tools: Optional[List[Dict[str, Any]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """流式获取回复，文本和工具调用参数在到达时立即产出
+        
+        Args:
+            messages: 对话消息
+            model: 模型名称，为空时使用配置中的第一个模型
+            temperature: 采样温度
+            max_tokens: 最大生成token数
+            tools: 工具定义
+            
+        Yields:
+            Dict[str, Any]: content / tool_call 增量事件（见 ChatStreamAccumulator.feed）；
+            最后一个事件为 {"type": "done", "response": 与get_completion结构相同的完整响应}
+            或 {"type": "error", "error": 错误信息}
+        """
+        try:
+            model_to_use = model if model else self.models[0]
+            self._validate_messages(messages)
+            url, headers, payload = self._chat_request(
+                messages, model_to_use, temperature, max_tokens, tools, stream=True
+            )
+        except Exception as e:
+            error_msg = f"LLM调用失败: {str(e)}"
+            logger.error(error_msg)
+            yield {"type": "error", "error": error_msg}
+            return
+        
+        accumulator = ChatStreamAccumulator()
+        loop = asyncio.get_running_loop()
+        # 流式响应不能整体套用 asyncio.timeout（调用方在两次产出之间的耗时也会被计入），按块检查总时限
+        deadline = loop.time() + settings.LLM_HTTP_TOTAL_TIMEOUT if settings.LLM_HTTP_TOTAL_TIMEOUT else None
+        try:
+            # 只在收到响应之前重试，开始输出后不能再重试
+            async with asyncio.timeout_at(deadline):
+                response = await self._send("POST", url, stream=True, json=payload, headers=headers)
+            try:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    error_msg = f"{self.name} API调用失败: {response.status_code} - {body}"
+                    logger.error(error_msg)
+                    yield {"type": "error", "error": error_msg, "error_type": classify_status(response.status_code)}
+                    return
+                
+                if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                    # 供应商忽略了stream参数，返回的是完整响应
+                    yield {"type": "done", "response": json.loads(await response.aread())}
+                    return
+                
+                async for line in response.aiter_lines():
+                    if deadline is not None and loop.time() > deadline:
+                        raise TimeoutError(f"超过总时限 {settings.LLM_HTTP_TOTAL_TIMEOUT} 秒")
+                    data = parse_sse_data(line)
+                    if not data:
+                        continue
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        logger.warning(f"跳过无法解析的流式响应块: {data[:200]}")
+                        continue
+                    if chunk.get("error"):
+                        # 部分供应商（如OpenRouter）在流中途以错误块结束
+                        error_msg = f"{self.name} API调用失败: {json.dumps(chunk['error'], ensure_ascii=False)}"
+                        logger.error(error_msg)
+                        yield {"type": "error", "error": error_msg, "error_type": "server_error"}
+                        return
+                    for event in accumulator.feed(chunk):
+                        yield event
+            finally:
+                await response.aclose()
+        except Exception as e:
+            error_msg = f"{self.name} API调用异常: {str(e) or type(e).__name__}"
+            logger.error(error_msg)
+            yield {"type": "error", "error": error_msg, "error_type": classify_exception(e)}
+            return
+        
+        yield {"type": "done", "response": accumulator.response()}
+    
+    def _validate_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """验证消息格式
+        
+        Raises:
+            ValueError: 消息格式不正确
+        """
+        if not isinstance(messages, list):
+            raise ValueError("消息必须是列表格式")
+        
+        for msg in messages:
+            if not isinstance(msg, dict):
+                raise ValueError("每条消息必须是字典格式")
+            if "role" not in msg:
+                raise ValueError("每条消息必须包含role字段")
+            if "content" not in msg and "tool_calls" not in msg:
+                raise ValueError("每条消息必须包含content或tool_calls字段")
+    
+    def _chat_request(self, 
+                      messages: List[Dict[str, Any]], 
+                      model: str,
+                      temperature: float,
+                      max_tokens: Optional[int],
+                      tools: Optional[List[Dict[str, Any]]],
+                      stream: bool = False) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """构建供应商的聊天补全请求（各供应商都使用OpenAI兼容接口）
+        
+        Returns:
+            Tuple[str, Dict[str, str], Dict[str, Any]]: (url, headers, payload)
+            
+        Raises:
+            ValueError: 不支持的供应商
+        """
+        provider = self.name.lower()
+        if provider not in DEFAULT_API_BASES:
+            raise ValueError(f"不支持的LLM供应商: {self.name}")
+        base_url = self.base_url or DEFAULT_API_BASES[provider]
+        
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        if provider == "openrouter":
+            url = f"{base_url}/api/v1/chat/completions"
+            headers["HTTP-Referer"] = "https://mcp-client.app"
+            headers["X-Title"] = "MCP Client"
+            # 确保消息格式正确 - 严格按照OpenRouter要求格式化
+            messages = self._format_openrouter_messages(messages)
+        else:
+            url = f"{base_url}/v1/chat/completions"
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": stream
+        }
+        if stream:
+            # 流式响应默认不返回用量，TPM限流需要用实际用量修正预估
+            payload["stream_options"] = {"include_usage": True}
+        
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        
+        if tools:
+            payload["tools"] = tools
+            if provider == "openrouter":
+                # 让LLM自行决定是否使用工具，不强制特定工具的使用
+                payload["tool_choice"] = "auto"
+        
+        return url, headers, payload
+    
     async def get_available_models(self) -> Dict[str, Any]:
         """获取供应商可用的模型列表"""
         try:
@@ -89,37 +439,21 @@ class LLMService:
                                 max_tokens: Optional[int],
                                 tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
         """OpenAI API调用"""
-        url = f"{self.base_url or 'https://api.openai.com'}/v1/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
-        
-        if tools:
-            payload["tools"] = tools
+        url, headers, payload = self._chat_request(messages, model, temperature, max_tokens, tools)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers)
+            async with self._request_timeout():
+                response = await self._send("POST", url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
                     return response.json()
                 else:
                     logger.error(f"OpenAI API调用失败: {response.status_code} - {response.text}")
-                    return {"error": f"API call failed: {response.status_code} - {response.text}"}
+                    return {"error": f"API call failed: {response.status_code} - {response.text}",
+                            "error_type": classify_status(response.status_code)}
         except Exception as e:
             logger.error(f"OpenAI API调用异常: {str(e)}")
-            return {"error": f"API call exception: {str(e)}"}
+            return {"error": f"API call exception: {str(e) or type(e).__name__}", "error_type": classify_exception(e)}
     
     async def _openrouter_completion(self, 
                                     messages: List[Dict[str, Any]], 
@@ -128,20 +462,35 @@ class LLMService:
                                     max_tokens: Optional[int],
                                     tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
         """OpenRouter API调用"""
-        url = f"{self.base_url or 'https://openrouter.ai'}/api/v1/chat/completions"
-        
         # 记录请求参数
         logger.info(f"OpenRouter请求参数: model={model}, temperature={temperature}")
         logger.debug(f"原始消息内容: {json.dumps(messages, ensure_ascii=False)}")
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-            "HTTP-Referer": "https://mcp-client.app",
-            "X-Title": "MCP Client"
-        }
+        url, headers, payload = self._chat_request(messages, model, temperature, max_tokens, tools)
+        if tools:
+            logger.info(f"发送工具定义到OpenRouter: {len(tools)}个工具")
         
-        # 确保消息格式正确 - 严格按照OpenRouter要求格式化
+        try:
+            logger.info("发送请求到OpenRouter...")
+            async with self._request_timeout():
+                response = await self._send("POST", url, json=payload, headers=headers)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    logger.info("OpenRouter请求成功")
+                    logger.debug(f"OpenRouter响应: {json.dumps(result, ensure_ascii=False)}")
+                    return result
+                else:
+                    error_msg = f"OpenRouter API调用失败: {response.status_code} - {response.text}"
+                    logger.error(error_msg)
+                    return {"error": error_msg, "error_type": classify_status(response.status_code)}
+        except Exception as e:
+            error_msg = f"OpenRouter API调用异常: {str(e) or type(e).__name__}"
+            logger.error(error_msg)
+            return {"error": error_msg, "error_type": classify_exception(e)}
+    
+    def _format_openrouter_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按OpenRouter要求格式化消息"""
         formatted_messages = []
         for msg in messages:
             # 跳过非字典消息
@@ -219,41 +568,7 @@ class LLMService:
             formatted_messages.append(formatted_msg)
         
         logger.debug(f"发送到OpenRouter的格式化消息: {json.dumps(formatted_messages, ensure_ascii=False)}")
-        
-        payload = {
-            "model": model,
-            "messages": formatted_messages,
-            "temperature": temperature,
-            "stream": False
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
-        
-        if tools:
-            logger.info(f"发送工具定义到OpenRouter: {len(tools)}个工具")
-            payload["tools"] = tools
-            # 让LLM自行决定是否使用工具，不强制特定工具的使用
-            payload["tool_choice"] = "auto"
-        
-        try:
-            logger.info("发送请求到OpenRouter...")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info("OpenRouter请求成功")
-                    logger.debug(f"OpenRouter响应: {json.dumps(result, ensure_ascii=False)}")
-                    return result
-                else:
-                    error_msg = f"OpenRouter API调用失败: {response.status_code} - {response.text}"
-                    logger.error(error_msg)
-                    return {"error": error_msg}
-        except Exception as e:
-            error_msg = f"OpenRouter API调用异常: {str(e)}"
-            logger.error(error_msg)
-            return {"error": error_msg}
+        return formatted_messages
     
     async def _deepseek_completion(self, 
                                   messages: List[Dict[str, Any]], 
@@ -262,37 +577,21 @@ class LLMService:
                                   max_tokens: Optional[int],
                                   tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
         """DeepSeek API调用"""
-        url = f"{self.base_url or 'https://api.deepseek.com'}/v1/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
-        
-        if tools:
-            payload["tools"] = tools
+        url, headers, payload = self._chat_request(messages, model, temperature, max_tokens, tools)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers)
+            async with self._request_timeout():
+                response = await self._send("POST", url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
                     return response.json()
                 else:
                     logger.error(f"DeepSeek API调用失败: {response.status_code} - {response.text}")
-                    return {"error": f"API call failed: {response.status_code} - {response.text}"}
+                    return {"error": f"API call failed: {response.status_code} - {response.text}",
+                            "error_type": classify_status(response.status_code)}
         except Exception as e:
             logger.error(f"DeepSeek API调用异常: {str(e)}")
-            return {"error": f"API call exception: {str(e)}"}
+            return {"error": f"API call exception: {str(e) or type(e).__name__}", "error_type": classify_exception(e)}
     
     async def _qwen_completion(self, 
                               messages: List[Dict[str, Any]], 
@@ -301,37 +600,21 @@ class LLMService:
                               max_tokens: Optional[int],
                               tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
         """Qwen API调用"""
-        url = f"{self.base_url or 'https://dashscope.aliyuncs.com'}/v1/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature
-        }
-        
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
-        
-        if tools:
-            payload["tools"] = tools
+        url, headers, payload = self._chat_request(messages, model, temperature, max_tokens, tools)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers)
+            async with self._request_timeout():
+                response = await self._send("POST", url, json=payload, headers=headers)
                 
                 if response.status_code == 200:
                     return response.json()
                 else:
                     logger.error(f"Qwen API调用失败: {response.status_code} - {response.text}")
-                    return {"error": f"API call failed: {response.status_code} - {response.text}"}
+                    return {"error": f"API call failed: {response.status_code} - {response.text}",
+                            "error_type": classify_status(response.status_code)}
         except Exception as e:
             logger.error(f"Qwen API调用异常: {str(e)}")
-            return {"error": f"API call exception: {str(e)}"}
+            return {"error": f"API call exception: {str(e) or type(e).__name__}", "error_type": classify_exception(e)}
 
     # ------- 模型获取方法 -------
     
@@ -345,8 +628,8 @@ class LLMService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers)
+            async with self._request_timeout():
+                response = await self._send("GET", url, headers=headers)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -374,8 +657,8 @@ class LLMService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers)
+            async with self._request_timeout():
+                response = await self._send("GET", url, headers=headers)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -422,14 +705,46 @@ class LLMService:
         return {"models": models}
 
 class LLMServiceManager:
-    """LLM服务管理器，管理多个供应商的服务实例"""
+    """LLM服务管理器，管理多个供应商的服务实例
+    
+    模型组可以代替供应商名称使用：请求按顺序发往组内成员，成员出错（认证失败和请求格式错误除外）时切换到下一个成员；
+    开启对冲时，当前成员超过其观测p95延迟仍未返回，就向下一个成员发送相同的请求，
+    采用先成功返回的结果并取消较慢的请求。
+    
+    供应商或模型配置了 rpm/tpm 时，请求先在对应的令牌桶限流器中排队，额度足够时才发出，
+    避免批量任务超出供应商限制后收到大量429；预计等待超过最长等待时间的请求以 rate_limit 错误返回。
+    """
     
     def __init__(self):
         self.providers: Dict[str, LLMService] = {}
+        self.model_groups: Dict[str, ModelGroupConfig] = {}
+        # (供应商, 模型) -> 成功补全的延迟
+        self.latency: Dict[Tuple[str, str], LatencyHistogram] = {}
+        # (供应商, 模型) -> 限流器，模型为None时是供应商所有模型合计的限流器
+        self.rate_limiters: Dict[Tuple[str, Optional[str]], RateLimiter] = {}
+        # 被替换或移除的服务正在关闭连接池的任务
+        self._closing_tasks: set = set()
+    
+    def set_model_groups(self, groups: List[ModelGroupConfig]) -> None:
+        """设置模型组，与供应商同名的模型组被忽略"""
+        self.model_groups = {}
+        for group in groups:
+            if group.name in self.providers:
+                logger.warning(f"模型组 {group.name} 与供应商同名，已忽略")
+                continue
+            self.model_groups[group.name] = group
+    
+    def has_provider(self, name: str) -> bool:
+        """名称是否对应一个供应商或模型组"""
+        return name in self.providers or name in self.model_groups
     
     def add_provider(self, provider_config: LLMProviderConfig) -> None:
-        """添加供应商服务"""
+        """添加供应商服务，替换同名服务时关闭旧的连接池"""
+        previous = self.providers.get(provider_config.name)
         self.providers[provider_config.name] = LLMService(provider_config)
+        self._drop_rate_limiters(provider_config.name)
+        if previous:
+            self._close_later(previous)
     
     def get_provider(self, name: str) -> Optional[LLMService]:
         """获取特定供应商的服务实例"""
@@ -438,7 +753,28 @@ class LLMServiceManager:
     def remove_provider(self, name: str) -> None:
         """移除供应商服务"""
         if name in self.providers:
-            del self.providers[name]
+            self._close_later(self.providers.pop(name))
+            self._drop_rate_limiters(name)
+    
+    def _close_later(self, service: LLMService) -> None:
+        """在后台关闭服务的连接池，不阻塞调用方（没有运行中的事件循环时由垃圾回收释放）"""
+        try:
+            task = asyncio.get_running_loop().create_task(service.close())
+        except RuntimeError:
+            return
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+    
+    async def warmup_all(self) -> None:
+        """并发预热所有供应商的连接"""
+        if self.providers:
+            await asyncio.gather(*(service.warmup() for service in self.providers.values()))
+    
+    async def close_all(self) -> None:
+        """关闭所有供应商的连接池"""
+        await asyncio.gather(*(service.close() for service in self.providers.values()), return_exceptions=True)
+        if self._closing_tasks:
+            await asyncio.gather(*self._closing_tasks, return_exceptions=True)
     
     async def get_provider_models(self, name: str) -> Dict[str, Any]:
         """获取特定供应商的模型列表"""
@@ -455,7 +791,11 @@ class LLMServiceManager:
                             tools: Optional[List[Dict[str, Any]]] = None,
                             temperature: float = 0.7,
                             max_tokens: Optional[int] = None) -> Dict[str, Any]:
-        """使用指定的LLM供应商进行对话，可选择性地使用工具"""
+        """使用指定的LLM供应商（或模型组）进行对话，可选择性地使用工具"""
+        group = self.model_groups.get(provider_name)
+        if group:
+            return await self._chat_with_group(group, messages, tools, temperature, max_tokens)
+        
         service = self.get_provider(provider_name)
         if not service:
             logger.error(f"LLM供应商不存在: {provider_name}")
@@ -466,19 +806,325 @@ class LLMServiceManager:
             logger.info(f"模型: {model}")
             if tools:
                 logger.info(f"使用 {len(tools)} 个工具")
+            
+            try:
+                limiters, estimated = await self._acquire_rate_limits(service, model, messages, tools, max_tokens)
+            except RateLimitWaitError as e:
+                logger.warning(str(e))
+                return {"error": str(e), "error_type": "rate_limit"}
+            
+            start_time = time.monotonic()
+            settled = False
+            try:
+                response = await service.get_completion(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    tools=tools
+                )
+                self._settle_rate_limits(limiters, estimated, response)
+                settled = True
+            except asyncio.CancelledError:
+                # 被取消（如模型组中较慢的对冲请求）时归还预估的请求数和token额度
+                self._release_rate_limits(limiters, estimated)
+                settled = True
+                raise
+            finally:
+                if not settled:
+                    # 请求异常结束，没有实际用量可修正时退还预估的token额度
+                    self._refund_rate_limits(limiters, estimated)
+            
+            if "error" in response:
+                logger.error(f"LLM对话失败: {response['error']}")
+                return response
+            self._latency_histogram(provider_name, model).observe(time.monotonic() - start_time)
+                
+            return self._parse_completion(response)
                 
-            response = await service.get_completion(
+        except Exception as e:
+            logger.error(f"chat_with_tools失败: {str(e)}", exc_info=True)
+            return {"error": f"对话失败: {str(e)}", "error_type": classify_exception(e)}
+
+    async def stream_chat_with_tools(self,
+                                     provider_name: str,
+                                     model: str,
+                                     messages: List[Dict[str, Any]],
+                                     tools: Optional[List[Dict[str, Any]]] = None,
+                                     temperature: float = 0.7,
+                                     max_tokens: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """chat_with_tools 的流式版本
+        
+        文本在到达时以 {"type": "content", "delta": 文本} 产出，原生工具调用的参数增量以 tool_call 事件产出。
+        以JSON或DeepSeek标记形式输出的工具调用在结束前无法与普通文本区分，这类开头的文本先缓存，
+        结束时确认是普通文本再补发。最后一个事件为 {"type": "done", "result": 与chat_with_tools相同的返回值}。
+        """
+        group = self.model_groups.get(provider_name)
+        if group:
+            async for event in self._stream_with_group(group, messages, tools, temperature, max_tokens):
+                yield event
+            return
+        
+        service = self.get_provider(provider_name)
+        if not service:
+            logger.error(f"LLM供应商不存在: {provider_name}")
+            yield {"type": "done", "result": {"error": f"Provider not found: {provider_name}"}}
+            return
+        
+        logger.info(f"使用供应商 {provider_name} 进行流式对话")
+        logger.info(f"模型: {model}")
+        if tools:
+            logger.info(f"使用 {len(tools)} 个工具")
+        
+        content = ""
+        emitted = 0  # 已产出的文本长度
+        result: Optional[Dict[str, Any]] = None
+        try:
+            limiters, estimated = await self._acquire_rate_limits(service, model, messages, tools, max_tokens)
+        except RateLimitWaitError as e:
+            logger.warning(str(e))
+            yield {"type": "done", "result": {"error": str(e), "error_type": "rate_limit"}}
+            return
+        settled = False
+        try:
+            async for event in service.stream_completion(
                 messages=messages,
                 model=model,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 tools=tools
-            )
+            ):
+                if event["type"] == "content":
+                    content += event["delta"]
+                    if emitted or not self._may_be_text_tool_call(content):
+                        yield {"type": "content", "delta": content[emitted:]}
+                        emitted = len(content)
+                elif event["type"] == "tool_call":
+                    yield event
+                elif event["type"] == "error":
+                    logger.error(f"LLM对话失败: {event['error']}")
+                    self._settle_rate_limits(limiters, estimated, event)
+                    settled = True
+                    result = {"error": event["error"], "error_type": event.get("error_type")}
+                elif event["type"] == "done":
+                    self._settle_rate_limits(limiters, estimated, event["response"])
+                    settled = True
+                    result = self._parse_completion(event["response"])
+        except Exception as e:
+            logger.error(f"stream_chat_with_tools失败: {str(e)}", exc_info=True)
+            result = {"error": f"对话失败: {str(e)}", "error_type": classify_exception(e)}
+        finally:
+            if not settled:
+                # 流被取消、提前关闭或异常结束，没有实际用量可修正时退还预估
+                self._refund_rate_limits(limiters, estimated)
+        
+        if result is None:
+            result = {"error": "LLM流式响应意外结束"}
+        final_content = result.get("content")
+        if isinstance(final_content, str) and len(final_content) > emitted and final_content.startswith(content[:emitted]):
+            # 补发缓存的文本（或供应商未按流式返回时的全部文本）
+            yield {"type": "content", "delta": final_content[emitted:]}
+        yield {"type": "done", "result": result}
+    
+    def _rate_limiters(self, service: LLMService, model: str) -> List[RateLimiter]:
+        """请求需要经过的限流器：模型单独的限制在前，供应商所有模型合计的限制在后"""
+        config = service.config
+        limiters = []
+        model_limit = (config.modelRateLimits or {}).get(model)
+        if model_limit and (model_limit.rpm or model_limit.tpm):
+            limiters.append(self._rate_limiter((service.name, model), model_limit.rpm, model_limit.tpm))
+        if config.rpm or config.tpm:
+            limiters.append(self._rate_limiter((service.name, None), config.rpm, config.tpm))
+        return limiters
+    
+    def _rate_limiter(self, key: Tuple[str, Optional[str]], rpm: Optional[int], tpm: Optional[int]) -> RateLimiter:
+        limiter = self.rate_limiters.get(key)
+        if limiter is None:
+            name = f"{key[0]}/{key[1]}" if key[1] else key[0]
+            limiter = self.rate_limiters[key] = RateLimiter(name, rpm=rpm, tpm=tpm)
+        return limiter
+    
+    def _drop_rate_limiters(self, provider_name: str) -> None:
+        """供应商配置变化或被移除时丢弃其限流器，下次请求按新配置重建"""
+        for key in [key for key in self.rate_limiters if key[0] == provider_name]:
+            del self.rate_limiters[key]
+    
+    async def _acquire_rate_limits(self,
+                                   service: LLMService,
+                                   model: Optional[str],
+                                   messages: List[Dict[str, Any]],
+                                   tools: Optional[List[Dict[str, Any]]],
+                                   max_tokens: Optional[int]) -> Tuple[List[RateLimiter], int]:
+        """在供应商/模型的限流器中排队获取额度，多个限流器共用同一个最长等待时间
+        
+        Returns:
+            Tuple[List[RateLimiter], int]: (已获取额度的限流器, 预估的token数)
             
-            if "error" in response:
-                logger.error(f"LLM对话失败: {response['error']}")
-                return response
-                
+        Raises:
+            RateLimitWaitError: 预计等待时间超过最长等待
+        """
+        limiters = self._rate_limiters(service, model or (service.models[0] if service.models else ""))
+        if not limiters:
+            return [], 0
+        estimated = estimate_request_tokens(messages, tools, max_tokens)
+        max_wait = service.config.rateLimitMaxWait
+        if max_wait is None:
+            max_wait = settings.LLM_RATE_LIMIT_MAX_WAIT
+        start = time.monotonic()
+        acquired: List[RateLimiter] = []
+        try:
+            for limiter in limiters:
+                await limiter.acquire(estimated, max_wait=max(0.0, max_wait - (time.monotonic() - start)))
+                acquired.append(limiter)
+        except BaseException:
+            # 请求不会发出，归还已获取的请求数和token额度
+            self._release_rate_limits(acquired, estimated)
+            raise
+        waited = time.monotonic() - start
+        if waited >= 0.1:
+            logger.info(f"供应商 {service.name} 达到速率限制，请求排队 {waited:.2f} 秒")
+        return acquired, estimated
+    
+    def _settle_rate_limits(self, limiters: List[RateLimiter], estimated: int, response: Dict[str, Any]) -> None:
+        """请求结束后修正TPM额度：熔断拒绝（请求未发出）时退还预估，有用量时按实际用量修正"""
+        if response.get("error_type") == "circuit_open":
+            self._refund_rate_limits(limiters, estimated)
+            return
+        for limiter in limiters:
+            limiter.record_usage(estimated, (response.get("usage") or {}).get("total_tokens"))
+    
+    @staticmethod
+    def _refund_rate_limits(limiters: List[RateLimiter], estimated: int) -> None:
+        """退还预估的TPM额度"""
+        for limiter in limiters:
+            limiter.refund(estimated)
+
+    @staticmethod
+    def _release_rate_limits(limiters: List[RateLimiter], estimated: int) -> None:
+        """归还预估的TPM额度和请求数（RPM）额度"""
+        for limiter in limiters:
+            limiter.release(estimated)
+    
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """获取各限流器的额度与排队等待统计"""
+        return {limiter.name: limiter.stats() for limiter in self.rate_limiters.values()}
+    
+    def _latency_histogram(self, provider_name: str, model: str) -> LatencyHistogram:
+        key = (provider_name, model)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = LatencyHistogram(LLM_LATENCY_BUCKETS)
+        return histogram
+    
+    def _hedge_delay(self, group: ModelGroupConfig, member: ModelGroupMember) -> float:
+        """成员的对冲等待时间：样本足够时取观测的p95延迟，否则使用配置的默认值"""
+        histogram = self.latency.get((member.provider, member.model))
+        if histogram and histogram.count >= settings.LLM_HEDGE_MIN_SAMPLES:
+            return histogram.quantile(0.95)
+        return group.hedgeDelay if group.hedgeDelay is not None else settings.LLM_HEDGE_DEFAULT_DELAY
+    
+    def _group_members(self, group: ModelGroupConfig) -> List[ModelGroupMember]:
+        """模型组中已配置供应商的成员（跳过不存在的供应商，成员不能是模型组）"""
+        members = [member for member in group.members if member.provider in self.providers]
+        if len(members) < len(group.members):
+            logger.warning(f"模型组 {group.name} 中有成员的供应商不存在，已跳过")
+        return members
+    
+    async def _chat_with_group(self,
+                               group: ModelGroupConfig,
+                               messages: List[Dict[str, Any]],
+                               tools: Optional[List[Dict[str, Any]]],
+                               temperature: float,
+                               max_tokens: Optional[int]) -> Dict[str, Any]:
+        """在模型组中对话：成员出错（NON_FAILOVER_ERRORS 除外）时切换到下一个成员，开启对冲时最多同时有两个成员在处理同一请求"""
+        members = self._group_members(group)
+        if not members:
+            return {"error": f"模型组 {group.name} 没有可用的供应商"}
+        
+        pending: Dict[asyncio.Task, ModelGroupMember] = {}
+        next_index = 0
+        launched_at = 0.0
+        last_error: Dict[str, Any] = {"error": f"模型组 {group.name} 的所有成员都调用失败"}
+        
+        def launch() -> None:
+            nonlocal next_index, launched_at
+            member = members[next_index]
+            next_index += 1
+            launched_at = time.monotonic()
+            logger.info(f"模型组 {group.name} 使用成员 {member.provider}/{member.model}")
+            task = asyncio.create_task(self.chat_with_tools(
+                member.provider, member.model, messages, tools, temperature, max_tokens
+            ))
+            pending[task] = member
+        
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if group.hedge and len(pending) == 1 and next_index < len(members):
+                    member = next(iter(pending.values()))
+                    timeout = max(0.0, self._hedge_delay(group, member) - (time.monotonic() - launched_at))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    member = next(iter(pending.values()))
+                    logger.info(f"模型组 {group.name} 成员 {member.provider}/{member.model} 响应慢，发送对冲请求")
+                    launch()
+                    continue
+                for task in done:
+                    member = pending.pop(task)
+                    result = task.result()
+                    if not should_failover(result):
+                        # 成功，或换成员也会重复出现的错误（认证、请求格式、上下文超长等）
+                        return result
+                    logger.warning(f"模型组 {group.name} 成员 {member.provider}/{member.model} 调用失败: {result['error']}")
+                    last_error = result
+                if not pending and next_index < len(members):
+                    launch()
+            return last_error
+        finally:
+            # 取消较慢的对冲请求
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _stream_with_group(self,
+                                 group: ModelGroupConfig,
+                                 messages: List[Dict[str, Any]],
+                                 tools: Optional[List[Dict[str, Any]]],
+                                 temperature: float,
+                                 max_tokens: Optional[int]) -> AsyncIterator[Dict[str, Any]]:
+        """在模型组中流式对话：成员在产出任何内容之前出错时切换到下一个成员（流式输出不做对冲）"""
+        members = self._group_members(group)
+        result: Dict[str, Any] = {"error": f"模型组 {group.name} 没有可用的供应商"}
+        for member in members:
+            logger.info(f"模型组 {group.name} 使用成员 {member.provider}/{member.model}")
+            produced = False
+            async for event in self.stream_chat_with_tools(
+                member.provider, member.model, messages, tools, temperature, max_tokens
+            ):
+                if event["type"] == "done":
+                    result = event["result"]
+                else:
+                    produced = True
+                    yield event
+            if produced or not should_failover(result):
+                break
+            logger.warning(f"模型组 {group.name} 成员 {member.provider}/{member.model} 调用失败: {result['error']}")
+        yield {"type": "done", "result": result}
+    
+    @staticmethod
+    def _may_be_text_tool_call(content: str) -> bool:
+        """文本是否可能是以JSON或DeepSeek标记形式输出的工具调用（见 _parse_completion）"""
+        stripped = content.lstrip()
+        return not stripped or stripped.startswith("{") or stripped.startswith("<")
+    
+    def _parse_completion(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """把补全响应解析为普通消息（content）或工具调用（tool_calls）
+        
+        除原生 tool_calls 外，还识别以JSON文本和DeepSeek标记形式输出的工具调用。
+        """
+        try:
             # 处理响应
             logger.info(f"收到LLM响应: {json.dumps(response, ensure_ascii=False)[:200]}...")
             
@@ -679,9 +1325,8 @@ class LLMServiceManager:
             else:
                 logger.error(f"LLM响应格式错误: {json.dumps(response, ensure_ascii=False)[:200]}...")
                 return {"error": "LLM响应格式错误", "raw_response": response}
-                
         except Exception as e:
-            logger.error(f"chat_with_tools失败: {str(e)}", exc_info=True)
+            logger.error(f"解析LLM响应失败: {str(e)}", exc_info=True)
             return {"error": f"对话失败: {str(e)}"}
 
     def get_service(self, provider_name: str):
@@ -732,141 +1377,12 @@ class ProviderManager:
             Dict[str, Any]: LLM响应，包含消息内容或工具调用
         """
         try:
-            # 获取LLM服务
-            service = self.llm_service_manager.get_provider(provider_name)
-            if not service:
+            # 检查LLM供应商（或模型组）
+            if not self.llm_service_manager.has_provider(provider_name):
                 logger.error(f"未找到LLM供应商: {provider_name}")
                 return {"error": f"未找到LLM供应商: {provider_name}"}
                 
-            # 准备工具描述
-            tools_desc = ""
-            if tools:
-                for tool in tools:
-                    tool_desc = f"\n- {tool['name']}: {tool.get('description', '无描述')}"
-                    if "parameters" in tool:
-                        params = tool["parameters"].get("properties", {})
-                        required = tool["parameters"].get("required", [])
-                        tool_desc += "\n  参数:"
-                        for param_name, param_info in params.items():
-                            is_required = param_name in required
-                            tool_desc += f"\n    - {param_name}: {param_info.get('description', '无描述')}"
-                            if is_required:
-                                tool_desc += " (必需)"
-                    tools_desc += tool_desc
-                
-            # 准备系统消息
-            system_content = (
-                "你是一个能够使用外部工具的助手，可以使用以下工具：\n"
-                f"{tools_desc}\n\n"
-                "使用工具时必须严格遵循以下规则：\n"
-                "1. 只能使用上面列出的工具，不要使用未定义的工具\n"
-                "2. 工具名称必须精确匹配，不要修改或简化工具名称\n"
-                "3. 当需要使用工具时，请生成完全符合JSON格式的工具调用，不要有任何额外文本\n"
-                "4. JSON格式必须包含 'tool' 和 'arguments' 两个字段\n"
-                "5. 'tool' 字段是工具名称，'arguments' 字段是包含参数的对象\n"
-                "6. 不要使用代码块或引号包裹JSON，直接输出原始JSON\n"
-                "7. 不要自己猜测或伪造工具执行结果\n"
-                "8. 确保参数完全符合工具要求，参数名必须精确匹配\n"
-                "9. 当调用查询类工具时，生成合适的查询语句，确保语法正确\n"
-                "10. mysql 有4个工具 list_databases,list_tables,describe_table,execute_query 提问mysql时，请使用这些工具,严禁使用其它工具 \n"
-                "11. influxdb 有4个工具 write_data,query_data,create_bucket,create_org 提问influxdb时，请使用这些工具 严禁使用其它工具  \n"
-                "12. brave-search 有4个工具 brave_web_search,brave_local_search 提问brave-search时，请使用这些工具 严禁使用其它工具 \n"
-                "13. filesystem 有11 个工具，分别是read_file,read_multiple_files,write_file,edit_file,create_directory,list_directory,directory_tree,move_file,search_files,get_file_info,list_allowed_directories ,对本地文件系统进行操作，请使用这些工具，严禁使用其它工具\n"
-                "14. iot-checker 有2个工具 query_equip_data,run_Flux_to_query 提问iot-checker, 与 iot 有关的信息时，需要参数 tenantCode 是客户/租户编码，equipmentName 是设备名称，startTime 是指时间范围，请使用这些工具 严禁使用其它工具 \n"
-                "15. baidu-map 有8个工具 都是map_ 开头 ,提问与地图有关的信息时，如一个地点的天气，位置，距离测量，地理规划等请使用这些工具 严禁使用其它工具 \n"
-               
-                "工具调用格式示例：\n"
-                "{\n"
-                '  "tool": "工具名称",\n'
-                '  "arguments": {\n'
-                '    "参数1": "值1",\n'
-                '    "参数2": "值2"\n'
-                '  }\n'
-                "}\n\n"
-                "特别地，如果是有关InfluxDB 查询工具，一定要使用以下的格式：\n"
-                "{\n"
-                '  "tool": "query-data",\n'
-                '  "arguments": {\n'
-                '    "org": "neuron",\n'
-                '    "query": "from(bucket: \\"system\\") |> range(start: -1h) |> filter(fn: (r) => r._measurement == \\"cpu\\")" \n'
-                '  }\n'
-                "}\n\n"
-                "InfluxDB查询使用Flux语言而不是SQL。以下是一些常用的Flux查询示例：\n"
-                "- 列出所有buckets: buckets()\n"
-                "- 查询指定bucket: from(bucket: \"mybucket\") |> range(start: -1h)\n"
-                "- 筛选数据: from(bucket: \"mybucket\") |> range(start: -1h) |> filter(fn: (r) => r._measurement == \"cpu\")\n"
-                "注意不要使用SQL语法（如SELECT, SHOW DATABASES等），这些在Flux中不适用。\n\n"
-                "如果用户请求不需要使用工具或没有可用工具，请直接用自然语言回答。\n"
-                "如果用户请求需要使用工具但没有合适的工具可用，请告知用户该功能暂不支持。\n"
-                "map_geocode 输入参数是 address 地址信息\n"
-                "map_reverse_geocode 输入要参数 location 经纬度\n"
-                "map_search_places 输入要参数 query 关键词 location  圆形中心点、radius 半径、region 城市\n"
-                "map_place_details 输入要参数 uid\n"
-                "map_distance_matrix 输入要参数  origins 起点列表、destinations 终点列表、mode 出行方式，如 driving）\n"
-                "map_directions 输入要参数 origin（起点）、destination（终点）、mode（出行方式，如 transit）\n"
-                "map_weather 输入要参数 district_id 行政区编码 或 location  经纬度\n"
-                "地址信息之类查询需要组合查询，如查询一个地点的天气，需要先查询地点的经纬度，然后使用map_weather工具查询天气信息。\n"
-             )
-            
-            if tools:
-                logger.info(f"可用工具数量: {len(tools)}")
-                for tool in tools:
-                    logger.info(f"工具: {tool['name']}")
-            
-            # 格式化消息
-            formatted_messages = [
-                {"role": "system", "content": system_content}
-            ]
-            
-            # 添加历史消息
-            for msg in messages:
-                if not isinstance(msg, dict):
-                    logger.warning(f"跳过非字典消息: {msg}")
-                    continue
-                    
-                # 获取基本消息属性
-                role = msg.get("role", "user")
-                content = msg.get("content")
-                
-                # 如果content是字典，需要特殊处理
-                if isinstance(content, dict):
-                    # 如果是工具调用
-                    if "tool_call" in content:
-                        tool_call = content["tool_call"]
-                        formatted_messages.append({
-                            "role": "assistant",
-                            "content": None,
-                            "tool_calls": [{
-                                "id": str(uuid.uuid4()),
-                                "type": "function",
-                                "function": {
-                                    "name": tool_call["name"],
-                                    "arguments": json.dumps(tool_call["arguments"])
-                                }
-                            }]
-                        })
-                    # 如果是工具结果
-                    elif "name" in content and "result" in content:
-                        formatted_messages.append({
-                            "role": "tool",
-                            "content": str(content["result"]),
-                            "tool_call_id": str(uuid.uuid4())
-                        })
-                    # 其他情况，转换为字符串
-                    else:
-                        formatted_messages.append({
-                            "role": role,
-                            "content": json.dumps(content)
-                        })
-                else:
-                    # 普通消息
-                    formatted_messages.append({
-                        "role": role,
-                        "content": str(content) if content is not None else ""
-                    })
-            
-            logger.info(f"发送到LLM的消息数量: {len(formatted_messages)}")
-            logger.debug(f"格式化后的消息: {json.dumps(formatted_messages, ensure_ascii=False)}")
+            formatted_messages = self._build_messages(messages, tools)
             
             # 调用LLM服务
             return await self.llm_service_manager.chat_with_tools(
@@ -878,7 +1394,180 @@ class ProviderManager:
             
         except Exception as e:
             logger.error(f"chat_with_tools失败: {str(e)}", exc_info=True)
-            return {"error": f"对话失败: {str(e)}"}
+            return {"error": f"对话失败: {str(e)}", "error_type": classify_exception(e)}
+    
+    async def stream_chat_with_tools(self,
+                                     provider_name: str,
+                                     model: str,
+                                     messages: List[Dict[str, Any]],
+                                     tools: Optional[List[Dict[str, Any]]] = None
+                                     ) -> AsyncIterator[Dict[str, Any]]:
+        """使用工具进行流式对话
+        
+        Args:
+            provider_name: LLM供应商名称
+            model: 模型名称
+            messages: 对话历史消息
+            tools: 可用的工具列表
+            
+        Yields:
+            Dict[str, Any]: 文本和工具调用的增量事件，最后一个事件为
+            {"type": "done", "result": 与chat_with_tools相同的返回值}
+        """
+        if not self.llm_service_manager.has_provider(provider_name):
+            logger.error(f"未找到LLM供应商: {provider_name}")
+            yield {"type": "done", "result": {"error": f"未找到LLM供应商: {provider_name}"}}
+            return
+        
+        try:
+            formatted_messages = self._build_messages(messages, tools)
+        except Exception as e:
+            logger.error(f"stream_chat_with_tools失败: {str(e)}", exc_info=True)
+            yield {"type": "done", "result": {"error": f"对话失败: {str(e)}"}}
+            return
+        
+        async for event in self.llm_service_manager.stream_chat_with_tools(
+            provider_name=provider_name,
+            model=model,
+            messages=formatted_messages,
+            tools=tools
+        ):
+            yield event
+    
+    def _build_messages(self,
+                        messages: List[Dict[str, Any]],
+                        tools: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """在会话消息前加入描述可用工具的系统消息，并把会话中的工具调用和结果转换为LLM消息格式"""
+        # 准备工具描述
+        tools_desc = ""
+        if tools:
+            for tool in tools:
+                tool_desc = f"\n- {tool['name']}: {tool.get('description', '无描述')}"
+                if "parameters" in tool:
+                    params = tool["parameters"].get("properties", {})
+                    required = tool["parameters"].get("required", [])
+                    tool_desc += "\n  参数:"
+                    for param_name, param_info in params.items():
+                        is_required = param_name in required
+                        tool_desc += f"\n    - {param_name}: {param_info.get('description', '无描述')}"
+                        if is_required:
+                            tool_desc += " (必需)"
+                tools_desc += tool_desc
+
+        # 准备系统消息
+        system_content = (
+            "你是一个能够使用外部工具的助手，可以使用以下工具：\n"
+            f"{tools_desc}\n\n"
+            "使用工具时必须严格遵循以下规则：\n"
+            "1. 只能使用上面列出的工具，不要使用未定义的工具\n"
+            "2. 工具名称必须精确匹配，不要修改或简化工具名称\n"
+            "3. 当需要使用工具时，请生成完全符合JSON格式的工具调用，不要有任何额外文本\n"
+            "4. JSON格式必须包含 'tool' 和 'arguments' 两个字段\n"
+            "5. 'tool' 字段是工具名称，'arguments' 字段是包含参数的对象\n"
+            "6. 不要使用代码块或引号包裹JSON，直接输出原始JSON\n"
+            "7. 不要自己猜测或伪造工具执行结果\n"
+            "8. 确保参数完全符合工具要求，参数名必须精确匹配\n"
+            "9. 当调用查询类工具时，生成合适的查询语句，确保语法正确\n"
+            "10. mysql 有4个工具 list_databases,list_tables,describe_table,execute_query 提问mysql时，请使用这些工具,严禁使用其它工具 \n"
+            "11. influxdb 有4个工具 write_data,query_data,create_bucket,create_org 提问influxdb时，请使用这些工具 严禁使用其它工具  \n"
+            "12. brave-search 有4个工具 brave_web_search,brave_local_search 提问brave-search时，请使用这些工具 严禁使用其它工具 \n"
+            "13. filesystem 有11 个工具，分别是read_file,read_multiple_files,write_file,edit_file,create_directory,list_directory,directory_tree,move_file,search_files,get_file_info,list_allowed_directories ,对本地文件系统进行操作，请使用这些工具，严禁使用其它工具\n"
+            "14. iot-checker 有2个工具 query_equip_data,run_Flux_to_query 提问iot-checker, 与 iot 有关的信息时，需要参数 tenantCode 是客户/租户编码，equipmentName 是设备名称，startTime 是指时间范围，请使用这些工具 严禁使用其它工具 \n"
+            "15. baidu-map 有8个工具 都是map_ 开头 ,提问与地图有关的信息时，如一个地点的天气，位置，距离测量，地理规划等请使用这些工具 严禁使用其它工具 \n"
+
+            "工具调用格式示例：\n"
+            "{\n"
+            '  "tool": "工具名称",\n'
+            '  "arguments": {\n'
+            '    "参数1": "值1",\n'
+            '    "参数2": "值2"\n'
+            '  }\n'
+            "}\n\n"
+            "特别地，如果是有关InfluxDB 查询工具，一定要使用以下的格式：\n"
+            "{\n"
+            '  "tool": "query-data",\n'
+            '  "arguments": {\n'
+            '    "org": "neuron",\n'
+            '    "query": "from(bucket: \\"system\\") |> range(start: -1h) |> filter(fn: (r) => r._measurement == \\"cpu\\")" \n'
+            '  }\n'
+            "}\n\n"
+            "InfluxDB查询使用Flux语言而不是SQL。以下是一些常用的Flux查询示例：\n"
+            "- 列出所有buckets: buckets()\n"
+            "- 查询指定bucket: from(bucket: \"mybucket\") |> range(start: -1h)\n"
+            "- 筛选数据: from(bucket: \"mybucket\") |> range(start: -1h) |> filter(fn: (r) => r._measurement == \"cpu\")\n"
+            "注意不要使用SQL语法（如SELECT, SHOW DATABASES等），这些在Flux中不适用。\n\n"
+            "如果用户请求不需要使用工具或没有可用工具，请直接用自然语言回答。\n"
+            "如果用户请求需要使用工具但没有合适的工具可用，请告知用户该功能暂不支持。\n"
+            "map_geocode 输入参数是 address 地址信息\n"
+            "map_reverse_geocode 输入要参数 location 经纬度\n"
+            "map_search_places 输入要参数 query 关键词 location  圆形中心点、radius 半径、region 城市\n"
+            "map_place_details 输入要参数 uid\n"
+            "map_distance_matrix 输入要参数  origins 起点列表、destinations 终点列表、mode 出行方式，如 driving）\n"
+            "map_directions 输入要参数 origin（起点）、destination（终点）、mode（出行方式，如 transit）\n"
+            "map_weather 输入要参数 district_id 行政区编码 或 location  经纬度\n"
+            "地址信息之类查询需要组合查询，如查询一个地点的天气，需要先查询地点的经纬度，然后使用map_weather工具查询天气信息。\n"
+         )
+
+        if tools:
+            logger.info(f"可用工具数量: {len(tools)}")
+            for tool in tools:
+                logger.info(f"工具: {tool['name']}")
+
+        # 格式化消息
+        formatted_messages = [
+            {"role": "system", "content": system_content}
+        ]
+
+        # 添加历史消息
+        for msg in messages:
+            if not isinstance(msg, dict):
+                logger.warning(f"跳过非字典消息: {msg}")
+                continue
+
+            # 获取基本消息属性
+            role = msg.get("role", "user")
+            content = msg.get("content")
+
+            # 如果content是字典，需要特殊处理
+            if isinstance(content, dict):
+                # 如果是工具调用
+                if "tool_call" in content:
+                    tool_call = content["tool_call"]
+                    formatted_messages.append({
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [{
+                            "id": str(uuid.uuid4()),
+                            "type": "function",
+                            "function": {
+                                "name": tool_call["name"],
+                                "arguments": json.dumps(tool_call["arguments"])
+                            }
+                        }]
+                    })
+                # 如果是工具结果
+                elif "name" in content and "result" in content:
+                    formatted_messages.append({
+                        "role": "tool",
+                        "content": str(content["result"]),
+                        "tool_call_id": str(uuid.uuid4())
+                    })
+                # 其他情况，转换为字符串
+                else:
+                    formatted_messages.append({
+                        "role": role,
+                        "content": json.dumps(content)
+                    })
+            else:
+                # 普通消息
+                formatted_messages.append({
+                    "role": role,
+                    "content": str(content) if content is not None else ""
+                })
+
+        logger.info(f"发送到LLM的消息数量: {len(formatted_messages)}")
+        logger.debug(f"格式化后的消息: {json.dumps(formatted_messages, ensure_ascii=False)}")
+        return formatted_messages
             
     def get_service(self, provider_name: str):
         """
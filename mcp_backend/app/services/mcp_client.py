@@ -1,9 +1,10 @@
 import asyncio
+import itertools
 import json
 import logging
 import os
-from contextlib import AsyncExitStack
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import AsyncExitStack, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 import traceback
 import time
 import httpx
@@ -11,6 +12,7 @@ import httpx
 # 正确导入stdio_client和相关函数
 try:
     from mcp import ClientSession, StdioServerParameters
+    from mcp import types as mcp_types
     from mcp.client.stdio import stdio_client
     logging.info("Successfully imported stdio_client from mcp.client.stdio")
 except ImportError:
@@ -19,17 +21,25 @@ except ImportError:
     def stdio_client(*args, **kwargs):
         raise ImportError("stdio_client could not be imported")
 
-# 尝试导入sse相关模块
+# 远程传输（SSE / Streamable HTTP），共享同一个HTTP连接池
 try:
-    # 检查是否有sse相关模块
-    from mcp.client.sse import sse_client
-    logging.info("Successfully imported sse_client from mcp.client.sse")
+    from app.services.mcp_transports import close_http_client, sse_client, streamable_http_client
+    logging.info("Successfully imported remote transports from app.services.mcp_transports")
 except ImportError:
-    logging.error("Failed to import sse_client from mcp.client.sse")
+    logging.error("Failed to import remote transports from app.services.mcp_transports")
     # 提供空函数以避免运行时错误
     def sse_client(*args, **kwargs):
         raise ImportError("sse_client could not be imported")
 
+    def streamable_http_client(*args, **kwargs):
+        raise ImportError("streamable_http_client could not be imported")
+
+    async def close_http_client() -> None:
+        pass
+
+# 通过HTTP连接的远程服务器类型
+REMOTE_CONNECTION_TYPES: Tuple[str, ...] = ("sse", "streamable_http")
+
 # 尝试导入ErrorCodes，如果不可用则创建一个本地替代类
 try:
     from mcp.types import ErrorCodes
@@ -48,171 +58,723 @@ except ImportError:
             INVALID_REQUEST = "InvalidRequest"
             METHOD_NOT_FOUND = "MethodNotFound"
 
+try:
+    import anyio
+    # 传输层断开时 MCP SDK 抛出的异常类型
+    TRANSPORT_ERRORS: Tuple[type, ...] = (
+        ConnectionError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream
+    )
+except ImportError:
+    TRANSPORT_ERRORS = (ConnectionError,)
+
 from app.core.config import settings
 from app.models.mcp_server_config import MCPServerConfig
+from app.models.tool_result import ToolResult
 from app.services.llm_service import provider_manager
+from app.utils.backoff import backoff_delay
+from app.utils.cache import MISSING, TTLCache, canonical_arguments
+from app.utils.catalog_store import CatalogStore
+from app.utils.concurrency import FairLimiter, QueueFullError, SingleFlight
+from app.utils.histogram import LatencyHistogram
+from app.utils.progress import ProgressBroker
 
 logger = logging.getLogger(__name__)
 
+# 目录版本号全局单调递增，服务器重建后版本号也不会与旧缓存冲突
+_catalog_versions = itertools.count(1)
+
+def paginate(items: List[Any], cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[Any], Optional[str]]:
+    """按游标对已缓存的列表分页
+
+    游标对调用方是不透明的字符串（内部为偏移量）。
+
+    Args:
+        items: 完整列表
+        cursor: 上一页返回的nextCursor，为空时从头开始
+        limit: 每页数量，为空时使用 MCP_CATALOG_PAGE_SIZE
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: 本页条目和下一页游标（没有更多时为None）
+
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise ValueError(f"无效的游标: {cursor}")
+    if offset < 0:
+        raise ValueError(f"无效的游标: {cursor}")
+    limit = min(limit or settings.MCP_CATALOG_PAGE_SIZE, settings.MCP_CATALOG_MAX_PAGE_SIZE)
+    end = offset + max(1, limit)
+    return items[offset:end], (str(end) if end < len(items) else None)
+
+# 目录变化通知与目录类型的对应关系
+CATALOG_NOTIFICATIONS: Dict[str, str] = {
+    "notifications/tools/list_changed": "tools",
+    "notifications/resources/list_changed": "resources",
+    "notifications/prompts/list_changed": "prompts",
+}
+
+
+class ToolTimeoutError(RuntimeError):
+    """工具调用超过截止时间，请求已在服务器端取消"""
+
+
+class ToolCancelledError(RuntimeError):
+    """工具调用被调用方主动取消"""
+
+
+class NotifyingClientSession(ClientSession):
+    """将服务器推送的通知转发给回调的ClientSession"""
+
+    def __init__(self, read_stream, write_stream, notification_handler=None, **kwargs):
+        super().__init__(read_stream, write_stream, **kwargs)
+        self._notification_handler = notification_handler
+
+    async def __aenter__(self):
+        session = await super().__aenter__()
+        # SDK的接收循环会把通知和未知请求ID的响应写入无缓冲的incoming流，
+        # 没有消费者时接收循环会被阻塞，因此在会话内持续排空该流
+        self._task_group.start_soon(self._drain_incoming_messages)
+        return session
+
+    async def _drain_incoming_messages(self) -> None:
+        async for message in self.incoming_messages:
+            if isinstance(message, Exception):
+                # 通常是已超时或已取消请求的迟到响应，其响应流已移除，直接丢弃
+                logger.debug(f"丢弃会话消息: {str(message)[:200]}")
+
+    async def call_tool_until(self, name: str, arguments: Optional[Dict[str, Any]],
+                              deadline: Optional[float], progress_token: Optional[str] = None) -> Any:
+        """在截止时间前执行工具调用
+
+        超时或调用方取消时向服务器发送 notifications/cancelled，并移除该请求的响应流，
+        之后迟到的响应按未知请求ID丢弃，不会在会话中残留。
+
+        Args:
+            name: 工具名称
+            arguments: 工具参数
+            deadline: 截止时间（事件循环时间 loop.time()），为空时不限制
+            progress_token: 附加到请求 _meta 的进度令牌，服务器据此发送 notifications/progress
+
+        Returns:
+            Any: CallToolResult
+
+        Raises:
+            TimeoutError: 截止时间已到
+        """
+        if progress_token is None:
+            return await self._request_until(deadline, lambda: self.call_tool(name, arguments))
+        params = mcp_types.CallToolRequestParams.model_validate({
+            "name": name,
+            "arguments": arguments,
+            "_meta": {"progressToken": progress_token}
+        })
+        return await self._request_until(deadline, lambda: self.send_request(
+            mcp_types.ClientRequest(mcp_types.CallToolRequest(method="tools/call", params=params)),
+            mcp_types.CallToolResult
+        ))
+
+    async def ping_until(self, deadline: Optional[float]) -> Any:
+        """在截止时间前发送ping，超时时与 call_tool_until 一样移除响应流
+
+        Raises:
+            TimeoutError: 截止时间已到
+        """
+        return await self._request_until(deadline, self.send_ping)
+
+    async def _request_until(self, deadline: Optional[float], send: Callable[[], Awaitable[Any]]) -> Any:
+        """在截止时间前完成一次请求，超时或取消时放弃该请求"""
+        # send_request 在第一次await之前分配请求ID，此处读取的就是本次请求的ID
+        request_id = self._request_id
+        try:
+            async with asyncio.timeout_at(deadline):
+                return await send()
+        except TimeoutError:
+            await self._abandon_request(request_id, "timeout")
+            raise
+        except asyncio.CancelledError:
+            await self._abandon_request(request_id, "cancelled by client")
+            raise
+
+    async def _abandon_request(self, request_id: int, reason: str) -> None:
+        """移除请求的响应流并通知服务器取消该请求"""
+        stream = self._response_streams.pop(request_id, None)
+        if stream is None:
+            # 响应已经到达
+            return
+        stream.close()
+        try:
+            await self.send_notification(mcp_types.ClientNotification(
+                mcp_types.CancelledNotification(
+                    method="notifications/cancelled",
+                    params=mcp_types.CancelledNotificationParams(requestId=request_id, reason=reason)
+                )
+            ))
+        except Exception as e:
+            logger.warning(f"发送取消通知失败 (request_id={request_id}): {str(e)}")
+
+    async def _received_notification(self, notification) -> None:
+        await super()._received_notification(notification)
+        if self._notification_handler:
+            # 回调在接收循环中执行，不能在其中等待对同一会话的请求
+            try:
+                await self._notification_handler(getattr(notification, "root", notification))
+            except Exception as e:
+                logger.error(f"处理服务器通知失败: {str(e)}", exc_info=True)
+
+
 class Server:
-    """Manages MCP server connections and tool execution."""
+    """Manages MCP server connections and tool execution.
+
+    每个服务器由一个监管任务（supervisor）持有传输连接（stdio子进程或SSE流），
+    连接的建立与关闭都在该任务内完成；连接断开后在后台按带抖动的指数退避重连。
+
+    stdio服务器配置 replicas > 1 时，额外启动若干副本进程（同样是Server实例，各自监管和重连），
+    工具调用按未完成请求数最少分发到已就绪的副本；目录只由主实例获取和维护。
+
+    配置 warm_standby 时再启动一个已初始化但不接收请求的热备进程：主实例或某个副本断开时，
+    热备进程立即被提升到它的位置接收工具调用，不在请求中等待进程重启，同时在后台补充新的热备进程。
+    断开的副本被回收；主实例持有目录不能替换，它在后台重连，恢复后回收提升的实例。
+    """
 
-    def __init__(self, name: str, config: Dict[str, Any]) -> None:
+    def __init__(self, name: str, config: Dict[str, Any], primary: Optional["Server"] = None) -> None:
         self.name: str = name
         self.config: Dict[str, Any] = config
+        # 副本所属的主实例；主实例自身为None
+        self.primary: Optional["Server"] = primary
+        self.replicas: List["Server"] = []
+        # 热备进程，主实例或副本断开时被提升为副本
+        self.standby: Optional["Server"] = None
+        # 主实例断开时提升的热备实例，主实例恢复后回收
+        self._promoted: List["Server"] = []
+        # 被替换的实例的后台清理任务
+        self._retiring: set = set()
+        self.failovers: int = 0
+        # 休眠中的服务器没有进程，但保留目录缓存；下次使用时重新连接
+        self.hibernating: bool = False
+        self.last_used_at: float = time.monotonic()
+        # 正在使用该服务器的请求数（从等待唤醒/就绪开始计算），大于0时不会被空闲休眠
+        self._users: int = 0
         self.session: Optional[ClientSession] = None
         self._cleanup_lock: asyncio.Lock = asyncio.Lock()
-        self.exit_stack: AsyncExitStack = AsyncExitStack()
         self._tools_cache: List[Dict[str, Any]] = []
+        # 工具名到工具信息的索引，与 _tools_cache 同步维护
+        self._tools_by_name: Dict[str, Dict[str, Any]] = {}
         self._resources_cache: List[Dict[str, Any]] = []
+        self._prompts_cache: List[Dict[str, Any]] = []
+        # 已从服务器获取过的目录类型，用于区分"目录为空"和"尚未获取"
+        self._catalogs_loaded: set = set()
+        # 目录变化时的回调，由 MCPClientManager 设置以维护全局路由索引
+        self.on_catalog_changed: Optional[Callable[["Server"], None]] = None
+        # 资源内容变化时的回调，参数为资源URI；None表示该服务器的全部资源都可能已变化
+        self.on_resource_updated: Optional[Callable[["Server", Optional[str]], None]] = None
+        # 主实例建立新会话（首次连接、重连或唤醒）时的回调，新进程不继承旧进程的状态
+        self.on_session_started: Optional[Callable[["Server"], None]] = None
+        # 工具调用进度通知的回调，参数为进度令牌和 notifications/progress 的参数
+        self.on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        # 当前会话上已订阅更新通知的资源URI，重连后失效
+        self._subscriptions: set = set()
+        # 曾经订阅过的资源URI，重连后在新会话上重新订阅
+        self._wanted_subscriptions: set = set()
+        # 目录版本号，工具/资源/prompt目录任一变化时递增，下游缓存以此为键
+        self.catalog_version: int = next(_catalog_versions)
+        self.server_capabilities: Any = None
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self._refresh_pending: set = set()
+        # 合并并发的按需目录拉取
+        self._catalog_flights: SingleFlight = SingleFlight()
+        # 限制推入同一会话的并发请求，超出部分按调用方公平排队
+        self.limiter: FairLimiter = FairLimiter(
+            config.get("max_in_flight") or settings.MCP_SERVER_MAX_IN_FLIGHT,
+            config.get("max_queue") if config.get("max_queue") is not None else settings.MCP_SERVER_MAX_QUEUE
+        )
+        # 监管任务，在服务器整个生命周期内持有传输连接
         self._task: Optional[asyncio.Task] = None
+        self._ready: asyncio.Event = asyncio.Event()
+        self._stop: asyncio.Event = asyncio.Event()
+        self._connection_lost: asyncio.Event = asyncio.Event()
+        self._first_attempt: Optional[asyncio.Future] = None
+        self._closing: bool = False
+        self.reconnect_attempts: int = 0
+        self.last_error: Optional[str] = None
+        # 心跳健康状态：online / degraded / offline
+        self._health_state: str = "offline"
+        self.health_reason: Optional[str] = None
+        self.ping_latency: LatencyHistogram = LatencyHistogram()
+        self.consecutive_ping_failures: int = 0
+        self.last_ping_at: Optional[float] = None
 
     async def initialize(self) -> None:
-        """Initialize the server connection using MCP SDK."""
+        """启动监管任务并等待首次连接完成。
+
+        如果监管任务已在运行，则等待其重连就绪。首次连接失败时停止监管任务并抛出异常。
+
+        Raises:
+            ValueError: 连接配置无效
+            Exception: 首次连接失败
+        """
+        if self._task and not self._task.done():
+            await self.wait_until_ready()
+            return
+
+        connection_type = self.config.get("type", "stdio")
+        if connection_type in REMOTE_CONNECTION_TYPES and "url" not in self.config:
+            raise ValueError(f"{connection_type} 连接需要指定 url 参数")
+        if connection_type not in ("stdio", *REMOTE_CONNECTION_TYPES):
+            raise ValueError(f"不支持的连接类型: {connection_type}")
+
+        self._first_attempt = asyncio.get_running_loop().create_future()
+        self._start_supervisor()
+
         try:
-            logger.info(f"正在初始化MCP服务器: {self.name}")
-            
-            # 获取连接类型
-            connection_type = self.config.get("type", "stdio")
-            logger.info(f"连接类型: {connection_type}")
-            
-            if connection_type == "stdio":
-                # 创建 stdio 服务器参数
-                server_params = StdioServerParameters(
-                    command=self.config["command"],
-                    args=self.config.get("args", []),
-                    env=self.config.get("env", {})
-                )
-                logger.info(f"服务器参数: command={server_params.command}, args={server_params.args}")
-                
-                # 在新的任务中创建stdio客户端
-                self._task = asyncio.create_task(self._initialize_stdio_session(server_params))
-                await self._task
-            elif connection_type == "sse":
-                # 检查必要参数
-                if "url" not in self.config:
-                    raise ValueError("SSE 连接需要指定 url 参数")
-                    
-                # 在新的任务中创建 SSE 客户端
-                server_url = self.config["url"]
-                logger.info(f"SSE 服务器URL: {server_url}")
-                
-                self._task = asyncio.create_task(self._initialize_sse_session(server_url))
-                await self._task
-            else:
-                raise ValueError(f"不支持的连接类型: {connection_type}")
-            
-            # 缓存工具列表
-            await self._cache_tools()
-            
-            # 缓存资源列表
-            await self._cache_resources()
-            
+            await asyncio.shield(self._first_attempt)
+            self._start_replicas()
+        except asyncio.CancelledError:
+            await self.cleanup()
+            raise
         except Exception as e:
             logger.error(f"初始化服务器失败: {self.name}, 错误: {str(e)}", exc_info=True)
             await self.cleanup()
             raise
 
-    async def _initialize_stdio_session(self, server_params: StdioServerParameters) -> None:
-        """Initialize the session in a separate task."""
+    def _start_supervisor(self) -> None:
+        """启动监管任务"""
+        self._closing = False
+        self._stop.clear()
+        self._connection_lost.clear()
+        self._task = asyncio.create_task(self._supervise(), name=f"mcp-supervisor-{self.name}")
+
+    def _start_replicas(self) -> None:
+        """按配置启动额外的副本进程和热备进程，首次连接失败时也在后台持续重连"""
+        count = int(self.config.get("replicas") or 1)
+        warm_standby = bool(self.config.get("warm_standby"))
+        if count <= 1 and not warm_standby:
+            return
+        if self.config.get("type", "stdio") != "stdio":
+            logger.warning(f"服务器 {self.name} 不是stdio类型，忽略 replicas 和 warm_standby 配置")
+            return
+        if count > 1 and not self.replicas:
+            for index in range(1, count):
+                replica = Server(f"{self.name}#{index}", self.config, primary=self)
+                replica._start_supervisor()
+                self.replicas.append(replica)
+            logger.info(f"服务器 {self.name} 已启动 {count - 1} 个副本进程")
+        if warm_standby and self.standby is None:
+            self._start_standby()
+            logger.info(f"服务器 {self.name} 已启动热备进程")
+
+    def _start_standby(self) -> None:
+        """在后台启动新的热备进程（监管任务负责连接和重连）"""
+        self.standby = Server(f"{self.name}~standby", self.config, primary=self)
+        self.standby._start_supervisor()
+
+    def _retire(self, instance: "Server") -> None:
+        """在后台关闭不再使用的实例"""
+        task = asyncio.create_task(instance.cleanup())
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    def _on_instance_lost(self, instance: "Server") -> None:
+        """主实例或副本断开时，把已就绪的热备进程提升到其位置，并在后台补充新的热备进程"""
+        standby = self.standby
+        if self._closing or standby is None or standby.health_state == "offline":
+            return
+        if instance is self:
+            # 主实例由管理器引用且持有目录，不能替换：热备作为额外的副本接收流量，主实例恢复后回收
+            standby.name = f"{self.name}~promoted"
+            self.replicas.append(standby)
+            self._promoted.append(standby)
+        elif instance in self.replicas:
+            standby.name = instance.name
+            self.replicas[self.replicas.index(instance)] = standby
+            if instance in self._promoted:
+                self._promoted[self._promoted.index(instance)] = standby
+            self._retire(instance)
+        else:
+            return
+        self.failovers += 1
+        logger.warning(f"服务器 {instance.name} 已断开，热备进程已接替，正在后台补充新的热备进程")
+        self._start_standby()
+
+    def _release_promoted(self) -> None:
+        """主实例恢复后回收为其提升的实例，热备进程缺失时改作热备"""
+        while self._promoted:
+            instance = self._promoted.pop()
+            if instance in self.replicas:
+                self.replicas.remove(instance)
+            if self.standby is None or self.standby.health_state == "offline":
+                if self.standby is not None:
+                    self._retire(self.standby)
+                instance.name = f"{self.name}~standby"
+                self.standby = instance
+            else:
+                self._retire(instance)
+            logger.info(f"服务器 {self.name} 已恢复，回收提升的热备实例")
+
+    def pick_replica(self) -> Optional["Server"]:
+        """选择已就绪的实例（主实例或副本），健康实例优先、未完成请求少的优先，都不可用时返回None"""
+        candidates = [server for server in (self, *self.replicas) if server.health_state != "offline"]
+        if not candidates:
+            # 监管任务尚未完成提升时，直接使用已初始化的热备进程
+            if self.standby is not None and self.standby.health_state != "offline":
+                return self.standby
+            return None
+        # 优先选择健康的实例，其次比较未完成请求数
+        return min(candidates, key=lambda server: (
+            server.health_state == "degraded", server.limiter.in_flight + server.limiter.queued
+        ))
+
+    def _resolve_first_attempt(self, error: Optional[BaseException]) -> bool:
+        """通知initialize首次连接的结果，返回是否为首次连接"""
+        future = self._first_attempt
+        if future is None or future.done():
+            return False
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+        return True
+
+    async def _supervise(self) -> None:
+        """监管任务：建立连接、等待断开、按退避策略重连，直到cleanup被调用"""
+        attempt = 0
+        try:
+            while not self._closing:
+                connected = False
+                try:
+                    async with AsyncExitStack() as stack:
+                        await self._open_session(stack)
+
+                        # 缓存工具列表（副本共享主实例的目录）；资源列表可能很大，就绪后在后台获取
+                        if self.primary is None:
+                            await self._cache_tools()
+
+                        # 新会话上没有订阅，断开期间的资源更新也可能已丢失
+                        self._subscriptions.clear()
+                        self._resource_updated(None)
+                        if self.primary is None and self.on_session_started:
+                            try:
+                                self.on_session_started(self)
+                            except Exception as e:
+                                logger.error(f"处理新会话回调失败: {self.name}, 错误: {str(e)}")
+
+                        attempt = 0
+                        self.last_error = None
+                        self.consecutive_ping_failures = 0
+                        self._set_health("online", "已连接")
+                        self._connection_lost.clear()
+                        self._ready.set()
+                        self._resolve_first_attempt(None)
+                        connected = True
+                        logger.info(f"服务器已就绪: {self.name}")
+                        if self._promoted:
+                            self._release_promoted()
+
+                        if self.primary is None:
+                            self._schedule_catalog_refresh("resources")
+                            self._schedule_catalog_refresh("prompts")
+                            if self._wanted_subscriptions:
+                                self._refresh_tasks["subscriptions"] = asyncio.create_task(self._resubscribe())
+                        refresher = asyncio.create_task(self._periodic_catalog_refresh())
+                        try:
+                            await self._wait_for_disconnect()
+                        finally:
+                            refresher.cancel()
+                            self._cancel_catalog_refreshes()
+                except Exception as e:
+                    self.last_error = str(e)
+                    if self._resolve_first_attempt(e):
+                        # 首次连接失败由initialize负责清理
+                        return
+                    if not self._closing:
+                        logger.error(f"服务器连接中断: {self.name}, 错误: {str(e)}")
+                finally:
+                    self.session = None
+                    self._ready.clear()
+                    self._set_health("offline", self.last_error)
+
+                if self._closing:
+                    break
+                owner = self.primary or self
+                if connected and self is not owner.standby:
+                    # 热备进程接替断开的实例
+                    owner._on_instance_lost(self)
+
+                delay = backoff_delay(attempt, settings.MCP_RECONNECT_BASE_DELAY, settings.MCP_RECONNECT_MAX_DELAY)
+                attempt += 1
+                self.reconnect_attempts += 1
+                logger.info(f"将在 {delay:.1f} 秒后重连服务器: {self.name}（第 {attempt} 次）")
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._resolve_first_attempt(RuntimeError(f"服务器 {self.name} 的监管任务已退出"))
+            logger.info(f"监管任务已退出: {self.name}")
+
+    async def _open_session(self, stack: AsyncExitStack) -> None:
+        """在监管任务内建立传输连接和会话，资源登记到传入的stack上"""
+        logger.info(f"正在初始化MCP服务器: {self.name}")
+
+        # 获取连接类型
+        connection_type = self.config.get("type", "stdio")
+        logger.info(f"连接类型: {connection_type}")
+
+        if connection_type == "stdio":
+            # 创建 stdio 服务器参数
+            server_params = StdioServerParameters(
+                command=self.config["command"],
+                args=self.config.get("args") or [],
+                env=self.config.get("env") or {}
+            )
+            logger.info(f"服务器参数: command={server_params.command}, args={server_params.args}")
+            await self._initialize_stdio_session(stack, server_params)
+        elif connection_type in REMOTE_CONNECTION_TYPES:
+            server_url = self.config["url"]
+            logger.info(f"{connection_type} 服务器URL: {server_url}")
+            await self._initialize_remote_session(stack, server_url, connection_type)
+        else:
+            raise ValueError(f"不支持的连接类型: {connection_type}")
+
+    async def _wait_for_disconnect(self) -> None:
+        """阻塞直到连接断开或收到停止信号，期间按心跳间隔ping服务器
+
+        Raises:
+            ConnectionError: 连接已断开或心跳连续失败
+        """
+        interval = self.config.get("heartbeat_interval")
+        if interval is None:
+            interval = settings.MCP_LIVENESS_CHECK_INTERVAL
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._connection_lost.wait(), timeout=interval or None)
+            except asyncio.TimeoutError:
+                await self._heartbeat()
+                continue
+
+            if self._closing:
+                return
+            raise ConnectionError(self.last_error or "连接已断开")
+
+    async def _heartbeat(self) -> None:
+        """发送一次ping，记录往返延迟并更新健康状态
+
+        延迟超过 MCP_HEALTH_DEGRADED_LATENCY 或ping失败时标记为degraded；
+        传输层断开或连续失败达到 MCP_HEALTH_OFFLINE_FAILURES 次时标记为offline。
+
+        Raises:
+            ConnectionError: 服务器已判定为offline，需要重连
+        """
+        start = time.monotonic()
+        self.last_ping_at = time.time()
+        try:
+            # 超时的ping会移除其响应流，不会在会话中残留
+            await self.session.ping_until(asyncio.get_running_loop().time() + settings.MCP_LIVENESS_CHECK_TIMEOUT)
+        except Exception as e:
+            self.consecutive_ping_failures += 1
+            reason = f"心跳失败: {str(e) or type(e).__name__}"
+            if isinstance(e, TRANSPORT_ERRORS) or \
+                    self.consecutive_ping_failures >= settings.MCP_HEALTH_OFFLINE_FAILURES:
+                self._set_health("offline", reason)
+                raise ConnectionError(reason)
+            self._set_health("degraded", f"{reason}（连续 {self.consecutive_ping_failures} 次）")
+            return
+
+        latency = time.monotonic() - start
+        self.ping_latency.observe(latency)
+        self.consecutive_ping_failures = 0
+        if latency > settings.MCP_HEALTH_DEGRADED_LATENCY:
+            self._set_health("degraded", f"心跳延迟过高: {latency:.3f}秒")
+        else:
+            self._set_health("online", None)
+
+    def _set_health(self, state: str, reason: Optional[str]) -> None:
+        """更新健康状态，状态变化时记录日志"""
+        if state != self._health_state:
+            log = logger.info if state == "online" else logger.warning
+            log(f"服务器 {self.name} 健康状态: {self._health_state} -> {state}（{reason or '正常'}）")
+        self._health_state = state
+        self.health_reason = reason
+
+    @property
+    def health_state(self) -> str:
+        """健康状态：online（正常）、degraded（心跳慢或偶发失败）、offline（未连接或已检测到断开）"""
+        if self.session is None or not self._ready.is_set() or self._connection_lost.is_set():
+            return "offline"
+        return self._health_state
+
+    def get_health(self) -> Dict[str, Any]:
+        """获取健康状态与心跳延迟统计"""
+        health = {
+            "state": self.health_state,
+            "reason": self.health_reason,
+            "consecutive_failures": self.consecutive_ping_failures,
+            "last_ping_at": self.last_ping_at,
+            "reconnect_attempts": self.reconnect_attempts,
+            "latency": self.ping_latency.snapshot()
+        }
+        if self.replicas:
+            health["replicas"] = [
+                {"name": replica.name, "state": replica.health_state, "reason": replica.health_reason,
+                 "latency": replica.ping_latency.snapshot()}
+                for replica in self.replicas
+            ]
+        if self.standby:
+            health["standby"] = {"name": self.standby.name, "state": self.standby.health_state,
+                                 "reason": self.standby.health_reason}
+        return health
+
+    @property
+    def is_supervised(self) -> bool:
+        """监管任务是否仍在运行（已连接或正在后台重连）"""
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def mark_connection_lost(self, reason: str) -> None:
+        """标记连接已断开，唤醒监管任务在后台重连"""
+        if self._closing:
+            return
+        logger.warning(f"服务器 {self.name} 连接已断开: {reason}")
+        self.last_error = reason
+        self._connection_lost.set()
+
+    async def wait_until_ready(self, timeout: Optional[float] = None) -> None:
+        """等待监管任务完成（重）连接
+
+        Args:
+            timeout: 最长等待时间（秒），默认使用 MCP_READY_WAIT_TIMEOUT
+
+        Raises:
+            RuntimeError: 服务器未初始化或等待超时
+        """
+        if self.session is not None and self._ready.is_set():
+            return
+        if not self._task or self._task.done():
+            raise RuntimeError(f"服务器 {self.name} 未初始化或连接已断开")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout or settings.MCP_READY_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"服务器 {self.name} 未初始化或连接已断开: 等待重连超时 ({self.last_error})")
+
+    async def _initialize_stdio_session(self, stack: AsyncExitStack, server_params: StdioServerParameters) -> None:
+        """Initialize the stdio session inside the supervisor task."""
         # 创建stdio客户端
-        stdio_transport = await self.exit_stack.enter_async_context(
+        stdio_transport = await stack.enter_async_context(
             stdio_client(server_params)
         )
         logger.info("已创建stdio客户端")
 
         # 创建会话
         read, write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(
-            ClientSession(read, write)
+        self.session = await stack.enter_async_context(
+            NotifyingClientSession(read, write, notification_handler=self._handle_notification)
         )
         logger.info("已创建ClientSession")
 
         # 初始化会话
-        await self.session.initialize()
+        init_result = await self.session.initialize()
+        self.server_capabilities = getattr(init_result, "capabilities", None)
         logger.info("已初始化ClientSession")
 
-    async def _initialize_sse_session(self, server_url: str) -> None:
-        """通过 SSE 连接初始化会话。"""
+    async def _initialize_remote_session(self, stack: AsyncExitStack, server_url: str, connection_type: str) -> None:
+        """通过 SSE 或 Streamable HTTP 连接初始化会话，HTTP连接来自所有远程服务器共享的连接池。
+
+        超时使用 asyncio.timeout 而非 asyncio.wait_for：后者会在新任务中进入
+        anyio 上下文，导致之后在监管任务中退出时出现跨任务 cancel scope 错误。
+        """
+        label = "SSE" if connection_type == "sse" else "Streamable HTTP"
+        transport = sse_client if connection_type == "sse" else streamable_http_client
         try:
             # 对 URL 进行验证/格式化
             if not server_url.startswith("http://") and not server_url.startswith("https://"):
                 server_url = f"http://{server_url}"
             
-            # 添加超时查询参数，防止连接被无限期阻塞
-            if "?" not in server_url:
-                server_url = f"{server_url}?timeout=10000"
-            else:
-                server_url = f"{server_url}&timeout=10000"
-            
-            logger.info(f"连接到 SSE 服务器: {server_url}")
+            logger.info(f"连接到 {label} 服务器: {server_url}")
             
-            # 使用 MCP SDK 的 sse_client 函数获取通信管道
-            # sse_client 与 stdio_client 一样返回 (read, write) 元组
+            # 传输层与 stdio_client 一样返回 (read, write) 元组
             try:
                 # 设置较短的超时时间，避免长时间阻塞
-                sse_transport = await asyncio.wait_for(
-                    self.exit_stack.enter_async_context(sse_client(server_url)),
-                    timeout=30.0
-                )
-                logger.info("已创建 SSE 通信管道")
-            except asyncio.TimeoutError:
-                error_msg = f"连接 SSE 服务器超时 (30秒): {server_url}"
+                async with asyncio.timeout(30.0):
+                    remote_transport = await stack.enter_async_context(
+                        transport(server_url, headers=self.config.get("headers"))
+                    )
+                logger.info(f"已创建 {label} 通信管道")
+            except TimeoutError:
+                error_msg = f"连接 {label} 服务器超时 (30秒): {server_url}"
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
             except (ConnectionRefusedError, ConnectionError) as ce:
-                error_msg = f"连接 SSE 服务器失败: {server_url}, 错误: {str(ce)}"
+                error_msg = f"连接 {label} 服务器失败: {server_url}, 错误: {str(ce)}"
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
             except Exception as e:
-                error_msg = f"创建 SSE 连接时发生未知错误: {str(e)}"
+                error_msg = f"创建 {label} 连接时发生未知错误: {str(e)}"
                 logger.error(error_msg, exc_info=True)
                 raise RuntimeError(error_msg)
             
-            # 从元组中解析出读写通道
-            try:
-                read, write = sse_transport
-            except (ValueError, TypeError) as e:
-                error_msg = f"解析 SSE 通信管道失败: {str(e)}, 类型: {type(sse_transport)}"
-                logger.error(error_msg)
-                raise RuntimeError(error_msg)
+            read, write = remote_transport
             
             # 创建会话
             try:
-                self.session = await asyncio.wait_for(
-                    self.exit_stack.enter_async_context(ClientSession(read, write)),
-                    timeout=10.0
-                )
-                logger.info("已创建 SSE ClientSession")
-            except asyncio.TimeoutError:
-                error_msg = f"创建 SSE ClientSession 超时 (10秒)"
+                async with asyncio.timeout(10.0):
+                    self.session = await stack.enter_async_context(
+                        NotifyingClientSession(read, write, notification_handler=self._handle_notification)
+                    )
+                logger.info(f"已创建 {label} ClientSession")
+            except TimeoutError:
+                error_msg = f"创建 {label} ClientSession 超时 (10秒)"
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
             except Exception as e:
-                error_msg = f"创建 SSE ClientSession 失败: {str(e)}"
+                error_msg = f"创建 {label} ClientSession 失败: {str(e)}"
                 logger.error(error_msg, exc_info=True)
                 raise RuntimeError(error_msg)
             
             # 初始化会话
             try:
-                await asyncio.wait_for(
-                    self.session.initialize(),
-                    timeout=15.0
-                )
-                logger.info("已初始化 SSE 客户端会话")
-            except asyncio.TimeoutError:
-                error_msg = f"初始化 SSE ClientSession 超时 (15秒)"
+                async with asyncio.timeout(15.0):
+                    init_result = await self.session.initialize()
+                self.server_capabilities = getattr(init_result, "capabilities", None)
+                logger.info(f"已初始化 {label} 客户端会话")
+            except TimeoutError:
+                error_msg = f"初始化 {label} ClientSession 超时 (15秒)"
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
             except Exception as e:
-                error_msg = f"初始化 SSE ClientSession 失败: {str(e)}"
+                error_msg = f"初始化 {label} ClientSession 失败: {str(e)}"
                 logger.error(error_msg, exc_info=True)
                 raise RuntimeError(error_msg)
         except Exception as e:
             if not isinstance(e, RuntimeError):
-                logger.error(f"初始化 SSE 会话失败: {str(e)}", exc_info=True)
+                logger.error(f"初始化 {label} 会话失败: {str(e)}", exc_info=True)
             raise
 
+    async def _fetch_catalog_pages(self, method: str, request_type: Any, result_type: Any) -> AsyncIterator[Any]:
+        """按 nextCursor 逐页请求目录，逐页产出结果
+
+        Args:
+            method: 列表方法名，如 tools/list
+            request_type: 对应的请求类型
+            result_type: 对应的结果类型
+        """
+        cursor: Optional[str] = None
+        seen: set = set()
+        while True:
+            params = mcp_types.PaginatedRequestParams(cursor=cursor) if cursor else None
+            request = mcp_types.ClientRequest(request_type(method=method, params=params))
+            page = await self.session.send_request(request, result_type)
+            yield page
+            
+            cursor = getattr(page, "nextCursor", None)
+            if not cursor:
+                return
+            if cursor in seen:
+                # 防止服务器返回重复游标导致死循环
+                logger.warning(f"服务器 {self.name} 的 {method} 返回了重复的游标，停止分页")
+                return
+            seen.add(cursor)
+
     async def _cache_tools(self) -> None:
         """Cache the tools list from the server."""
         if not self.session:
@@ -220,26 +782,184 @@ class Server:
         
         try:
             logger.info(f"正在获取服务器工具列表: {self.name}")
-            tools_response = await self.session.list_tools()
-            self._tools_cache = []
-            
-            for item in tools_response:
-                if isinstance(item, tuple) and item[0] == "tools":
-                    for tool in item[1]:
-                        tool_info = {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "input_schema": tool.inputSchema
-                        }
-                        self._tools_cache.append(tool_info)
-                        logger.info(f"找到工具: {tool.name}")
+            tools: List[Dict[str, Any]] = []
             
+            pages = self._fetch_catalog_pages("tools/list", mcp_types.ListToolsRequest, mcp_types.ListToolsResult)
+            async for page in pages:
+                for tool in page.tools:
+                    tool_info = {
+                        "name": tool.name,
+                        "description": tool.description,
+                        "input_schema": tool.inputSchema
+                    }
+                    # 工具注解（readOnlyHint/idempotentHint等），旧版SDK没有此字段
+                    annotations = getattr(tool, "annotations", None)
+                    if annotations is not None:
+                        tool_info["annotations"] = (
+                            annotations.model_dump(exclude_none=True)
+                            if hasattr(annotations, "model_dump") else dict(annotations)
+                        )
+                    tools.append(tool_info)
+            
+            self._set_tools(tools)
             logger.info(f"已缓存 {len(self._tools_cache)} 个工具")
             
         except Exception as e:
             logger.error(f"获取工具列表失败: {str(e)}", exc_info=True)
             raise
 
+    def _set_tools(self, tools: List[Dict[str, Any]]) -> None:
+        """替换工具缓存，内容变化时递增目录版本并通知"""
+        self._catalogs_loaded.add("tools")
+        if tools == self._tools_cache:
+            return
+        self._tools_cache = tools
+        self._tools_by_name = {tool["name"]: tool for tool in tools}
+        self._catalog_changed("tools")
+
+    def _set_resources(self, resources: List[Dict[str, Any]]) -> None:
+        """替换资源缓存，内容变化时递增目录版本并通知"""
+        self._catalogs_loaded.add("resources")
+        if resources == self._resources_cache:
+            return
+        self._resources_cache = resources
+        self._catalog_changed("resources")
+
+    def _set_prompts(self, prompts: List[Dict[str, Any]]) -> None:
+        """替换prompt缓存，内容变化时递增目录版本并通知"""
+        self._catalogs_loaded.add("prompts")
+        if prompts == self._prompts_cache:
+            return
+        self._prompts_cache = prompts
+        self._catalog_changed("prompts")
+
+    def _catalog_changed(self, kind: str) -> None:
+        """递增目录版本号并通知管理器"""
+        self.catalog_version = next(_catalog_versions)
+        logger.info(f"服务器 {self.name} 的{kind}目录已更新，版本: {self.catalog_version}")
+        if self.on_catalog_changed:
+            try:
+                self.on_catalog_changed(self)
+            except Exception as e:
+                logger.error(f"处理目录变化回调失败: {self.name}, 错误: {str(e)}")
+
+    async def _handle_notification(self, notification: Any) -> None:
+        """处理服务器推送的通知（在会话接收循环中调用）"""
+        method = getattr(notification, "method", None)
+        kind = CATALOG_NOTIFICATIONS.get(method)
+        if kind and self.primary is None:
+            logger.info(f"收到服务器 {self.name} 的目录变化通知: {method}")
+            self._schedule_catalog_refresh(kind)
+        elif method == "notifications/resources/updated":
+            uri = getattr(getattr(notification, "params", None), "uri", None)
+            if uri is not None:
+                logger.info(f"收到服务器 {self.name} 的资源更新通知: {uri}")
+                self._resource_updated(str(uri))
+        elif method == "notifications/progress":
+            params = getattr(notification, "params", None)
+            # 副本上的调用同样由主实例的回调转发
+            handler = (self.primary or self).on_progress
+            if params is not None and handler:
+                try:
+                    handler(str(params.progressToken), params.model_dump(mode="json", exclude_none=True))
+                except Exception as e:
+                    logger.error(f"处理进度通知失败: {self.name}, 错误: {str(e)}")
+
+    def _resource_updated(self, uri: Optional[str]) -> None:
+        """通知管理器资源内容已变化"""
+        if self.on_resource_updated:
+            try:
+                self.on_resource_updated(self, uri)
+            except Exception as e:
+                logger.error(f"处理资源更新回调失败: {self.name}, 错误: {str(e)}")
+
+    @property
+    def supports_resource_subscribe(self) -> bool:
+        """服务器是否支持 resources/subscribe"""
+        capability = getattr(self.server_capabilities, "resources", None)
+        return bool(getattr(capability, "subscribe", False))
+
+    async def subscribe_resource(self, uri: str) -> bool:
+        """订阅资源的更新通知（每个会话每个URI只订阅一次）
+
+        Returns:
+            bool: 当前会话上是否已订阅该资源
+        """
+        if uri in self._subscriptions:
+            return True
+        if not self.session or not self.supports_resource_subscribe:
+            return False
+        try:
+            await self.session.subscribe_resource(uri)
+        except Exception as e:
+            logger.warning(f"订阅资源 {uri} 失败，改用TTL缓存: {self.name}, 错误: {str(e)}")
+            return False
+        self._subscriptions.add(uri)
+        self._wanted_subscriptions.add(uri)
+        logger.info(f"已订阅服务器 {self.name} 的资源更新: {uri}")
+        return True
+
+    async def _resubscribe(self) -> None:
+        """重连后在新会话上重新订阅之前订阅过的资源"""
+        for uri in list(self._wanted_subscriptions):
+            await self.subscribe_resource(uri)
+
+    def _schedule_catalog_refresh(self, kind: str) -> None:
+        """在独立任务中重新获取指定目录；已有刷新在进行时合并为一次后续刷新"""
+        task = self._refresh_tasks.get(kind)
+        if task and not task.done():
+            self._refresh_pending.add(kind)
+            return
+        self._refresh_tasks[kind] = asyncio.create_task(self._refresh_catalog(kind))
+
+    async def _refresh_catalog(self, kind: str) -> None:
+        """重新获取一种目录，期间收到的通知合并为一次后续刷新"""
+        while True:
+            self._refresh_pending.discard(kind)
+            try:
+                if kind == "tools":
+                    await self._cache_tools()
+                elif kind == "resources":
+                    await self._cache_resources()
+                elif kind == "prompts":
+                    await self._cache_prompts()
+            except Exception as e:
+                logger.error(f"刷新服务器 {self.name} 的{kind}目录失败: {str(e)}")
+            if kind not in self._refresh_pending:
+                return
+
+    def _cancel_catalog_refreshes(self) -> None:
+        """取消进行中的目录刷新任务"""
+        for task in self._refresh_tasks.values():
+            if not task.done():
+                task.cancel()
+        self._refresh_tasks.clear()
+        self._refresh_pending.clear()
+
+    def _supports_list_changed(self, kind: str) -> bool:
+        """服务器是否声明会发送该目录的 list_changed 通知"""
+        capability = getattr(self.server_capabilities, kind, None)
+        return bool(getattr(capability, "listChanged", False))
+
+    async def _periodic_catalog_refresh(self) -> None:
+        """为不发送目录变化通知的服务器定期刷新目录"""
+        if self.primary is not None:
+            return
+        interval = self.config.get("catalog_refresh_interval")
+        if interval is None:
+            interval = settings.MCP_CATALOG_REFRESH_INTERVAL
+        if not interval or interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            for kind in ("tools", "resources", "prompts"):
+                if not self._supports_list_changed(kind):
+                    self._schedule_catalog_refresh(kind)
+
+    def get_tool(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """按名称从缓存中查找工具（O(1)）"""
+        return self._tools_by_name.get(tool_name)
+
     async def _cache_resources(self) -> None:
         """Cache the resources list from the server."""
         if not self.session:
@@ -247,65 +967,53 @@ class Server:
         
         try:
             logger.info(f"正在获取服务器资源列表: {self.name}")
-            self._resources_cache = []
+            resources: List[Dict[str, Any]] = []
             
             try:
-                resources_response = await self.session.list_resources()
-                
-                # 处理资源列表格式
-                if hasattr(resources_response, 'resources'):
-                    # 新版SDK格式
-                    for resource in resources_response.resources:
-                        resource_info = {
-                            "name": getattr(resource, 'name', 'Unknown'),
-                            "uri": getattr(resource, 'uri', ''),
-                            "mimeType": getattr(resource, 'mimeType', '')
-                        }
-                        self._resources_cache.append(resource_info)
-                        logger.info(f"找到资源: {resource_info['name']} ({resource_info['uri']})")
-                elif isinstance(resources_response, tuple) and len(resources_response) > 0:
-                    # 兼容旧版格式
-                    for item in resources_response:
-                        if isinstance(item, tuple) and item[0] == "resources":
-                            for resource in item[1]:
-                                resource_info = {
-                                    "name": getattr(resource, 'name', 'Unknown'),
-                                    "uri": getattr(resource, 'uri', ''),
-                                    "mimeType": getattr(resource, 'mimeType', '')
-                                }
-                                self._resources_cache.append(resource_info)
-                                logger.info(f"找到资源: {resource_info['name']} ({resource_info['uri']})")
+                pages = self._fetch_catalog_pages(
+                    "resources/list", mcp_types.ListResourcesRequest, mcp_types.ListResourcesResult
+                )
+                async for page in pages:
+                    # 每个资源只保留精简记录，URI转为字符串
+                    for resource in page.resources:
+                        resources.append({
+                            "name": getattr(resource, 'name', None) or 'Unknown',
+                            "uri": str(getattr(resource, 'uri', '') or ''),
+                            "mimeType": getattr(resource, 'mimeType', None) or ''
+                        })
+                self._set_resources(resources)
             except Exception as e:
                 # 捕获方法不存在的错误，直接返回空列表
                 if "Method not found" in str(e):
                     logger.warning(f"服务器 {self.name} 不支持 resources/list 方法，返回空资源列表")
+                    self._set_resources([])
                 else:
+                    # 保留已有缓存，记录堆栈跟踪但不抛出异常
                     logger.error(f"获取资源列表失败: {str(e)}")
-                    # 记录堆栈跟踪但不抛出异常
                     logger.debug(traceback.format_exc())
-                
-                # 返回空列表
-                self._resources_cache = []
             
             logger.info(f"已缓存 {len(self._resources_cache)} 个资源")
             
         except Exception as e:
             logger.error(f"处理资源列表失败: {str(e)}")
             logger.debug(traceback.format_exc())
-            # 不抛出异常，返回空列表
-            self._resources_cache = []
 
     async def list_tools(self) -> List[Dict[str, Any]]:
         """Get the cached tools list."""
-        if not self._tools_cache:
-            await self._cache_tools()
+        if not self._tools_cache and not self.hibernating:
+            await self._catalog_flights.do("tools", self._cache_tools)
         return self._tools_cache
 
     async def list_resources(self) -> List[Dict[str, Any]]:
         """Get the cached resources list."""
-        if not self._resources_cache:
+        if "resources" not in self._catalogs_loaded and not self.hibernating:
             try:
-                await self._cache_resources()
+                # 后台正在获取资源列表时等待其完成，而不是再发起一次
+                task = self._refresh_tasks.get("resources")
+                if task and not task.done():
+                    await asyncio.shield(task)
+                else:
+                    await self._catalog_flights.do("resources", self._cache_resources)
             except Exception as e:
                 logger.error(f"刷新资源缓存失败: {str(e)}")
                 # 出错时返回空列表
@@ -313,84 +1021,135 @@ class Server:
         return self._resources_cache
 
     async def list_prompts(self) -> List[Dict[str, Any]]:
-        """获取服务器提供的prompt列表
+        """获取缓存的prompt列表，尚未获取时按需拉取
         
         Returns:
-            List[Dict[str, Any]]: prompt列表，每个prompt包含name和description字段
-            
-        Raises:
-            RuntimeError: 服务器未初始化
+            List[Dict[str, Any]]: prompt列表，每个prompt包含name、description和arguments字段
         """
-        try:
-            if not self.session:
-                error_msg = f"服务器 {self.name} 未初始化或连接已断开"
-                logger.error(error_msg)
-                raise RuntimeError(error_msg)
-                
-            logger.info(f"[MCP] 获取服务器 {self.name} 的prompt列表")
-            
-            # 使用MCP SDK获取prompt列表
+        if "prompts" not in self._catalogs_loaded and not self.hibernating:
             try:
-                prompts_response = await self.session.list_prompts()
-                
-                # 处理响应格式
-                result = []
-                if hasattr(prompts_response, 'prompts'):
-                    # 标准SDK格式
-                    for prompt in prompts_response.prompts:
-                        prompt_info = {
-                            "name": getattr(prompt, 'name', 'Unknown'),
-                            "description": getattr(prompt, 'description', '')
-                        }
-                        result.append(prompt_info)
-                        logger.info(f"找到prompt: {prompt_info['name']}")
-                elif isinstance(prompts_response, dict) and "prompts" in prompts_response:
-                    # 字典格式
-                    for prompt in prompts_response["prompts"]:
-                        prompt_info = {
-                            "name": prompt.get('name', 'Unknown'),
-                            "description": prompt.get('description', '')
-                        }
-                        result.append(prompt_info)
-                        logger.info(f"找到prompt: {prompt_info['name']}")
-                
-                logger.info(f"共找到 {len(result)} 个prompt")
-                return result
-                
-            except Exception as e:
-                # 捕获方法不存在的错误，直接返回空列表
-                if "Method not found" in str(e):
-                    logger.warning(f"服务器 {self.name} 不支持 prompts/list 方法，返回空prompt列表")
+                task = self._refresh_tasks.get("prompts")
+                if task and not task.done():
+                    await asyncio.shield(task)
                 else:
-                    logger.error(f"获取prompt列表失败: {str(e)}")
-                    logger.debug(traceback.format_exc())
-                
-                # 返回空列表
+                    await self._catalog_flights.do("prompts", self._cache_prompts)
+            except Exception as e:
+                logger.error(f"获取prompt列表失败: {str(e)}")
                 return []
-                
+        return self._prompts_cache
+
+    async def _cache_prompts(self) -> None:
+        """Cache the prompts list from the server."""
+        if not self.session:
+            raise RuntimeError(f"服务器未初始化: {self.name}")
+        
+        logger.info(f"[MCP] 获取服务器 {self.name} 的prompt列表")
+        prompts: List[Dict[str, Any]] = []
+        try:
+            pages = self._fetch_catalog_pages(
+                "prompts/list", mcp_types.ListPromptsRequest, mcp_types.ListPromptsResult
+            )
+            async for page in pages:
+                for prompt in page.prompts:
+                    prompts.append({
+                        "name": getattr(prompt, 'name', None) or 'Unknown',
+                        "description": getattr(prompt, 'description', None) or '',
+                        "arguments": [
+                            {
+                                "name": argument.name,
+                                "description": argument.description or '',
+                                "required": bool(argument.required)
+                            }
+                            for argument in (getattr(prompt, 'arguments', None) or [])
+                        ]
+                    })
         except Exception as e:
-            logger.error(f"获取prompt列表失败: {str(e)}")
-            logger.debug(traceback.format_exc())
-            # 不抛出异常，返回空列表
-            return []
+            # 捕获方法不存在的错误，缓存空列表
+            if "Method not found" in str(e):
+                logger.warning(f"服务器 {self.name} 不支持 prompts/list 方法，返回空prompt列表")
+                self._set_prompts([])
+            else:
+                # 保留已有缓存
+                logger.error(f"获取prompt列表失败: {str(e)}")
+                logger.debug(traceback.format_exc())
+            return
+        
+        self._set_prompts(prompts)
+        logger.info(f"已缓存 {len(self._prompts_cache)} 个prompt")
 
-    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+    async def get_prompt(self, prompt_name: str, arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """获取渲染后的prompt
+        
+        Args:
+            prompt_name: prompt名称
+            arguments: prompt参数，非字符串的值会序列化为JSON字符串
+            
+        Returns:
+            Dict[str, Any]: 包含description和messages的渲染结果
+            
+        Raises:
+            RuntimeError: 服务器未初始化或获取失败
+        """
+        if not self.session:
+            raise RuntimeError(f"服务器 {self.name} 未初始化或连接已断开")
+        
+        # MCP规定prompt参数值为字符串
+        string_arguments = {
+            key: value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+            for key, value in (arguments or {}).items()
+        }
+        target = self.pick_replica() or self
+        try:
+            async with target.limiter.slot():
+                result = await target.session.get_prompt(prompt_name, string_arguments)
+        except QueueFullError as e:
+            raise QueueFullError(f"服务器 {target.name} 繁忙: {str(e)}")
+        except Exception as e:
+            if isinstance(e, TRANSPORT_ERRORS):
+                target.mark_connection_lost(str(e) or type(e).__name__)
+                raise RuntimeError(f"获取prompt {prompt_name} 失败: 连接已断开")
+            raise RuntimeError(f"获取prompt {prompt_name} 失败: {str(e)}")
+        
+        return result.model_dump(mode="json", exclude_none=True)
+
+    def tool_timeout(self, tool_name: str) -> Optional[float]:
+        """获取工具调用的默认时限（秒），返回None表示不限制
+
+        优先级: tool_timeouts[工具名] > tool_timeout > MCP_TOOL_CALL_TIMEOUT，值为0表示不限制。
+        """
+        per_tool = self.config.get("tool_timeouts") or {}
+        timeout = per_tool.get(tool_name)
+        if timeout is None:
+            timeout = self.config.get("tool_timeout")
+        if timeout is None:
+            timeout = settings.MCP_TOOL_CALL_TIMEOUT
+        return timeout if timeout and timeout > 0 else None
+
+    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any], caller: Optional[str] = None,
+                           deadline: Optional[float] = None, progress_token: Optional[str] = None) -> ToolResult:
         """执行MCP工具，严格遵循MCP Python SDK
         
         Args:
             tool_name: 工具名称
             arguments: 工具参数
+            caller: 调用方标识（如会话ID），用于在排队时公平分配并发槽位
+            deadline: 截止时间（事件循环时间 loop.time()），包含排队等待，为空时不限制
+            progress_token: 进度令牌，服务器的进度通知通过 on_progress 回调转发
             
         Returns:
-            Any: 工具执行结果
+            ToolResult: 工具执行结果（保留原始内容块）
             
         Raises:
             RuntimeError: 工具执行失败或服务器未初始化
+            QueueFullError: 服务器繁忙，等待队列已满
+            ToolTimeoutError: 超过截止时间，请求已取消
             ValueError: 工具不存在
         """
         start_time = time.time()
         try:
-            if not self.session:
+            # 多副本时分发到未完成请求最少的实例，主实例和副本都断开时切换到热备进程
+            target = self.pick_replica() or (self if self.session else None)
+            if target is None:
                 error_msg = f"服务器 {self.name} 未初始化或连接已断开"
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
@@ -399,8 +1158,9 @@ class Server:
             logger.info(f"[MCP] 参数: {json.dumps(arguments, ensure_ascii=False)}")
             
             # 检查工具是否存在
-            tools = await self.list_tools()
-            tool = next((t for t in tools if t["name"] == tool_name), None)
+            if not self._tools_cache:
+                await self.list_tools()
+            tool = self.get_tool(tool_name)
             
             if not tool:
                 error_msg = f"工具未找到: {tool_name}"
@@ -409,10 +1169,28 @@ class Server:
                 
             logger.info(f"[MCP] 工具描述: {tool.get('description', '无描述')}")
             
+            # 等待并发槽位，队列已满时立即拒绝
+            try:
+                async with asyncio.timeout_at(deadline):
+                    await target.limiter.acquire(caller)
+            except QueueFullError as e:
+                logger.warning(f"[MCP] 服务器 {target.name} 繁忙，拒绝工具调用 {tool_name}: {str(e)}")
+                raise QueueFullError(f"服务器 {target.name} 繁忙: {str(e)}")
+            except TimeoutError:
+                logger.warning(f"[MCP] 工具 {tool_name} 等待并发槽位超时")
+                raise ToolTimeoutError(f"工具 {tool_name} 执行超时: 等待服务器 {target.name} 空闲槽位超时")
+            
             # 使用MCP SDK执行工具调用
             try:
-                # 严格按照MCP规范调用工具
-                result = await self.session.call_tool(tool_name, arguments)
+                # 严格按照MCP规范调用工具，超时后取消服务器端的请求
+                try:
+                    result = await target.session.call_tool_until(tool_name, arguments, deadline, progress_token)
+                except TimeoutError:
+                    elapsed = time.time() - start_time
+                    logger.warning(f"[MCP] 工具 {tool_name} 执行超时（{elapsed:.2f}秒），已发送取消通知")
+                    raise ToolTimeoutError(f"工具 {tool_name} 执行超时（{elapsed:.2f}秒）")
+                finally:
+                    target.limiter.release()
                 
                 # 计算执行时间
                 end_time = time.time()
@@ -422,42 +1200,26 @@ class Server:
                 logger.info(f"[MCP] 工具执行成功: {tool_name}")
                 logger.info(f"[MCP] 执行时间: {execution_time:.2f}秒")
                 
-                # 处理特殊的CallToolResult对象
-                if hasattr(result, '__dict__'):
-                    logger.info(f"[MCP] 检测到特殊对象类型: {type(result).__name__}")
-                    
-                    # 如果是TextContent对象
-                    if hasattr(result, 'content') and isinstance(result.content, list):
-                        content_list = []
-                        for item in result.content:
-                            if hasattr(item, 'text') and item.text:
-                                content_list.append(item.text)
-                        
-                        if content_list:
-                            result = "\n".join(content_list)
-                            logger.info(f"[MCP] 提取文本内容: {result[:200]}...")
-                    
-                    # 通用处理：转换为字典
-                    elif hasattr(result, '__dict__'):
-                        result = {k: v for k, v in result.__dict__.items() if not k.startswith('_')}
-                        logger.info(f"[MCP] 转换对象为字典: {json.dumps(result, ensure_ascii=False)[:200]}...")
-                
-                # 确保结果可序列化为JSON以便日志记录
-                try:
-                    if result is not None:
-                        result_excerpt = json.dumps(result, ensure_ascii=False)[:500]
-                        logger.info(f"[MCP] 结果预览: {result_excerpt}...")
-                except (TypeError, json.JSONDecodeError) as json_err:
-                    logger.warning(f"[MCP] 结果无法序列化为JSON，转换为字符串: {str(result)[:200]}...")
-                    # 如果结果不可序列化，强制转换为字符串
-                    result = str(result)
+                # 保留原始内容块，文本和序列化都按需进行，日志只截取预览
+                result = ToolResult.from_mcp(result)
+                if result.is_error:
+                    logger.warning(f"[MCP] 工具 {tool_name} 返回错误结果: {result.preview(200)}")
+                else:
+                    logger.info(f"[MCP] 结果预览: {result.preview()}")
                 
                 return result
                 
+            except ToolTimeoutError:
+                raise
             except Exception as e:
                 error_msg = f"工具 {tool_name} 执行失败: {str(e)}"
                 logger.error(f"[MCP] {error_msg}", exc_info=True)
                 
+                # 传输层已断开，交给该实例的监管任务在后台重连
+                if isinstance(e, TRANSPORT_ERRORS):
+                    target.mark_connection_lost(str(e) or type(e).__name__)
+                    raise RuntimeError(f"{error_msg}: 连接已断开")
+                
                 # 处理MCP特定的错误码
                 if hasattr(e, 'code'):
                     if e.code == ErrorCodes.SERVER_ERROR:
@@ -479,40 +1241,139 @@ class Server:
             logger.error(f"[MCP] {error_msg}", exc_info=True)
             raise RuntimeError(error_msg)
 
+    def get_load_stats(self) -> Dict[str, Any]:
+        """获取并发槽位与排队统计，多副本时附带每个副本的统计"""
+        stats = self.limiter.stats()
+        if self.replicas:
+            stats["replicas"] = [
+                {"name": replica.name, "connected": replica.session is not None, **replica.limiter.stats()}
+                for replica in self.replicas
+            ]
+        if self.standby:
+            stats["standby"] = {"name": self.standby.name, "state": self.standby.health_state,
+                                "connected": self.standby.session is not None, **self.standby.limiter.stats()}
+        if self.config.get("warm_standby"):
+            # 热备接替次数，以及当前为断开的主实例临时提升的实例
+            stats["failovers"] = self.failovers
+            stats["promoted"] = [instance.name for instance in self._promoted]
+        return stats
+
+    async def _stop_supervisor(self) -> None:
+        """停止监管任务和副本进程，关闭传输连接（不清理目录缓存）
+
+        传输连接由监管任务在自身内部关闭，这里只发出停止信号并等待其退出。
+        """
+        self._closing = True
+        self._stop.set()
+        self._connection_lost.set()
+        
+        task = self._task
+        if task and not task.done() and task is not asyncio.current_task():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=10.0)
+            except asyncio.TimeoutError:
+                logger.warning(f"监管任务未能及时退出，强制取消: {self.name}")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    logger.info(f"已取消任务: {self.name}")
+                except Exception as e:
+                    logger.warning(f"取消任务时发生错误: {self.name}, {str(e)}")
+            except Exception as e:
+                logger.warning(f"监管任务退出时发生错误: {self.name}, {str(e)}")
+        self._task = None
+        self._resolve_first_attempt(RuntimeError(f"服务器 {self.name} 已关闭"))
+        
+        # 关闭副本和热备进程
+        replicas, self.replicas = self.replicas, []
+        self._promoted = []
+        if self.standby:
+            replicas.append(self.standby)
+            self.standby = None
+        if replicas:
+            await asyncio.gather(*(replica.cleanup() for replica in replicas), return_exceptions=True)
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+        
+        # 清理会话
+        self.session = None
+        self._ready.clear()
+        self._cancel_catalog_refreshes()
+        # 资源订阅随会话失效
+        self._subscriptions.clear()
+        self._resource_updated(None)
+
+    def touch(self) -> None:
+        """记录最近一次使用时间，用于空闲休眠"""
+        self.last_used_at = time.monotonic()
+
+    @contextmanager
+    def in_use(self) -> Iterator[None]:
+        """在请求的整个过程（包括等待唤醒和就绪、尚未进入并发槽位的阶段）中占用服务器，避免被空闲休眠"""
+        self._users += 1
+        self.touch()
+        try:
+            yield
+        finally:
+            self._users -= 1
+            self.touch()
+
+    @property
+    def is_busy(self) -> bool:
+        """是否有请求正在使用服务器，或主实例、任一副本、热备进程有未完成的请求"""
+        if self._users:
+            return True
+        instances = (self, *self.replicas, *([self.standby] if self.standby else []))
+        return any(server.limiter.in_flight or server.limiter.queued for server in instances)
+
+    async def hibernate(self) -> None:
+        """休眠：关闭服务器进程但保留目录缓存，下次使用时由 wake 重新连接"""
+        async with self._cleanup_lock:
+            if self.hibernating:
+                return
+            logger.info(f"服务器 {self.name} 进入休眠")
+            try:
+                await self._stop_supervisor()
+            finally:
+                self.hibernating = True
+
+    async def wake(self) -> None:
+        """唤醒休眠的服务器，重新连接并刷新目录；连接失败时保持休眠状态
+
+        Raises:
+            Exception: 连接失败
+        """
+        if not self.hibernating:
+            await self.initialize()
+            return
+        logger.info(f"正在唤醒休眠的服务器: {self.name}")
+        self._first_attempt = asyncio.get_running_loop().create_future()
+        self._start_supervisor()
+        try:
+            await asyncio.shield(self._first_attempt)
+        except BaseException:
+            async with self._cleanup_lock:
+                await self._stop_supervisor()
+            raise
+        self.hibernating = False
+        self.touch()
+        self._start_replicas()
+
     async def cleanup(self) -> None:
-        """Clean up server resources."""
+        """停止监管任务并清理服务器资源。"""
         async with self._cleanup_lock:
             try:
                 logger.info(f"正在清理服务器资源: {self.name}")
-                if self._task and not self._task.done():
-                    self._task.cancel()
-                    try:
-                        await self._task
-                    except asyncio.CancelledError:
-                        logger.info(f"已取消任务: {self.name}")
-                    except Exception as e:
-                        logger.warning(f"取消任务时发生错误: {self.name}, {str(e)}")
-                
-                # 清理会话
-                self.session = None
-                
-                try:
-                    # 安全地关闭 exit stack
-                    await self.exit_stack.aclose()
-                    logger.info(f"已关闭资源管理器: {self.name}")
-                except RuntimeError as e:
-                    if "Attempted to exit cancel scope in a different task" in str(e):
-                        logger.warning(f"跨任务关闭资源的错误，已安全处理: {self.name}")
-                        # 创建新的 exit stack 以避免后续使用出错
-                        self.exit_stack = AsyncExitStack()
-                    else:
-                        logger.error(f"关闭资源管理器出错: {self.name}, {str(e)}")
-                except Exception as e:
-                    logger.error(f"关闭资源管理器时发生未知错误: {self.name}, {str(e)}")
+                await self._stop_supervisor()
+                self.hibernating = False
                 
                 # 清理缓存
-                self._tools_cache = []
-                self._resources_cache = []
+                self._wanted_subscriptions.clear()
+                self._set_tools([])
+                self._set_resources([])
+                self._set_prompts([])
+                self._catalogs_loaded.clear()
                 logger.info(f"服务器资源已清理: {self.name}")
             except Exception as e:
                 logger.error(f"清理服务器资源失败: {self.name}, 错误: {str(e)}", exc_info=True)
@@ -522,20 +1383,189 @@ class MCPClientManager:
     
     def __init__(self):
         self._servers: Dict[str, Server] = {}
+        # 全局工具路由索引：工具名 -> 提供该工具的服务器名列表（按注册顺序）
+        self._tool_routes: Dict[str, List[str]] = {}
+        # 幂等工具的调用结果缓存：(服务器, 工具, 规范化参数) -> 结果
+        self._result_cache = TTLCache(settings.MCP_TOOL_CACHE_MAX_ENTRIES)
+        # 合并相同的并发请求（资源读取、可缓存或配置了合并的工具调用）
+        self._inflight = SingleFlight()
+        # 资源内容缓存：(服务器, URI) -> (内容, MIME类型)，按字节预算淘汰
+        self._resource_cache = TTLCache(
+            settings.MCP_RESOURCE_CACHE_MAX_ENTRIES, settings.MCP_RESOURCE_CACHE_MAX_BYTES
+        )
+        # 渲染后的prompt缓存：(服务器, prompt名, 规范化参数) -> 渲染结果
+        self._prompt_cache = TTLCache(settings.MCP_PROMPT_CACHE_MAX_ENTRIES)
+        # 资源更新计数，用于丢弃读取期间已过期的结果：(服务器, URI) -> 计数，(服务器, None) -> 全部失效计数
+        self._resource_generations: Dict[Tuple[str, Optional[str]], int] = {}
+        # lazy服务器的目录持久化：启动时加载上次的目录，首次使用前不启动进程
+        self._catalog_store = CatalogStore(settings.MCP_CATALOG_CACHE_DIR)
+        # 每个服务器一把连接锁，避免并发的重复连接
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        # 启动时自动连接的进度
+        self._readiness: Dict[str, Dict[str, Any]] = {}
+        self._startup_task: Optional[asyncio.Task] = None
+        # 空闲休眠检查任务
+        self._idle_task: Optional[asyncio.Task] = None
+        # 工具调用的进度事件通道，以及按进度令牌登记的进行中调用（用于取消）
+        self.progress = ProgressBroker()
+        self._progress_tasks: Dict[str, asyncio.Task] = {}
         
-    async def add_server(self, name: str, config: Dict[str, Any]) -> None:
-        """Add and initialize a new server."""
+    async def add_server(self, name: str, config: Dict[str, Any], connect: bool = True) -> None:
+        """Add and initialize a new server.
+
+        Args:
+            name: 服务器名称
+            config: 服务器配置
+            connect: 为False时只登记为休眠状态并加载上次保存的目录，首次使用时再连接（lazy生命周期）
+        """
         if name in self._servers:
             await self._servers[name].cleanup()
             
         server = Server(name, config)
-        await server.initialize()
+        server.on_catalog_changed = self._on_catalog_changed
+        server.on_resource_updated = self._on_resource_updated
+        server.on_session_started = self._on_session_started
+        server.on_progress = self._on_progress
+        if connect:
+            await server.initialize()
+        else:
+            server.hibernating = True
+            self._load_persisted_catalog(server)
         self._servers[name] = server
+        self._reindex_server(server)
+
+    def _load_persisted_catalog(self, server: Server) -> None:
+        """为未连接的服务器加载上次保存的目录，没有保存时目录为空，首次使用时再获取"""
+        catalogs = self._catalog_store.load(server.name, server.config)
+        if not catalogs:
+            logger.info(f"服务器 {server.name} 没有已保存的目录，首次使用时获取")
+            return
+        setters = {"tools": server._set_tools, "resources": server._set_resources, "prompts": server._set_prompts}
+        for kind, items in catalogs.items():
+            setters[kind](items)
+        logger.info(f"已加载服务器 {server.name} 保存的目录（{len(server._tools_cache)} 个工具）")
+
+    def _on_catalog_changed(self, server: Server) -> None:
+        """服务器目录变化：更新路由索引，lazy服务器同时保存从服务器获取的目录供下次启动使用"""
+        self._reindex_server(server)
+        # 没有会话时的变化来自加载已保存的目录或清理，不需要保存
+        if server.config.get("lifecycle") != "lazy" or server.session is None:
+            return
+        caches = {"tools": server._tools_cache, "resources": server._resources_cache, "prompts": server._prompts_cache}
+        catalogs = {kind: items for kind, items in caches.items() if kind in server._catalogs_loaded}
+        try:
+            self._catalog_store.save(server.name, server.config, catalogs)
+        except OSError as e:
+            logger.warning(f"保存服务器 {server.name} 的目录失败: {str(e)}")
+
+    def is_server_hibernating(self, server_name: str) -> bool:
+        """服务器是否处于休眠状态（lazy尚未使用，或空闲后已关闭进程）"""
+        server = self._servers.get(server_name)
+        return server is not None and server.hibernating
+
+    def has_cached_tools(self, server_name: str) -> bool:
+        """服务器是否已有工具目录（休眠期间保留的，或lazy服务器从上次保存加载的）"""
+        server = self._servers.get(server_name)
+        return server is not None and "tools" in server._catalogs_loaded
+
+    async def _wake_server(self, server: Server) -> None:
+        """唤醒休眠的服务器，与连接操作共用每个服务器的连接锁"""
+        lock = self._connect_locks.setdefault(server.name, asyncio.Lock())
+        async with lock:
+            if server.hibernating:
+                await server.wake()
+
+    def _start_idle_monitor(self) -> None:
+        if self._idle_task is None or self._idle_task.done():
+            self._idle_task = asyncio.create_task(self._idle_monitor(), name="mcp-idle-monitor")
+
+    async def _idle_monitor(self) -> None:
+        """定期让空闲超时的 idle_timeout 服务器休眠"""
+        while True:
+            await asyncio.sleep(settings.MCP_IDLE_CHECK_INTERVAL)
+            now = time.monotonic()
+            for server in list(self._servers.values()):
+                if server.config.get("lifecycle") != "idle_timeout" or server.hibernating or server.is_busy:
+                    continue
+                timeout = server.config.get("idle_timeout") or settings.MCP_IDLE_TIMEOUT
+                if now - server.last_used_at < timeout:
+                    continue
+                lock = self._connect_locks.setdefault(server.name, asyncio.Lock())
+                if lock.locked():
+                    continue
+                async with lock:
+                    if self._servers.get(server.name) is server and not server.is_busy:
+                        logger.info(f"服务器 {server.name} 已空闲 {now - server.last_used_at:.0f} 秒，进入休眠")
+                        try:
+                            await server.hibernate()
+                        except Exception as e:
+                            logger.error(f"服务器 {server.name} 休眠失败: {str(e)}")
         
     async def get_server(self, name: str) -> Optional[Server]:
         """Get a server by name."""
         return self._servers.get(name)
         
+    def _reindex_server(self, server: Server) -> None:
+        """服务器工具目录变化时更新全局路由索引"""
+        for servers in self._tool_routes.values():
+            if server.name in servers:
+                servers.remove(server.name)
+        # 已断开或被替换的服务器不再参与路由
+        if self._servers.get(server.name, server) is server:
+            for tool_name in server._tools_by_name:
+                self._tool_routes.setdefault(tool_name, []).append(server.name)
+        self._tool_routes = {name: servers for name, servers in self._tool_routes.items() if servers}
+        # 目录变化后工具行为和prompt模板可能变化，丢弃该服务器的缓存结果
+        self._result_cache.purge(lambda key: key[0] == server.name)
+        self._prompt_cache.purge(lambda key: key[0] == server.name)
+
+    def _on_session_started(self, server: Server) -> None:
+        """服务器（重新）连接后丢弃其缓存的工具结果：结果可能依赖旧进程或旧会话的状态"""
+        purged = self._result_cache.purge(lambda key: key[0] == server.name)
+        if purged:
+            logger.info(f"服务器 {server.name} 已建立新会话，清除 {purged} 条工具结果缓存")
+
+    def resolve_tool(self, tool_name: str, preferred_server: Optional[str] = None) -> Tuple[str, str]:
+        """根据工具名查找提供该工具的服务器
+
+        支持命名空间形式 "server/tool"。指定 preferred_server 且该服务器提供此工具时优先使用。
+
+        Args:
+            tool_name: 工具名称，或 "服务器名/工具名"
+            preferred_server: 优先使用的服务器名称（可选）
+
+        Returns:
+            Tuple[str, str]: (服务器名称, 工具名称)
+
+        Raises:
+            ValueError: 找不到工具，或多个服务器提供同名工具且无法消歧
+        """
+        candidates = self._tool_routes.get(tool_name)
+        if not candidates and "/" in tool_name:
+            server_name, _, bare_name = tool_name.partition("/")
+            if server_name in self._tool_routes.get(bare_name, []):
+                return server_name, bare_name
+        if not candidates:
+            raise ValueError(f"找不到包含工具 {tool_name} 的服务器")
+
+        if preferred_server and preferred_server in candidates:
+            return preferred_server, tool_name
+        if len(candidates) == 1:
+            return candidates[0], tool_name
+        raise ValueError(
+            f"工具 {tool_name} 同时存在于多个服务器: {', '.join(candidates)}，请使用 \"服务器名/{tool_name}\" 指定"
+        )
+
+    def get_catalog_version(self, server_name: str) -> Optional[int]:
+        """获取服务器当前的目录版本号，服务器不存在时返回None"""
+        server = self._servers.get(server_name)
+        return server.catalog_version if server else None
+
+    def get_tool(self, server_name: str, tool_name: str) -> Optional[Dict[str, Any]]:
+        """从指定服务器的工具缓存中查找工具"""
+        server = self._servers.get(server_name)
+        return server.get_tool(tool_name) if server else None
+
     async def list_tools(self, server_name: str) -> List[Dict[str, Any]]:
         """List tools for a specific server."""
         server = self._servers.get(server_name)
@@ -543,6 +1573,20 @@ class MCPClientManager:
             raise ValueError(f"服务器不存在: {server_name}")
         return await server.list_tools()
         
+    async def list_tools_page(self, server_name: str, cursor: Optional[str] = None,
+                              limit: Optional[int] = None) -> Dict[str, Any]:
+        """分页获取服务器的工具列表
+
+        Returns:
+            Dict[str, Any]: {"tools": 本页工具, "nextCursor": 下一页游标, "total": 工具总数}
+
+        Raises:
+            ValueError: 服务器不存在或游标无效
+        """
+        tools = await self.list_tools(server_name)
+        page, next_cursor = paginate(tools, cursor, limit)
+        return {"tools": page, "nextCursor": next_cursor, "total": len(tools)}
+
     async def get_server_tools(self, server_name: str) -> List[Dict[str, Any]]:
         """Get tools for a specific server with error handling."""
         try:
@@ -558,6 +1602,20 @@ class MCPClientManager:
             raise ValueError(f"服务器不存在: {server_name}")
         return await server.list_resources()
         
+    async def list_resources_page(self, server_name: str, cursor: Optional[str] = None,
+                                  limit: Optional[int] = None) -> Dict[str, Any]:
+        """分页获取服务器的资源列表
+
+        Returns:
+            Dict[str, Any]: {"resources": 本页资源, "nextCursor": 下一页游标, "total": 资源总数}
+
+        Raises:
+            ValueError: 服务器不存在或游标无效
+        """
+        resources = await self.list_resources(server_name)
+        page, next_cursor = paginate(resources, cursor, limit)
+        return {"resources": page, "nextCursor": next_cursor, "total": len(resources)}
+
     async def get_server_resources(self, server_name: str) -> List[Dict[str, Any]]:
         """Get resources for a specific server with error handling."""
         try:
@@ -573,6 +1631,42 @@ class MCPClientManager:
             raise ValueError(f"服务器不存在: {server_name}")
         return await server.list_prompts()
         
+    async def get_prompt(self, server_name: str, prompt_name: str,
+                         arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """获取渲染后的prompt，相同参数的结果在目录变化前复用
+        
+        Args:
+            server_name: 服务器名称
+            prompt_name: prompt名称
+            arguments: prompt参数
+            
+        Returns:
+            Dict[str, Any]: 包含description和messages的渲染结果
+            
+        Raises:
+            ValueError: 服务器不存在
+            RuntimeError: 获取失败
+        """
+        server = self._get_server_or_raise(server_name)
+        key = (server_name, prompt_name, canonical_arguments(arguments))
+        
+        cached = self._prompt_cache.get(key)
+        if cached is not MISSING:
+            logger.info(f"[MCP] prompt缓存命中: {server_name}/{prompt_name}")
+            return cached
+        
+        async def render() -> Dict[str, Any]:
+            with server.in_use():
+                await self._wait_server_ready(server)
+                version = server.catalog_version
+                result = await server.get_prompt(prompt_name, arguments)
+            # 渲染期间目录已变化时不写入缓存
+            if server.catalog_version == version and settings.MCP_PROMPT_CACHE_TTL > 0:
+                self._prompt_cache.set(key, result, settings.MCP_PROMPT_CACHE_TTL)
+            return result
+        
+        return await self._inflight.do(("prompt",) + key, render)
+
     async def get_server_prompts(self, server_name: str) -> List[Dict[str, Any]]:
         """Get prompts for a specific server with error handling."""
         try:
@@ -584,6 +1678,8 @@ class MCPClientManager:
     async def read_resource(self, server_name: str, resource_uri: str) -> Tuple[str, str]:
         """Read a resource from a specific server.
         
+        只返回第一个内容块，需要全部内容块时使用 read_resource_contents。
+        
         Args:
             server_name: 服务器名称
             resource_uri: 资源URI
@@ -595,122 +1691,535 @@ class MCPClientManager:
             ValueError: 服务器不存在
             RuntimeError: 资源读取失败
         """
-        server = self._servers.get(server_name)
-        if not server:
-            error_msg = f"服务器不存在: {server_name}"
-            logger.error(f"[MCP] {error_msg}")
-            raise ValueError(error_msg)
+        contents = await self.read_resource_contents(server_name, resource_uri)
+        if not contents:
+            return "", "text/plain"
+        first = contents[0]
+        if "text" in first:
+            return first["text"], first["mimeType"]
+        return first["blob"], first["mimeType"]
+
+    async def read_resource_contents(self, server_name: str, resource_uri: str) -> List[Dict[str, Any]]:
+        """读取资源的全部内容块
+        
+        Args:
+            server_name: 服务器名称
+            resource_uri: 资源URI
             
-        # 检查服务器连接状态
-        if not server.session:
-            logger.warning(f"[MCP] 服务器 {server_name} 未连接，尝试重新初始化...")
-            try:
-                await server.initialize()
-            except Exception as e:
-                error_msg = f"重新初始化服务器 {server_name} 失败: {str(e)}"
-                logger.error(f"[MCP] {error_msg}")
-                raise RuntimeError(error_msg)
+        Returns:
+            List[Dict[str, Any]]: 内容块列表，每项包含uri、mimeType，以及text或blob（base64）之一
+            
+        Raises:
+            ValueError: 服务器不存在
+            RuntimeError: 资源读取失败
+        """
+        server = self._get_server_or_raise(server_name)
+        
+        cached = self._resource_cache.get((server_name, resource_uri))
+        if cached is not MISSING:
+            logger.info(f"[MCP] 资源缓存命中: {server_name} {resource_uri}")
+            return cached
+        
+        # 同一资源的并发读取共享一次上游请求
+        return await self._inflight.do(
+            ("resource", server_name, resource_uri),
+            lambda: self._read_and_cache_resource(server, resource_uri)
+        )
+
+    async def _read_and_cache_resource(self, server: Server, resource_uri: str) -> List[Dict[str, Any]]:
+        """读取资源并写入缓存
+
+        服务器就绪后先订阅更新通知（重连后由监管任务重新订阅），缓存条目直到收到
+        resources/updated 才失效；不支持订阅时按TTL过期。读取期间收到更新通知时不写入缓存，避免缓存旧内容。
+        """
+        ttl = server.config.get("resource_cache_ttl")
+        if ttl is None:
+            ttl = settings.MCP_RESOURCE_CACHE_TTL
+        if not ttl or ttl <= 0:
+            return await self._read_resource_uncached(server, resource_uri)
+        
+        with server.in_use():
+            # 先等待服务器就绪（必要时唤醒），否则休眠或重连中的服务器订阅失败，只能按TTL缓存
+            await self._wait_server_ready(server)
+            subscribed = await server.subscribe_resource(resource_uri)
+            generation = self._resource_generation(server.name, resource_uri)
+            result = await self._read_resource_in_use(server, resource_uri)
+        if self._resource_generation(server.name, resource_uri) == generation:
+            size = sum(self._content_size(part) for part in result)
+            self._resource_cache.set(
+                (server.name, resource_uri), result, None if subscribed else ttl, size=size
+            )
+        return result
+
+    def _resource_generation(self, server_name: str, resource_uri: str) -> Tuple[int, int]:
+        return (
+            self._resource_generations.get((server_name, None), 0),
+            self._resource_generations.get((server_name, resource_uri), 0)
+        )
+
+    def _on_resource_updated(self, server: Server, resource_uri: Optional[str]) -> None:
+        """资源内容变化时丢弃缓存；resource_uri为None时丢弃该服务器的全部资源缓存"""
+        key = (server.name, resource_uri)
+        self._resource_generations[key] = self._resource_generations.get(key, 0) + 1
+        if resource_uri is None:
+            self._resource_cache.purge(lambda cache_key: cache_key[0] == server.name)
+        else:
+            self._resource_cache.delete((server.name, resource_uri))
+
+    def get_resource_cache_stats(self) -> Dict[str, Any]:
+        """获取资源内容缓存的命中与容量统计"""
+        return self._resource_cache.stats()
+
+    @staticmethod
+    def _content_size(part: Dict[str, Any]) -> int:
+        """内容块在缓存中占用的字节数：文本按UTF-8编码计算，blob为base64字符串（每个字符一个字节）"""
+        if "text" in part:
+            return len(part["text"].encode("utf-8"))
+        return len(part.get("blob") or "")
+
+    async def _read_resource_uncached(self, server: Server, resource_uri: str) -> List[Dict[str, Any]]:
+        """从服务器读取资源，连接断开时等待后台重连后重试一次"""
+        with server.in_use():
+            await self._wait_server_ready(server)
+            return await self._read_resource_in_use(server, resource_uri)
+
+    async def _read_resource_in_use(self, server: Server, resource_uri: str) -> List[Dict[str, Any]]:
+        """在已占用且已就绪的服务器上读取资源（调用方负责 in_use 和等待就绪）"""
+        server_name = server.name
+        target = server.pick_replica() or server
         
         try:
             # 读取资源
             logger.info(f"[MCP] 从服务器 {server_name} 读取资源: {resource_uri}")
-            result = await server.session.read_resource(resource_uri)
-            
-            # 处理结果
-            if hasattr(result, 'contents') and result.contents:
-                content_item = result.contents[0]
-                if hasattr(content_item, 'text') and content_item.text:
-                    mime_type = getattr(content_item, 'mimeType', 'text/plain')
-                    return content_item.text, mime_type
-                elif hasattr(content_item, 'blob') and content_item.blob:
-                    mime_type = getattr(content_item, 'mimeType', 'application/octet-stream')
-                    return content_item.blob, mime_type
-            
-            # 默认返回空内容
-            return "", "text/plain"
+            async with target.limiter.slot():
+                result = await target.session.read_resource(resource_uri)
+            return self._unpack_resource_contents(result)
             
+        except QueueFullError as e:
+            raise QueueFullError(f"服务器 {server_name} 繁忙: {str(e)}")
         except Exception as e:
             error_msg = f"从服务器 {server_name} 读取资源 {resource_uri} 失败: {str(e)}"
             logger.error(f"[MCP] {error_msg}")
             
-            # 尝试重新初始化并重试一次
-            if "未初始化" in str(e) or "连接已断开" in str(e):
-                logger.info(f"[MCP] 尝试重新连接服务器 {server_name} 并重试...")
+            # 连接已断开：等待监管任务完成后台重连后重试一次
+            if isinstance(e, TRANSPORT_ERRORS) or "未初始化" in str(e) or "连接已断开" in str(e):
+                if isinstance(e, TRANSPORT_ERRORS):
+                    target.mark_connection_lost(str(e) or type(e).__name__)
+                logger.info(f"[MCP] 等待服务器 {server_name} 重连后重试...")
                 try:
-                    await server.cleanup()
-                    await server.initialize()
-                    logger.info(f"[MCP] 服务器 {server_name} 重新连接成功，重试读取资源")
-                    result = await server.session.read_resource(resource_uri)
-                    
-                    # 处理结果
-                    if hasattr(result, 'contents') and result.contents:
-                        content_item = result.contents[0]
-                        if hasattr(content_item, 'text') and content_item.text:
-                            mime_type = getattr(content_item, 'mimeType', 'text/plain')
-                            return content_item.text, mime_type
-                        elif hasattr(content_item, 'blob') and content_item.blob:
-                            mime_type = getattr(content_item, 'mimeType', 'application/octet-stream')
-                            return content_item.blob, mime_type
-                    
-                    # 默认返回空内容
-                    return "", "text/plain"
+                    await server.wait_until_ready()
+                    logger.info(f"[MCP] 服务器 {server_name} 已重新连接，重试读取资源")
+                    target = server.pick_replica() or server
+                    async with target.limiter.slot():
+                        result = await target.session.read_resource(resource_uri)
+                    return self._unpack_resource_contents(result)
                 except Exception as retry_error:
                     retry_error_msg = f"重试读取资源失败: {str(retry_error)}"
                     logger.error(f"[MCP] {retry_error_msg}")
                     raise RuntimeError(retry_error_msg)
             else:
                 raise RuntimeError(error_msg)
+
+    @staticmethod
+    def _unpack_resource_contents(result: Any) -> List[Dict[str, Any]]:
+        """从read_resource结果中提取全部内容块"""
+        contents: List[Dict[str, Any]] = []
+        for content_item in getattr(result, 'contents', None) or []:
+            part: Dict[str, Any] = {"uri": str(getattr(content_item, 'uri', '') or '')}
+            blob = getattr(content_item, 'blob', None)
+            if blob is not None:
+                part["mimeType"] = getattr(content_item, 'mimeType', None) or 'application/octet-stream'
+                part["blob"] = blob
+            else:
+                part["mimeType"] = getattr(content_item, 'mimeType', None) or 'text/plain'
+                part["text"] = getattr(content_item, 'text', None) or ""
+            contents.append(part)
+        return contents
             
-    async def execute_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any]) -> Any:
+    async def execute_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any],
+                           caller: Optional[str] = None, timeout: Optional[float] = None,
+                           progress_token: Optional[str] = None) -> ToolResult:
         """使用MCP SDK在指定服务器上执行工具
         
         Args:
             server_name: 服务器名称
             tool_name: 工具名称
             arguments: 工具参数
+            caller: 调用方标识（如会话ID），服务器繁忙时用于公平排队
+            timeout: 本次调用的时限（秒），覆盖配置的默认时限，0表示不限制
+            progress_token: 进度令牌，进度事件通过 self.progress 按令牌发布，也可用于取消调用
             
         Returns:
-            Any: 工具执行结果
+            ToolResult: 工具执行结果（保留原始内容块）
             
         Raises:
-            ValueError: 服务器不存在
+            ValueError: 服务器不存在，或进度令牌已在使用中
+            QueueFullError: 服务器繁忙，等待队列已满
+            ToolTimeoutError: 超过时限，请求已取消
+            ToolCancelledError: 调用已通过 cancel_tool_call 取消
             RuntimeError: 工具执行失败
         """
+        server = self._get_server_or_raise(server_name)
+        
+        # 时限在入口处换算为截止时间，等待重连、排队和重试都计入同一个截止时间
+        if timeout is None:
+            timeout = server.tool_timeout(tool_name)
+        deadline = asyncio.get_running_loop().time() + timeout if timeout and timeout > 0 else None
+        
+        canonical = canonical_arguments(arguments)
+        
+        # 幂等工具优先使用缓存结果
+        ttl = self._tool_cache_ttl(server, tool_name)
+        if ttl:
+            cached = self._result_cache.get((server_name, tool_name, canonical))
+            if cached is not MISSING:
+                logger.info(f"[MCP] 工具结果缓存命中: {server_name}/{tool_name}")
+                if progress_token is not None and not self.progress.is_active(str(progress_token)):
+                    # 已订阅该令牌的客户端直接收到完成事件
+                    self.progress.end(str(progress_token), {"type": "completed", "cached": True})
+                return cached
+        
+        async def call() -> ToolResult:
+            result = await self._execute_tool_uncached(server, tool_name, arguments, caller, deadline, progress_token)
+            if ttl:
+                self._result_cache.set((server_name, tool_name, canonical), result, ttl)
+            return result
+        
+        # 带进度令牌的调用单独执行：合并后其他调用方的令牌收不到进度
+        if progress_token is not None:
+            return await self._track_progress(str(progress_token), call)
+        
+        # 可缓存的工具或配置了合并的服务器：相同参数的并发调用共享一次上游请求
+        if ttl or server.config.get("coalesce_tool_calls"):
+            return await self._execute_coalesced(server, tool_name, arguments, canonical, ttl, deadline)
+        return await call()
+
+    async def _execute_coalesced(self, server: Server, tool_name: str, arguments: Dict[str, Any],
+                                 canonical: str, ttl: Optional[float], deadline: Optional[float]) -> ToolResult:
+        """与相同参数的并发调用共享一次上游请求，每个调用方按自己的截止时间等待
+
+        共享请求本身不设截止时间、不归属任何调用方：某个调用方超时或被取消只是停止等待，
+        其他调用方不受影响；所有调用方都离开后 SingleFlight 才取消上游请求（服务器收到取消通知）。
+        """
+        server_name = server.name
+
+        async def shared_call() -> ToolResult:
+            result = await self._execute_tool_uncached(server, tool_name, arguments)
+            if ttl:
+                self._result_cache.set((server_name, tool_name, canonical), result, ttl)
+            return result
+
+        try:
+            async with asyncio.timeout_at(deadline):
+                return await self._inflight.do(("tool", server_name, tool_name, canonical), shared_call)
+        except TimeoutError:
+            logger.warning(f"[MCP] 工具 {tool_name} 等待共享调用结果超时")
+            raise ToolTimeoutError(f"工具 {tool_name} 执行超时: 等待服务器 {server_name} 返回结果超时")
+
+    def _tool_cache_ttl(self, server: Server, tool_name: str) -> Optional[float]:
+        """获取工具结果的缓存时间，返回None表示不缓存
+
+        servers.json 中的 tool_cache 配置优先（TTL为0表示禁用）；否则对声明了
+        readOnlyHint，或声明 idempotentHint 且 destructiveHint 为 false 的工具使用默认TTL。
+        """
+        configured = server.config.get("tool_cache") or {}
+        if tool_name in configured:
+            ttl = configured[tool_name]
+            return ttl if ttl and ttl > 0 else None
+        
+        if settings.MCP_TOOL_CACHE_FROM_ANNOTATIONS:
+            tool = server.get_tool(tool_name) or {}
+            annotations = tool.get("annotations") or {}
+            if annotations.get("readOnlyHint") or (
+                annotations.get("idempotentHint") and annotations.get("destructiveHint") is False
+            ):
+                return settings.MCP_TOOL_CACHE_DEFAULT_TTL
+        return None
+
+    def purge_tool_cache(self, server_name: Optional[str] = None, tool_name: Optional[str] = None) -> int:
+        """清除工具结果缓存
+
+        Args:
+            server_name: 只清除该服务器的结果（可选）
+            tool_name: 只清除该工具的结果（可选）
+
+        Returns:
+            int: 清除的条目数
+        """
+        if server_name is None and tool_name is None:
+            return self._result_cache.purge()
+        return self._result_cache.purge(
+            lambda key: (server_name is None or key[0] == server_name)
+            and (tool_name is None or key[1] == tool_name)
+        )
+
+    def get_server_load(self, server_name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """获取服务器的并发、排队深度和等待时间统计
+
+        Args:
+            server_name: 只返回该服务器的统计（可选）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 服务器名 -> 统计信息
+        """
+        if server_name is not None:
+            return {server_name: self._get_server_or_raise(server_name).get_load_stats()}
+        return {name: server.get_load_stats() for name, server in self._servers.items()}
+
+    def get_server_health(self, server_name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """获取服务器的健康状态和心跳延迟直方图
+
+        Args:
+            server_name: 只返回该服务器的健康信息（可选）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 服务器名 -> 健康信息
+        """
+        if server_name is not None:
+            return {server_name: self._get_server_or_raise(server_name).get_health()}
+        return {name: server.get_health() for name, server in self._servers.items()}
+
+    def get_server_health_state(self, server_name: str) -> str:
+        """获取服务器的健康状态，服务器不存在时返回offline"""
         server = self._servers.get(server_name)
-        if not server:
-            error_msg = f"服务器不存在: {server_name}"
-            logger.error(f"[MCP] {error_msg}")
-            raise ValueError(error_msg)
-            
-        # 检查服务器连接状态
-        if not server.session:
-            logger.warning(f"[MCP] 服务器 {server_name} 未连接，尝试重新初始化...")
+        return server.health_state if server else "offline"
+
+    def get_tool_cache_stats(self) -> Dict[str, Any]:
+        """获取工具结果缓存的命中统计和并发请求合并统计"""
+        return {**self._result_cache.stats(), "single_flight": self._inflight.stats()}
+
+    async def _track_progress(self, token: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """在独立任务中执行调用并登记进度令牌，调用结束时发布最终事件"""
+        self.progress.begin(token)
+        task = asyncio.create_task(fn())
+        self._progress_tasks[token] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            self.progress.end(token, {"type": "cancelled"})
+            current = asyncio.current_task()
+            if task.cancelled() and not (current and current.cancelling()):
+                # 被 cancel_tool_call 取消，而不是调用方自身被取消
+                raise ToolCancelledError("工具调用已取消")
+            raise
+        except ToolTimeoutError as e:
+            self.progress.end(token, {"type": "timeout", "error": str(e)})
+            raise
+        except Exception as e:
+            self.progress.end(token, {"type": "failed", "error": str(e)})
+            raise
+        finally:
+            if self._progress_tasks.get(token) is task:
+                del self._progress_tasks[token]
+        self.progress.end(token, {"type": "completed"})
+        return result
+
+    def _on_progress(self, token: str, params: Dict[str, Any]) -> None:
+        """转发服务器的 notifications/progress 到进度通道"""
+        self.progress.publish(token, {
+            "type": "progress",
+            "progress": params.get("progress"),
+            "total": params.get("total"),
+            "message": params.get("message")
+        })
+
+    def cancel_tool_call(self, progress_token: str) -> bool:
+        """取消带进度令牌的进行中调用，服务器端会收到 notifications/cancelled
+
+        Returns:
+            bool: 是否找到并取消了调用
+        """
+        task = self._progress_tasks.get(str(progress_token))
+        if task is None or task.done():
+            return False
+        logger.info(f"[MCP] 取消工具调用: progress_token={progress_token}")
+        task.cancel()
+        return True
+
+    async def execute_tools_batch(self, calls: List[Dict[str, Any]], caller: Optional[str] = None,
+                                  timeout: Optional[float] = None,
+                                  progress_token: Optional[str] = None) -> List[Dict[str, Any]]:
+        """并发执行一批工具调用，按输入顺序返回每一项的结果
+
+        每个（服务器, 工具）只在开始前并发校验一次，校验失败的项直接记为错误、不会执行。
+        每个服务器上同时进行的调用数不超过其并发上限（含副本），其余在批内等待，
+        不会占满服务器的排队队列而被拒绝。
+
+        Args:
+            calls: 调用列表，每项包含 server_id、tool（或tool_name）和 arguments
+            caller: 调用方标识，用于服务器繁忙时的公平排队，默认整个批次作为一个调用方
+            timeout: 每个调用的时限（秒），覆盖配置的默认时限；校验阶段等待服务器就绪同样不超过该时限
+            progress_token: 进度令牌，每完成一项发布一次进度事件（附带该项结果），也可用于取消整个批次
+
+        Returns:
+            List[Dict[str, Any]]: 与输入顺序一致的结果，包含 success、result（CallToolResult格式）或error、execution_time
+
+        Raises:
+            ValueError: 调用数超过 MCP_BATCH_MAX_CALLS，或进度令牌已在使用中
+        """
+        if len(calls) > settings.MCP_BATCH_MAX_CALLS:
+            raise ValueError(f"批量调用数 {len(calls)} 超过上限 {settings.MCP_BATCH_MAX_CALLS}")
+        caller = caller or f"batch-{id(calls)}"
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        
+        # 预先校验：每个（服务器, 工具）只校验一次，不同组合并发校验，等待服务器就绪的时间不超过批次时限
+        deadline = asyncio.get_running_loop().time() + timeout if timeout and timeout > 0 else None
+        items: List[Tuple[int, Server, str, Dict[str, Any]]] = []
+        keys: Dict[Tuple[str, str], Server] = {}
+        for index, item in enumerate(calls):
+            server_name = item.get("server_id")
+            tool_name = item.get("tool") or item.get("tool_name")
+            server = self._servers.get(server_name)
+            if not server or not tool_name:
+                error = f"服务器不存在: {server_name}" if not server else "缺少工具名称"
+                results[index] = {"index": index, "server_id": server_name, "tool": tool_name,
+                                  "success": False, "error": error, "error_type": "invalid", "execution_time": 0.0}
+                continue
+            keys.setdefault((server_name, tool_name), server)
+            items.append((index, server, tool_name, item.get("arguments") or {}))
+        failures = await asyncio.gather(*(
+            self._check_batch_tool(server, tool_name, deadline) for (_, tool_name), server in keys.items()
+        ))
+        checked_tools = dict(zip(keys, failures))
+        
+        limits: Dict[str, asyncio.Semaphore] = {}
+        pending: List[Tuple[int, Server, str, Dict[str, Any]]] = []
+        for index, server, tool_name, arguments in items:
+            failure = checked_tools[(server.name, tool_name)]
+            if failure:
+                results[index] = {"index": index, "server_id": server.name, "tool": tool_name,
+                                  "success": False, **failure}
+                continue
+            if server.name not in limits:
+                limits[server.name] = asyncio.Semaphore(server.limiter.max_in_flight * (len(server.replicas) + 1))
+            pending.append((index, server, tool_name, arguments))
+        
+        logger.info(f"[MCP] 批量执行 {len(pending)} 个工具调用（共 {len(calls)} 项，涉及 {len(limits)} 个服务器）")
+        done = len(calls) - len(pending)
+        
+        async def run_one(index: int, server: Server, tool_name: str, arguments: Dict[str, Any]) -> None:
+            nonlocal done
+            entry = {"index": index, "server_id": server.name, "tool": tool_name}
+            async with limits[server.name]:
+                start = time.monotonic()
+                try:
+                    result = await self.execute_tool(server.name, tool_name, arguments, caller=caller, timeout=timeout)
+                    entry.update(success=True, result=result.to_dict())
+                except ToolTimeoutError as e:
+                    entry.update(success=False, error=str(e), error_type="timeout")
+                except QueueFullError as e:
+                    entry.update(success=False, error=str(e), error_type="busy")
+                except Exception as e:
+                    entry.update(success=False, error=str(e), error_type="error")
+                entry["execution_time"] = round(time.monotonic() - start, 4)
+            results[index] = entry
+            done += 1
+            if progress_token is not None:
+                self.progress.publish(str(progress_token), {
+                    "type": "progress", "progress": done, "total": len(calls), "item": entry
+                })
+        
+        async def run_all() -> List[Dict[str, Any]]:
+            await asyncio.gather(*(run_one(*args) for args in pending))
+            return results
+        
+        if progress_token is not None:
+            return await self._track_progress(str(progress_token), run_all)
+        return await run_all()
+
+    async def _check_batch_tool(self, server: Server, tool_name: str,
+                                deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+        """校验服务器上存在该工具
+
+        目录尚未获取时等待服务器就绪（必要时唤醒）后获取目录，等待不超过截止时间；
+        超时只放弃本次校验，唤醒在后台继续完成，不丢弃刚启动的进程。
+
+        Returns:
+            Optional[Dict[str, Any]]: 校验失败时返回 error、error_type 和校验耗时 execution_time，通过时返回None
+        """
+        async def load_catalog() -> None:
+            # 目录可能尚未获取（服务器刚连接、正在重连或lazy服务器尚未使用）
+            await self._wait_server_ready(server)
+            await server.list_tools()
+
+        start = time.monotonic()
+        error_type = "invalid"
+        try:
+            if not server.get_tool(tool_name):
+                load = asyncio.ensure_future(load_catalog())
+                load.add_done_callback(lambda task: task.cancelled() or task.exception())
+                async with asyncio.timeout_at(deadline):
+                    await asyncio.shield(load)
+        except TimeoutError:
+            error = f"服务器 {server.name} 不可用: 等待服务器就绪超时"
+            error_type = "timeout"
+        except Exception as e:
+            error = f"服务器 {server.name} 不可用: {str(e)}"
+        else:
+            if server.get_tool(tool_name):
+                return None
+            error = f"工具未找到: {tool_name}"
+        return {"error": error, "error_type": error_type, "execution_time": round(time.monotonic() - start, 4)}
+
+    async def _execute_tool_uncached(self, server: Server, tool_name: str, arguments: Dict[str, Any],
+                                     caller: Optional[str] = None, deadline: Optional[float] = None,
+                                     progress_token: Optional[str] = None) -> ToolResult:
+        """在服务器上执行工具，连接断开时等待后台重连后重试一次（不超过截止时间）"""
+        with server.in_use():
+            return await self._execute_tool_in_use(server, tool_name, arguments, caller, deadline, progress_token)
+
+    async def _execute_tool_in_use(self, server: Server, tool_name: str, arguments: Dict[str, Any],
+                                   caller: Optional[str], deadline: Optional[float],
+                                   progress_token: Optional[str]) -> ToolResult:
+        server_name = server.name
+        if server.hibernating:
+            # 唤醒同样计入时限；超时只放弃本次调用，唤醒在后台继续完成，不丢弃刚启动的进程
+            wake = asyncio.ensure_future(self._wait_server_ready(server))
+            wake.add_done_callback(lambda task: task.cancelled() or task.exception())
             try:
-                await server.initialize()
-            except Exception as e:
-                error_msg = f"重新初始化服务器 {server_name} 失败: {str(e)}"
-                logger.error(f"[MCP] {error_msg}")
-                raise RuntimeError(error_msg)
+                async with asyncio.timeout_at(deadline):
+                    await asyncio.shield(wake)
+            except TimeoutError:
+                raise ToolTimeoutError(f"工具 {tool_name} 执行超时: 等待服务器 {server_name} 唤醒超时")
+        if server.pick_replica() is not None:
+            # 有可用的实例（包括热备进程）时不等待断开的主实例重连
+            server.touch()
+        else:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    await self._wait_server_ready(server)
+            except TimeoutError:
+                raise ToolTimeoutError(f"工具 {tool_name} 执行超时: 等待服务器 {server_name} 就绪超时")
         
         logger.info(f"[MCP] 在服务器 {server_name} 上执行工具 {tool_name}")
         
         try:
             # 执行工具调用
-            result = await server.execute_tool(tool_name, arguments)
+            result = await server.execute_tool(tool_name, arguments, caller=caller, deadline=deadline,
+                                               progress_token=progress_token)
             return result
             
+        except (QueueFullError, ToolTimeoutError):
+            # 服务器繁忙或已超时，直接返回给调用方而不是重试
+            raise
         except Exception as e:
             error_msg = f"在服务器 {server_name} 上执行工具 {tool_name} 失败: {str(e)}"
             logger.error(f"[MCP] {error_msg}")
             
-            # 尝试重新初始化并重试一次
+            # 连接已断开：等待监管任务完成后台重连后重试一次
             if "未初始化" in str(e) or "连接已断开" in str(e):
-                logger.info(f"[MCP] 尝试重新连接服务器 {server_name} 并重试...")
+                logger.info(f"[MCP] 等待服务器 {server_name} 重连后重试...")
                 try:
-                    await server.cleanup()
-                    await server.initialize()
-                    logger.info(f"[MCP] 服务器 {server_name} 重新连接成功，重试工具 {tool_name}")
-                    return await server.execute_tool(tool_name, arguments)
+                    if server.pick_replica() is None:
+                        async with asyncio.timeout_at(deadline):
+                            await server.wait_until_ready()
+                    logger.info(f"[MCP] 服务器 {server_name} 已有可用实例，重试工具 {tool_name}")
+                    return await server.execute_tool(tool_name, arguments, caller=caller, deadline=deadline,
+                                                     progress_token=progress_token)
+                except ToolTimeoutError:
+                    raise
+                except TimeoutError:
+                    raise ToolTimeoutError(f"工具 {tool_name} 执行超时: 等待服务器 {server_name} 重连超时")
                 except Exception as retry_error:
                     retry_error_msg = f"重试执行工具失败: {str(retry_error)}"
                     logger.error(f"[MCP] {retry_error_msg}")
@@ -718,6 +2227,36 @@ class MCPClientManager:
             else:
                 raise RuntimeError(error_msg)
 
+    def _get_server_or_raise(self, server_name: str) -> Server:
+        """获取服务器实例，不存在时抛出ValueError"""
+        server = self._servers.get(server_name)
+        if not server:
+            error_msg = f"服务器不存在: {server_name}"
+            logger.error(f"[MCP] {error_msg}")
+            raise ValueError(error_msg)
+        return server
+
+    async def _wait_server_ready(self, server: Server) -> None:
+        """服务器正在后台重连时，等待其就绪而不是在请求中重新建立连接；休眠的服务器在此唤醒"""
+        server.touch()
+        if server.session:
+            return
+        if server.hibernating:
+            try:
+                await self._wake_server(server)
+                return
+            except Exception as e:
+                error_msg = f"唤醒服务器 {server.name} 失败: {str(e)}"
+                logger.error(f"[MCP] {error_msg}")
+                raise RuntimeError(error_msg)
+        logger.warning(f"[MCP] 服务器 {server.name} 未连接，等待后台重连...")
+        try:
+            await server.wait_until_ready()
+        except Exception as e:
+            error_msg = f"服务器 {server.name} 不可用: {str(e)}"
+            logger.error(f"[MCP] {error_msg}")
+            raise RuntimeError(error_msg)
+
     def list_servers(self) -> List[str]:
         """List all server names."""
         return list(self._servers.keys())
@@ -753,11 +2292,11 @@ class MCPClientManager:
             if connection_type == "stdio":
                 if "command" not in config:
                     raise ValueError("stdio 连接类型必须指定 command 参数")
-            elif connection_type == "sse":
+            elif connection_type in REMOTE_CONNECTION_TYPES:
                 if "url" not in config:
-                    raise ValueError("sse 连接类型必须指定 url 参数")
+                    raise ValueError(f"{connection_type} 连接类型必须指定 url 参数")
                 
-                # 对于 SSE 连接，先测试连接是否可用
+                # 对于远程连接，先测试连接是否可用
                 success, message = await self.test_sse_connection(config["url"])
                 if not success:
                     logger.error(f"SSE 服务器连接测试失败: {message}")
@@ -765,15 +2304,31 @@ class MCPClientManager:
             else:
                 raise ValueError(f"不支持的连接类型: {connection_type}")
             
-            # 如果服务器已存在，先断开连接
-            if server_name in self._servers:
-                logger.info(f"服务器 {server_name} 已存在，先断开连接")
-                await self.disconnect_from_server(server_name)
-            
-            # 建立新连接
-            await self.add_server(server_name, config)
-            logger.info(f"服务器 {server_name} 连接成功")
-            return True
+            lock = self._connect_locks.setdefault(server_name, asyncio.Lock())
+            async with lock:
+                # 监管任务正在后台重连且配置未变化时，等待其就绪而不是重建连接
+                existing = self._servers.get(server_name)
+                if existing and existing.hibernating and existing.config == config:
+                    await existing.wake()
+                    return True
+                if existing and existing.is_supervised and existing.config == config:
+                    logger.info(f"服务器 {server_name} 由监管任务管理，等待其就绪")
+                    try:
+                        await existing.wait_until_ready()
+                        return True
+                    except Exception as e:
+                        logger.error(f"等待服务器 {server_name} 就绪失败: {e}")
+                        return False
+                
+                # 如果服务器已存在，先断开连接
+                if server_name in self._servers:
+                    logger.info(f"服务器 {server_name} 已存在，先断开连接")
+                    await self.disconnect_from_server(server_name)
+                
+                # 建立新连接
+                await self.add_server(server_name, config)
+                logger.info(f"服务器 {server_name} 连接成功")
+                return True
         except Exception as e:
             logger.error(f"连接服务器失败: {server_name}, 错误: {e}", exc_info=True)
             return False
@@ -782,16 +2337,118 @@ class MCPClientManager:
         """Disconnect from a server."""
         server = self._servers.get(server_name)
         if server:
-            await server.cleanup()
             del self._servers[server_name]
+            await server.cleanup()
             return True
         return False
         
     async def disconnect_all(self) -> None:
         """Disconnect all servers."""
-        for server in self._servers.values():
-            await server.cleanup()
+        for task in (self._startup_task, self._idle_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        servers = list(self._servers.values())
         self._servers.clear()
+        for server in servers:
+            await server.cleanup()
+        self._tool_routes.clear()
+        self._result_cache.purge()
+        self._resource_cache.purge()
+        self._prompt_cache.purge()
+        await close_http_client()
+
+    def is_server_connecting(self, server_name: str) -> bool:
+        """服务器是否正在连接中（启动自动连接或其他请求正在建立连接）"""
+        lock = self._connect_locks.get(server_name)
+        if lock is not None and lock.locked():
+            return True
+        status = self._readiness.get(server_name, {}).get("status")
+        return status in ("pending", "connecting")
+
+    def start_auto_connect(self, server_configs: List[MCPServerConfig]) -> asyncio.Task:
+        """在后台并发连接所有配置的服务器，立即返回后台任务
+
+        并发数由 MCP_STARTUP_CONCURRENCY 限制，每个服务器的连接时间不超过
+        MCP_STARTUP_CONNECT_TIMEOUT，进度可通过 get_readiness 查询。
+
+        Args:
+            server_configs: 服务器配置列表
+
+        Returns:
+            asyncio.Task: 自动连接任务
+        """
+        self._readiness = {
+            config.id: {
+                "id": config.id,
+                "name": config.name,
+                "status": "pending",
+                "error": None,
+                "duration": None
+            }
+            for config in server_configs
+        }
+        self._startup_task = asyncio.create_task(
+            self._auto_connect_all(server_configs), name="mcp-startup-connector"
+        )
+        self._start_idle_monitor()
+        return self._startup_task
+
+    async def _auto_connect_all(self, server_configs: List[MCPServerConfig]) -> None:
+        """以有限并发连接所有服务器"""
+        semaphore = asyncio.Semaphore(max(1, settings.MCP_STARTUP_CONCURRENCY))
+        started = time.monotonic()
+
+        async def connect_one(config: MCPServerConfig) -> None:
+            entry = self._readiness[config.id]
+            if config.lifecycle == "lazy":
+                # lazy服务器只登记，首次使用时再启动进程
+                await self.add_server(config.id, config.dict(), connect=False)
+                entry["status"] = "hibernated"
+                return
+            async with semaphore:
+                entry["status"] = "connecting"
+                begin = time.monotonic()
+                logger.info(f"自动连接到MCP服务器: {config.name}")
+                try:
+                    async with asyncio.timeout(settings.MCP_STARTUP_CONNECT_TIMEOUT):
+                        connected = await self.connect_to_server(config.id, config.dict())
+                    entry["status"] = "online" if connected else "failed"
+                    if not connected:
+                        entry["error"] = "连接失败"
+                except TimeoutError:
+                    entry["status"] = "timeout"
+                    entry["error"] = f"连接超时 ({settings.MCP_STARTUP_CONNECT_TIMEOUT}秒)"
+                    logger.error(f"自动连接MCP服务器超时: {config.name}")
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                    logger.error(f"无法自动连接到MCP服务器 {config.name}: {e}")
+                finally:
+                    entry["duration"] = round(time.monotonic() - begin, 3)
+
+        await asyncio.gather(*(connect_one(config) for config in server_configs))
+        logger.info(f"MCP服务器自动连接完成，耗时 {time.monotonic() - started:.2f}秒")
+
+    def get_readiness(self) -> Dict[str, Any]:
+        """获取启动自动连接的进度
+
+        Returns:
+            Dict[str, Any]: ready 表示所有服务器的自动连接均已结束（无论成功与否），
+                servers 为每个服务器的状态
+        """
+        servers = list(self._readiness.values())
+        finished = [s for s in servers if s["status"] not in ("pending", "connecting")]
+        return {
+            "ready": len(finished) == len(servers),
+            "total": len(servers),
+            "completed": len(finished),
+            "online": sum(1 for s in servers if s["status"] == "online"),
+            "servers": servers
+        }
 
     async def test_sse_connection(self, url: str) -> Tuple[bool, str]:
         """测试 SSE 服务器连接是否可用
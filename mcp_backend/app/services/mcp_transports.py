@@ -0,0 +1,281 @@
+"""远程MCP服务器的传输层
+
+SSE 与 Streamable HTTP 两种传输共用一个 keep-alive 的 httpx 连接池，同一主机上的多个会话、
+重连后的新会话都复用已建立的 TCP/TLS 连接。两个传输都与 MCP SDK 的 stdio_client / sse_client
+一样产出 (read_stream, write_stream)，可以直接交给 ClientSession。
+"""
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import anyio
+import httpx
+from httpx_sse import EventSource
+from mcp import types as mcp_types
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Streamable HTTP 会话ID响应头/请求头
+MCP_SESSION_ID_HEADER = "mcp-session-id"
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取所有远程MCP服务器共享的HTTP连接池，首次调用时创建
+
+    MCP_HTTP2 开启但未安装 h2 时回退到 HTTP/1.1。
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = settings.MCP_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("未安装 h2 (pip install httpx[http2])，远程MCP连接使用 HTTP/1.1")
+                http2 = False
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.MCP_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.MCP_HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.MCP_HTTP_TIMEOUT, connect=settings.MCP_HTTP_CONNECT_TIMEOUT)
+        )
+        logger.info(f"已创建远程MCP连接池 (http2={http2}, max_connections={settings.MCP_HTTP_MAX_CONNECTIONS})")
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享连接池"""
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+
+def _stream_timeout() -> httpx.Timeout:
+    """长连接（SSE流）的超时：读取超时为两次事件之间的最长间隔"""
+    return httpx.Timeout(
+        settings.MCP_HTTP_TIMEOUT,
+        connect=settings.MCP_HTTP_CONNECT_TIMEOUT,
+        read=settings.MCP_HTTP_SSE_READ_TIMEOUT
+    )
+
+
+async def _send_quietly(writer: Any, item: Any) -> None:
+    """向读取流写入消息，会话已关闭时丢弃"""
+    try:
+        await writer.send(item)
+    except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+        pass
+
+
+@asynccontextmanager
+async def sse_client(url: str, headers: Optional[Dict[str, str]] = None) -> AsyncIterator[Tuple[Any, Any]]:
+    """基于共享连接池的 SSE 传输（与 mcp.client.sse.sse_client 行为一致）
+
+    Args:
+        url: SSE 端点
+        headers: 附加的请求头
+
+    Yields:
+        Tuple: (read_stream, write_stream)
+    """
+    client = get_http_client()
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async with anyio.create_task_group() as tg:
+        try:
+            async with client.stream(
+                "GET", url, headers={"Accept": "text/event-stream", **(headers or {})}, timeout=_stream_timeout()
+            ) as response:
+                response.raise_for_status()
+                event_source = EventSource(response)
+
+                async def sse_reader(task_status=anyio.TASK_STATUS_IGNORED) -> None:
+                    try:
+                        async for sse in event_source.aiter_sse():
+                            if sse.event == "endpoint":
+                                endpoint_url = urljoin(url, sse.data)
+                                if urlparse(endpoint_url)[:2] != urlparse(url)[:2]:
+                                    raise ValueError(f"消息端点与连接的源不一致: {endpoint_url}")
+                                logger.info(f"收到 SSE 消息端点: {endpoint_url}")
+                                task_status.started(endpoint_url)
+                            elif sse.event == "message":
+                                try:
+                                    message = mcp_types.JSONRPCMessage.model_validate_json(sse.data)
+                                except Exception as exc:
+                                    logger.error(f"解析服务器消息失败: {exc}")
+                                    await _send_quietly(read_stream_writer, exc)
+                                    continue
+                                await _send_quietly(read_stream_writer, message)
+                    except Exception as exc:
+                        logger.error(f"SSE 读取失败: {exc}")
+                        await _send_quietly(read_stream_writer, exc)
+                    finally:
+                        await read_stream_writer.aclose()
+
+                async def post_writer(endpoint_url: str) -> None:
+                    try:
+                        async with write_stream_reader:
+                            async for message in write_stream_reader:
+                                result = await client.post(
+                                    endpoint_url,
+                                    json=message.model_dump(by_alias=True, mode="json", exclude_none=True),
+                                    headers=headers
+                                )
+                                result.raise_for_status()
+                    except Exception as exc:
+                        logger.error(f"SSE 消息发送失败: {exc}")
+                    finally:
+                        await write_stream.aclose()
+
+                endpoint_url = await tg.start(sse_reader)
+                tg.start_soon(post_writer, endpoint_url)
+                try:
+                    yield read_stream, write_stream
+                finally:
+                    tg.cancel_scope.cancel()
+        finally:
+            await read_stream_writer.aclose()
+            await write_stream.aclose()
+
+
+@asynccontextmanager
+async def streamable_http_client(url: str, headers: Optional[Dict[str, str]] = None) -> AsyncIterator[Tuple[Any, Any]]:
+    """基于共享连接池的 MCP Streamable HTTP 传输
+
+    每条客户端消息POST到同一个端点：通知和响应返回202；请求的响应是JSON，或者是携带
+    响应（以及期间的进度等通知）的SSE流。请求并发发送，长时间运行的工具调用不会阻塞其他请求。
+    初始化完成后打开GET SSE流接收服务器主动推送的消息（服务器返回405时表示不支持，跳过）。
+    服务器以 Mcp-Session-Id 标识会话；会话过期（404）时关闭读取流，由上层按连接断开重连。
+
+    Args:
+        url: MCP 端点
+        headers: 附加的请求头
+
+    Yields:
+        Tuple: (read_stream, write_stream)
+    """
+    client = get_http_client()
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    state: Dict[str, Optional[str]] = {"session_id": None}
+
+    def request_headers(accept: str) -> Dict[str, str]:
+        result = {"Accept": accept, **(headers or {})}
+        if state["session_id"]:
+            result[MCP_SESSION_ID_HEADER] = state["session_id"]
+        return result
+
+    async def emit(data: str) -> None:
+        """把响应体或SSE事件中的消息（可能是批量数组）写入读取流"""
+        try:
+            payload = json.loads(data)
+            items = payload if isinstance(payload, list) else [payload]
+            messages = [mcp_types.JSONRPCMessage.model_validate(item) for item in items]
+        except Exception as exc:
+            logger.error(f"解析服务器消息失败: {exc}")
+            await _send_quietly(read_stream_writer, exc)
+            return
+        for message in messages:
+            await _send_quietly(read_stream_writer, message)
+
+    async def fail_request(message: Any, error: str) -> None:
+        """请求发送失败时立即以错误响应结束该请求，而不是让调用方等到超时"""
+        root = message.root
+        if isinstance(root, mcp_types.JSONRPCRequest):
+            await _send_quietly(read_stream_writer, mcp_types.JSONRPCMessage(mcp_types.JSONRPCError(
+                jsonrpc="2.0",
+                id=root.id,
+                error=mcp_types.ErrorData(code=mcp_types.INTERNAL_ERROR, message=error)
+            )))
+
+    async def read_event_stream(response: httpx.Response) -> None:
+        async for sse in EventSource(response).aiter_sse():
+            if sse.event == "message" and sse.data:
+                await emit(sse.data)
+
+    async def post_message(message: Any) -> None:
+        try:
+            async with client.stream(
+                "POST",
+                url,
+                json=message.model_dump(by_alias=True, mode="json", exclude_none=True),
+                headers=request_headers("application/json, text/event-stream"),
+                timeout=_stream_timeout()
+            ) as response:
+                if response.status_code == 404 and state["session_id"]:
+                    logger.warning(f"MCP会话已过期: {url}")
+                    await fail_request(message, "MCP会话已过期")
+                    await read_stream_writer.aclose()
+                    return
+                response.raise_for_status()
+                if response.headers.get(MCP_SESSION_ID_HEADER):
+                    state["session_id"] = response.headers[MCP_SESSION_ID_HEADER]
+                if response.status_code == 202:
+                    return
+                content_type = response.headers.get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    await read_event_stream(response)
+                elif content_type.startswith("application/json"):
+                    await emit((await response.aread()).decode("utf-8"))
+        except Exception as exc:
+            logger.error(f"Streamable HTTP 请求失败: {exc}")
+            await fail_request(message, f"请求失败: {str(exc)}")
+
+    async def listen_server_messages() -> None:
+        try:
+            async with client.stream(
+                "GET", url, headers=request_headers("text/event-stream"), timeout=_stream_timeout()
+            ) as response:
+                if response.status_code == 405:
+                    logger.debug(f"服务器不支持GET消息流: {url}")
+                    return
+                response.raise_for_status()
+                await read_event_stream(response)
+        except Exception as exc:
+            # 服务器推送的通知会丢失，目录仍由定期刷新保持最新
+            logger.warning(f"服务器消息流已断开: {url}, 错误: {exc}")
+
+    async def post_writer(tg: Any) -> None:
+        try:
+            async with write_stream_reader:
+                async for message in write_stream_reader:
+                    root = message.root
+                    if isinstance(root, mcp_types.JSONRPCRequest) and root.method != "initialize":
+                        # 请求并发发送；initialize需要先完成以获得会话ID
+                        tg.start_soon(post_message, message)
+                        continue
+                    # 通知和响应按顺序发送，保证 initialized 先于后续请求到达
+                    await post_message(message)
+                    if isinstance(root, mcp_types.JSONRPCNotification) and root.method == "notifications/initialized":
+                        tg.start_soon(listen_server_messages)
+        finally:
+            await write_stream.aclose()
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(post_writer, tg)
+            try:
+                yield read_stream, write_stream
+            finally:
+                if state["session_id"]:
+                    # 通知服务器结束会话，失败时忽略（服务器会自行过期）
+                    with anyio.move_on_after(5, shield=True):
+                        try:
+                            await client.delete(url, headers=request_headers("application/json"))
+                        except Exception as exc:
+                            logger.debug(f"结束MCP会话失败: {exc}")
+                tg.cancel_scope.cancel()
+    finally:
+        await read_stream_writer.aclose()
+        await write_stream.aclose()
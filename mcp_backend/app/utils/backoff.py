@@ -0,0 +1,44 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """计算带抖动的指数退避时间（full jitter）
+
+    Args:
+        attempt: 已失败的次数，从0开始
+        base: 基础等待时间（秒）
+        cap: 等待时间上限（秒）
+
+    Returns:
+        float: 本次应等待的秒数，取值范围 [0, min(cap, base * 2**attempt)]
+    """
+    ceiling = min(cap, base * (2 ** min(attempt, 32)))
+    return random.uniform(0, ceiling)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头
+
+    Args:
+        value: 头的值，可以是秒数或HTTP日期
+
+    Returns:
+        Optional[float]: 距离可以重试还需等待的秒数（不小于0），无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
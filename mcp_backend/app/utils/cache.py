@@ -0,0 +1,112 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 缓存未命中时的哨兵值，用于区分缓存了None的情况
+MISSING = object()
+
+
+def canonical_arguments(arguments: Optional[Dict[str, Any]]) -> str:
+    """将参数规范化为稳定的字符串，用作缓存键（键排序、紧凑分隔符）"""
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class TTLCache:
+    """带过期时间和LRU淘汰的内存缓存
+
+    每个条目有独立的TTL（None表示不过期，由调用方显式失效）；超过 max_entries，
+    或设置了 max_bytes 且条目总大小超出预算时，淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # key -> (过期时间, 值, 大小)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """获取未过期的缓存值，命中时将条目移到LRU队尾"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value, _size = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float], size: int = 0) -> bool:
+        """写入缓存条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 存活秒数，None表示不过期
+            size: 条目大小（字节），用于字节预算
+
+        Returns:
+            bool: 是否已写入（单个条目超出字节预算时不缓存）
+        """
+        if self.max_bytes is not None and size > self.max_bytes:
+            self._pop(key)
+            return False
+        self._pop(key)
+        expires_at = float("inf") if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (expires_at, value, size)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._pop(oldest)
+            self.evictions += 1
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        """删除指定条目，返回条目是否存在"""
+        return self._pop(key)
+
+    def _pop(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.total_bytes -= entry[2]
+        return True
+
+    def purge(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """清除满足条件的条目（不传条件时清空），返回清除的数量"""
+        if predicate is None:
+            count = len(self._entries)
+            self._entries.clear()
+            self.total_bytes = 0
+            return count
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._pop(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from app.utils.cache import canonical_arguments
+
+# 决定连接到哪个服务器进程的配置项，任一变化时已保存的目录作废
+CONNECTION_KEYS = ("type", "command", "args", "env", "url", "headers")
+
+# 持久化的目录类型
+CATALOG_KINDS = ("tools", "resources", "prompts")
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """计算服务器连接配置的指纹"""
+    connection = {key: config.get(key) for key in CONNECTION_KEYS}
+    return hashlib.sha256(canonical_arguments(connection).encode("utf-8")).hexdigest()
+
+
+class CatalogStore:
+    """按服务器把最近一次从服务器获取的目录（工具、资源、prompt）保存为JSON文件
+
+    lazy服务器启动时不连接，从这里加载上次的目录，使其工具在首次使用前即可被路由和列出。
+    保存时记录连接配置的指纹，配置变化后旧目录不再加载。
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, name: str) -> Path:
+        return self.directory / f"{quote(name, safe='')}.json"
+
+    def load(self, name: str, config: Dict[str, Any]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """读取已保存的目录
+
+        Returns:
+            Optional[Dict[str, List[Dict[str, Any]]]]: 目录类型到条目列表，
+            没有保存、文件损坏或连接配置已变化时返回None
+        """
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("fingerprint") != config_fingerprint(config):
+            return None
+        catalogs = data.get("catalogs") or {}
+        return {kind: catalogs[kind] for kind in CATALOG_KINDS if isinstance(catalogs.get(kind), list)}
+
+    def save(self, name: str, config: Dict[str, Any], catalogs: Dict[str, List[Dict[str, Any]]]) -> None:
+        """保存目录（先写临时文件再替换，不会留下写了一半的文件）
+
+        Raises:
+            OSError: 写入失败
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(name)
+        temp_path = path.with_suffix(".tmp")
+        data = {"fingerprint": config_fingerprint(config), "catalogs": catalogs}
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(temp_path, path)
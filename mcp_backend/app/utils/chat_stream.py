@@ -0,0 +1,110 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+def parse_sse_data(line: str) -> Optional[str]:
+    """解析SSE的一行，返回 data 字段的内容；注释、空行和其他字段返回None"""
+    if not line.startswith("data:"):
+        return None
+    return line[5:].strip()
+
+
+class ChatStreamAccumulator:
+    """把OpenAI兼容接口的流式响应块（chat.completion.chunk）累积为完整的响应
+
+    文本增量按到达顺序拼接；工具调用按 index 累积，id 和名称只在首个块出现，
+    参数字符串分多块到达。结束后 response() 返回与非流式接口相同结构的响应，
+    可以交给同一套解析逻辑处理。
+    """
+
+    def __init__(self) -> None:
+        self.id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self._content: List[str] = []
+        # index -> {"id", "name", "arguments": [参数片段]}
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+
+    @property
+    def content(self) -> str:
+        """已收到的文本"""
+        return "".join(self._content)
+
+    def feed(self, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """处理一个响应块
+
+        Args:
+            chunk: 解析后的 chat.completion.chunk
+
+        Returns:
+            List[Dict[str, Any]]: 块中的增量事件，content 事件为 {"type": "content", "delta": 文本}，
+            tool_call 事件为 {"type": "tool_call", "index", "id", "name", "arguments_delta"}
+        """
+        self.id = self.id or chunk.get("id")
+        self.model = self.model or chunk.get("model")
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+
+        events: List[Dict[str, Any]] = []
+        for choice in chunk.get("choices") or []:
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+            delta = choice.get("delta") or {}
+            text = delta.get("content")
+            if text:
+                self._content.append(text)
+                events.append({"type": "content", "delta": text})
+            for call_delta in delta.get("tool_calls") or []:
+                events.append(self._feed_tool_call(call_delta))
+        return events
+
+    def _feed_tool_call(self, call_delta: Dict[str, Any]) -> Dict[str, Any]:
+        index = call_delta.get("index")
+        if index is None:
+            # 部分供应商不返回 index：带新 id 的块开始下一个调用，否则续接最后一个
+            call_id = call_delta.get("id")
+            known = call_id is not None and any(call["id"] == call_id for call in self._tool_calls.values())
+            if self._tool_calls and (call_id is None or known):
+                index = max(self._tool_calls)
+            else:
+                index = len(self._tool_calls)
+        call = self._tool_calls.setdefault(index, {"id": None, "name": None, "arguments": []})
+        function = call_delta.get("function") or {}
+        if call_delta.get("id"):
+            call["id"] = call_delta["id"]
+        if function.get("name"):
+            call["name"] = function["name"]
+        arguments = function.get("arguments")
+        if isinstance(arguments, dict):
+            # 个别供应商直接返回完整的参数对象
+            arguments = json.dumps(arguments, ensure_ascii=False)
+        if arguments:
+            call["arguments"].append(arguments)
+        return {
+            "type": "tool_call",
+            "index": index,
+            "id": call["id"],
+            "name": call["name"],
+            "arguments_delta": arguments or ""
+        }
+
+    def response(self) -> Dict[str, Any]:
+        """组装与非流式接口相同结构的完整响应"""
+        message: Dict[str, Any] = {"role": "assistant", "content": self.content}
+        if self._tool_calls:
+            message["tool_calls"] = [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": "".join(call["arguments"]) or "{}"}
+                }
+                for _, call in sorted(self._tool_calls.items())
+            ]
+        return {
+            "id": self.id,
+            "object": "chat.completion",
+            "model": self.model,
+            "choices": [{"index": 0, "message": message, "finish_reason": self.finish_reason}],
+            "usage": self.usage
+        }
@@ -0,0 +1,81 @@
+import math
+import time
+from typing import Any, Dict, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，请求被立即拒绝"""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器
+
+    closed（正常）：连续失败达到 failure_threshold 次后打开。
+    open（熔断）：在 reset_timeout 秒内拒绝所有请求，避免请求在已经不可用的上游上排队超时。
+    half_open（探测）：冷却结束后只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.rejected = 0
+        self._probing = False
+
+    def before_call(self) -> None:
+        """请求前检查
+
+        Raises:
+            CircuitOpenError: 熔断中，或已有探测请求正在进行
+        """
+        if self.state == "closed":
+            return
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"{self.name} 暂不可用（熔断中，{math.ceil(remaining)} 秒后重试）: {self.last_error}", remaining
+                )
+            self.state = "half_open"
+        if self._probing:
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} 暂不可用（正在探测恢复）: {self.last_error}", self.reset_timeout)
+        self._probing = True
+
+    def record_success(self) -> None:
+        """记录一次成功，关闭熔断器"""
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self, error: str) -> None:
+        """记录一次失败，达到阈值或探测失败时打开熔断器"""
+        self.failures += 1
+        self.last_error = error
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """请求既不算成功也不算失败（如限流、客户端错误、被取消）时释放探测名额，不改变连续失败计数"""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable
+
+
+class _Flight:
+    """一次进行中的共享调用"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并相同键的并发调用，使其共享同一个上游任务
+
+    上游调用在独立任务中执行，每个调用方通过 asyncio.shield 等待结果：
+    单个调用方被取消不会影响其他调用方；只有当所有调用方都离开时才取消上游任务。
+    调用完成后立即移除，之后的同键调用会重新发起请求（结果缓存由调用方负责）。
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行fn，或加入同键的进行中调用并等待其结果
+
+        Args:
+            key: 调用的去重键
+            fn: 无参协程函数，只在没有同键调用进行中时执行
+
+        Returns:
+            Any: 共享调用的结果；调用失败时所有调用方收到同一个异常
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task, key=key, flight=flight: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 最后一个调用方已离开，没有人需要这个结果了
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "shared": self.shared
+        }
+
+
+class QueueFullError(RuntimeError):
+    """并发已满且等待队列已满，请求被立即拒绝"""
+
+
+class FairLimiter:
+    """带公平排队的并发限制器
+
+    同时最多 max_in_flight 个请求持有槽位；其余请求按调用方（owner）分组排队，
+    槽位释放时在各调用方之间轮转分配，单个调用方的突发请求不会饿死其他调用方。
+    排队总数达到 max_queue 时立即抛出 QueueFullError，而不是无限堆积。
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0
+        self.queued = 0
+        # 调用方 -> 等待中的future，OrderedDict的顺序即轮转顺序
+        self._queues: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self.acquired = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self, owner: Hashable = None) -> AsyncIterator[None]:
+        """获取一个槽位，退出上下文时释放"""
+        await self.acquire(owner)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, owner: Hashable = None) -> None:
+        """获取槽位，必要时排队等待
+
+        Raises:
+            QueueFullError: 等待队列已满
+        """
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            self._record_wait(0.0)
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"请求队列已满（并发 {self.in_flight}，排队 {self.queued}）")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(owner, deque()).append(future)
+        self.queued += 1
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 槽位已移交给本请求但调用方已取消，转交给下一个等待者
+                self.release()
+            else:
+                self._remove_waiter(owner, future)
+            raise
+        self._record_wait(time.monotonic() - start)
+
+    def release(self) -> None:
+        """释放槽位，优先直接移交给下一个调用方的等待者"""
+        while self._queues:
+            owner, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(owner)
+            else:
+                del self._queues[owner]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _remove_waiter(self, owner: Hashable, future: asyncio.Future) -> None:
+        queue = self._queues.get(owner)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queued -= 1
+        if not queue:
+            del self._queues[owner]
+
+    def _record_wait(self, waited: float) -> None:
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取并发与排队统计"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "avg_wait": round(self.total_wait / self.acquired, 4) if self.acquired else 0.0,
+            "max_wait": round(self.max_wait, 4)
+        }
@@ -0,0 +1,51 @@
+import bisect
+from typing import Any, Dict, Optional, Sequence
+
+# 默认延迟分桶上界（秒）
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图，记录次数、总和与最近一次的值，分位数按分桶上界估算"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # 最后一个计数对应超出最大上界的观测
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last: Optional[float] = None
+
+    def observe(self, seconds: float) -> None:
+        """记录一次观测"""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """估算分位数，返回所在分桶的上界（超出最大上界时返回最大上界）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[min(index, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取可序列化的统计快照"""
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4) if self.count else None,
+            "last": round(self.last, 4) if self.last is not None else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1]
+            }
+        }
@@ -0,0 +1,121 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class _Channel:
+    """一个进度令牌的订阅者与最近一次事件"""
+
+    __slots__ = ("subscribers", "last", "active")
+
+    def __init__(self) -> None:
+        self.subscribers: List[asyncio.Queue] = []
+        self.last: Optional[Dict[str, Any]] = None
+        self.active = False
+
+
+class ProgressBroker:
+    """按进度令牌分发事件的发布/订阅通道
+
+    订阅可以早于调用开始（客户端先打开订阅再发起调用），新订阅者会先收到最近一次事件。
+    调用结束时推送最终事件并关闭所有订阅；最近结束的令牌保留最终事件，
+    避免订阅晚于调用结束时一直等待。订阅者消费过慢时丢弃最旧的事件，只保留最新进度。
+    """
+
+    # 订阅队列中表示通道已结束的标记
+    _CLOSED: Dict[str, Any] = {}
+
+    def __init__(self, max_queue: int = 64, max_finished: int = 256) -> None:
+        self.max_queue = max(2, max_queue)
+        self.max_finished = max_finished
+        self._channels: Dict[str, _Channel] = {}
+        # 最近结束的令牌 -> 最终事件
+        self._finished: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def begin(self, token: str) -> None:
+        """登记一个进行中的调用
+
+        Raises:
+            ValueError: 该令牌已有进行中的调用
+        """
+        channel = self._channels.setdefault(token, _Channel())
+        if channel.active:
+            raise ValueError(f"进度令牌已在使用中: {token}")
+        channel.active = True
+        self._finished.pop(token, None)
+
+    def is_active(self, token: str) -> bool:
+        channel = self._channels.get(token)
+        return bool(channel and channel.active)
+
+    def publish(self, token: str, event: Dict[str, Any]) -> None:
+        """向令牌的所有订阅者推送事件，令牌不存在时忽略"""
+        channel = self._channels.get(token)
+        if channel is None or not channel.active:
+            return
+        channel.last = event
+        for queue in channel.subscribers:
+            self._put(queue, event)
+
+    def end(self, token: str, event: Dict[str, Any]) -> None:
+        """推送最终事件并关闭令牌的所有订阅"""
+        channel = self._channels.pop(token, None)
+        self._finished[token] = event
+        self._finished.move_to_end(token)
+        while len(self._finished) > self.max_finished:
+            self._finished.popitem(last=False)
+        if channel is None:
+            return
+        for queue in channel.subscribers:
+            self._put(queue, event)
+            self._put(queue, self._CLOSED)
+
+    async def subscribe(self, token: str, keepalive: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """订阅令牌的进度事件，直到收到最终事件
+
+        Args:
+            token: 进度令牌
+            keepalive: 超过该时间（秒）没有事件时产出None，供调用方发送保活数据
+
+        Yields:
+            Optional[Dict[str, Any]]: 进度事件；None表示保活
+        """
+        finished = self._finished.get(token)
+        if finished is not None:
+            yield finished
+            return
+
+        channel = self._channels.setdefault(token, _Channel())
+        queue: asyncio.Queue = asyncio.Queue(self.max_queue)
+        channel.subscribers.append(queue)
+        try:
+            if channel.last is not None:
+                yield channel.last
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive) if keepalive else await queue.get()
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is self._CLOSED:
+                    return
+                yield event
+        finally:
+            channel.subscribers.remove(queue)
+            # 没有调用也没有订阅者的通道不再保留
+            if not channel.active and not channel.subscribers and self._channels.get(token) is channel:
+                del self._channels[token]
+
+    def _put(self, queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+        if queue.full():
+            # 消费过慢：丢弃最旧的事件
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取通道统计"""
+        return {
+            "active": sum(1 for channel in self._channels.values() if channel.active),
+            "subscribers": sum(len(channel.subscribers) for channel in self._channels.values()),
+            "finished": len(self._finished)
+        }
@@ -0,0 +1,155 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.histogram import LatencyHistogram
+
+# 限流排队等待时间的分桶上界（秒）
+RATE_LIMIT_WAIT_BUCKETS = (0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class RateLimitWaitError(RuntimeError):
+    """按当前速率排队等待的时间会超过允许的最长等待，请求被拒绝"""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟的额度，按 额度/60 每秒匀速补充
+
+    余额允许为负：实际用量超过预估时由 adjust 补扣，之后的请求相应多等待。
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """取走 amount 个令牌需要等待的时间（秒），超过容量的请求按一整桶计算"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        """取走令牌（不检查余额）"""
+        self._refill()
+        self.tokens -= amount
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量修正：正数补扣，负数退还"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """每分钟请求数（RPM）与每分钟token数（TPM）限流器
+
+    请求按到达顺序排队，轮到时等待两个令牌桶同时满足后取走额度再发出请求，
+    而不是直接发出后收到429。预计等待超过 max_wait 的请求立即拒绝，不会无限堆积。
+    TPM 按请求前的预估扣减，请求完成后用供应商返回的实际用量修正。
+    """
+
+    def __init__(self, name: str, rpm: Optional[int] = None, tpm: Optional[int] = None, max_wait: float = 60.0) -> None:
+        self.name = name
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.max_wait = max_wait
+        # asyncio.Lock 按获取顺序唤醒等待者，即请求的排队顺序
+        self._lock = asyncio.Lock()
+        self.queued = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.wait = LatencyHistogram(RATE_LIMIT_WAIT_BUCKETS)
+
+    async def acquire(self, tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """排队获取一次请求的额度
+
+        Args:
+            tokens: 本次请求预估消耗的token数
+            max_wait: 最长等待时间（秒），为空时使用限流器的设置
+
+        Returns:
+            float: 实际排队等待的时间（秒）
+
+        Raises:
+            RateLimitWaitError: 预计等待时间超过最长等待
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        deadline = start + max_wait
+        self.queued += 1
+        try:
+            try:
+                async with asyncio.timeout_at(asyncio.get_running_loop().time() + max_wait):
+                    await self._lock.acquire()
+            except TimeoutError:
+                self._reject(f"排队超过 {max_wait} 秒", max_wait)
+            try:
+                delay = self._wait_time(tokens)
+                if time.monotonic() + delay > deadline:
+                    self._reject(f"需要等待 {math.ceil(delay)} 秒", delay)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.rpm:
+                    self.rpm.take(1)
+                if self.tpm:
+                    self.tpm.take(tokens)
+            finally:
+                self._lock.release()
+        finally:
+            self.queued -= 1
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.wait.observe(waited)
+        return waited
+
+    def _wait_time(self, tokens: int) -> float:
+        delay = 0.0
+        if self.rpm:
+            delay = self.rpm.wait_time(1)
+        if self.tpm:
+            delay = max(delay, self.tpm.wait_time(tokens))
+        return delay
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        self.rejected += 1
+        raise RateLimitWaitError(f"{self.name} 已达到速率限制（{reason}）", retry_after)
+
+    def record_usage(self, estimated: int, actual: Optional[int]) -> None:
+        """请求完成后用实际token用量修正预估，actual 为空（供应商未返回用量）时保留预估"""
+        if self.tpm and actual is not None:
+            self.tpm.adjust(actual - estimated)
+
+    def refund(self, estimated: int) -> None:
+        """请求没有实际用量可修正时退还预估的token额度（请求数额度不退还，失败的请求同样计入供应商的RPM）"""
+        if self.tpm:
+            self.tpm.adjust(-estimated)
+
+    def release(self, estimated: int) -> None:
+        """放弃已获取的额度：退还预估的token额度和一个请求数额度"""
+        self.refund(estimated)
+        if self.rpm:
+            self.rpm.adjust(-1)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限流与排队等待统计"""
+        return {
+            "rpm": self.rpm.capacity if self.rpm else None,
+            "tpm": self.tpm.capacity if self.tpm else None,
+            "rpm_available": round(self.rpm.tokens, 2) if self.rpm else None,
+            "tpm_available": round(self.tpm.tokens) if self.tpm else None,
+            "queued": self.queued,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "wait": self.wait.snapshot()
+        }
@@ -0,0 +1,89 @@
+import base64
+from tempfile import SpooledTemporaryFile
+from typing import IO, Iterator, Optional, Tuple
+
+
+def decode_base64_to_spool(data: str, max_memory: int, chunk_size: int = 1024 * 1024) -> SpooledTemporaryFile:
+    """分块解码base64字符串，写入超过 max_memory 后落盘的临时文件
+
+    整段解码会再生成一份完整的bytes副本，分块解码只需要一个块的额外内存。
+
+    Args:
+        data: base64编码的字符串（允许包含换行等空白字符）
+        max_memory: 内存中保留的最大字节数，超出后转存到磁盘
+        chunk_size: 每次解码的字符数
+
+    Returns:
+        SpooledTemporaryFile: 已写入解码内容的文件，读写位置在末尾
+
+    Raises:
+        ValueError: data不是合法的base64
+    """
+    spool = SpooledTemporaryFile(max_size=max_memory)
+    pending = ""
+    try:
+        for offset in range(0, len(data), chunk_size):
+            piece = pending + "".join(data[offset:offset + chunk_size].split())
+            usable = len(piece) - len(piece) % 4
+            spool.write(base64.b64decode(piece[:usable], validate=True))
+            pending = piece[usable:]
+        if pending:
+            spool.write(base64.b64decode(pending, validate=True))
+    except Exception as e:
+        spool.close()
+        raise ValueError(f"无效的base64内容: {str(e)}")
+    return spool
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析HTTP Range请求头（只支持单个bytes区间）
+
+    Args:
+        header: Range请求头的值
+        size: 内容总字节数
+
+    Returns:
+        Optional[Tuple[int, int]]: 闭区间 (start, end)；没有Range或为多区间请求时返回None，表示返回完整内容
+
+    Raises:
+        ValueError: 区间格式错误或无法满足（应返回416）
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        raise ValueError(f"无效的Range: {header}")
+    try:
+        if not start_text:
+            # 后缀区间: bytes=-N 表示最后N个字节
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError(f"无效的Range: {header}")
+            start, end = max(0, size - suffix), size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"无效的Range: {header}")
+    end = min(end, size - 1)
+    if start < 0 or start >= size or start > end:
+        raise ValueError(f"无法满足的Range: {header}")
+    return start, end
+
+
+def iter_file_range(file: IO[bytes], start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """按块读取文件的闭区间 [start, end]，读取结束后关闭文件"""
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
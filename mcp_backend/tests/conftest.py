@@ -0,0 +1,153 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import pytest
+
+# 测试从 mcp_backend 目录导入 app 包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeClock:
+    """可手动推进的 time.monotonic 替身"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """替换 time.monotonic（只用于不运行事件循环的同步测试）"""
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+class FakeSession:
+    """模拟MCP会话：返回传输上配置的工具目录，工具调用交给传输上的处理函数"""
+
+    def __init__(self, transport: "FakeTransport", server_name: str) -> None:
+        self.transport = transport
+        self.server_name = server_name
+        self.closed = False
+        self.calls: List[tuple] = []
+
+    async def send_request(self, request: Any, result_type: Any) -> Any:
+        from mcp import types as mcp_types
+
+        method = request.root.method
+        if method == "tools/list":
+            names = self.transport.server_tools.get(self.server_name, self.transport.tools)
+            tools = [mcp_types.Tool(name=name, inputSchema={"type": "object"}) for name in names]
+            return mcp_types.ListToolsResult(tools=tools)
+        if method == "resources/list":
+            return mcp_types.ListResourcesResult(resources=[])
+        if method == "prompts/list":
+            return mcp_types.ListPromptsResult(prompts=[])
+        raise RuntimeError(f"Method not found: {method}")
+
+    async def ping_until(self, deadline: Optional[float]) -> None:
+        return None
+
+    async def read_resource(self, uri: Any) -> Any:
+        from mcp import types as mcp_types
+
+        self.transport.resource_reads += 1
+        text = self.transport.resources[str(uri)]
+        return mcp_types.ReadResourceResult(
+            contents=[mcp_types.TextResourceContents(uri=str(uri), mimeType="text/plain", text=text)]
+        )
+
+    async def subscribe_resource(self, uri: Any) -> None:
+        self.transport.subscriptions.append(str(uri))
+
+    async def call_tool_until(self, name: str, arguments: Optional[Dict[str, Any]],
+                              deadline: Optional[float] = None, progress_token: Optional[str] = None) -> Any:
+        self.calls.append((name, arguments))
+        async with asyncio.timeout_at(deadline):
+            return await self.transport.handler(self, name, arguments or {})
+
+    def close(self) -> None:
+        self.closed = True
+
+
+async def echo_tool(session: FakeSession, name: str, arguments: Dict[str, Any]) -> Any:
+    """默认的工具处理函数：返回 "服务器:工具:参数" 文本，参数中的 sleep 指定执行耗时"""
+    from mcp import types as mcp_types
+
+    if arguments.get("sleep"):
+        await asyncio.sleep(arguments["sleep"])
+    if arguments.get("fail"):
+        raise RuntimeError(arguments["fail"])
+    text = f"{session.server_name}:{name}:{json.dumps(arguments, sort_keys=True)}"
+    return mcp_types.CallToolResult(content=[mcp_types.TextContent(type="text", text=text)])
+
+
+class FakeTransport:
+    """替代stdio传输：记录连接次数，可让接下来的若干次连接失败"""
+
+    def __init__(self) -> None:
+        self.tools: List[str] = ["echo"]
+        # 按服务器名指定的工具目录，未指定的服务器使用 tools
+        self.server_tools: Dict[str, List[str]] = {}
+        # 资源URI到文本内容
+        self.resources: Dict[str, str] = {}
+        self.resource_reads = 0
+        self.subscriptions: List[str] = []
+        # 会话初始化时返回的服务器能力
+        self.capabilities: Any = None
+        self.connects = 0
+        self.fail_connects = 0
+        # 每次建立连接耗费的时间（秒）
+        self.connect_delay = 0.0
+        self.sessions: List[FakeSession] = []
+        self.handler: Callable[[FakeSession, str, Dict[str, Any]], Awaitable[Any]] = echo_tool
+
+    async def open(self, server: Any, stack: Any) -> None:
+        self.connects += 1
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+        if self.fail_connects:
+            self.fail_connects -= 1
+            raise ConnectionError("connection refused")
+        session = FakeSession(self, server.name)
+        stack.callback(session.close)
+        self.sessions.append(session)
+        server.session = session
+        server.server_capabilities = self.capabilities
+
+
+@pytest.fixture
+def fake_transport(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> FakeTransport:
+    """让stdio服务器连接到模拟会话，缩短重连退避，关闭心跳和定期目录刷新，目录保存到临时目录"""
+    from app.core.config import settings
+    from app.services.mcp_client import Server
+
+    transport = FakeTransport()
+
+    async def initialize_stdio_session(server: Server, stack: Any, server_params: Any) -> None:
+        await transport.open(server, stack)
+
+    monkeypatch.setattr(Server, "_initialize_stdio_session", initialize_stdio_session)
+    monkeypatch.setattr(settings, "MCP_RECONNECT_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "MCP_RECONNECT_MAX_DELAY", 0.05)
+    monkeypatch.setattr(settings, "MCP_LIVENESS_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(settings, "MCP_CATALOG_REFRESH_INTERVAL", 0)
+    monkeypatch.setattr(settings, "MCP_CATALOG_CACHE_DIR", tmp_path / "catalogs")
+    return transport
+
+
+async def wait_for(predicate: Callable[[], bool], timeout: float = 2.0) -> None:
+    """轮询等待条件成立（监管任务在后台运行）"""
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.005)
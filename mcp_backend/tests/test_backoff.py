@@ -0,0 +1,39 @@
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.utils.backoff import backoff_delay, parse_retry_after
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(0, 100, 7):
+        assert 0 <= backoff_delay(attempt, 0.5, 8.0) <= 8.0
+    assert backoff_delay(0, 0.5, 8.0) <= 0.5
+
+
+def test_backoff_delay_ceiling_doubles_per_attempt(monkeypatch):
+    # 抖动取上限时即为退避的上界
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt, 1.0, 60.0) for attempt in range(8)] == [1, 2, 4, 8, 16, 32, 60, 60]
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-3") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+    assert 28 <= delay <= 30
+
+
+def test_parse_retry_after_date_in_past_is_zero():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_parse_retry_after_invalid():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from app.services.mcp_client import MCPClientManager
+from conftest import wait_for
+
+STDIO_CONFIG = {"type": "stdio", "command": "fake-mcp-server"}
+
+
+def test_batch_results_keep_input_order_and_report_errors(fake_transport):
+    fake_transport.server_tools.update({"a": ["echo"], "b": ["echo", "fetch"]})
+
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("a", dict(STDIO_CONFIG))
+            await manager.add_server("b", dict(STDIO_CONFIG))
+            return await manager.execute_tools_batch([
+                {"server_id": "a", "tool": "echo", "arguments": {"sleep": 0.05}},
+                {"server_id": "missing", "tool": "echo"},
+                {"server_id": "b", "tool_name": "fetch", "arguments": {"n": 1}},
+                {"server_id": "a"},
+                {"server_id": "a", "tool": "fetch"},
+                {"server_id": "b", "tool": "echo", "arguments": {"fail": "boom"}},
+                {"server_id": "b", "tool": "echo", "arguments": {"sleep": 10}},
+            ], timeout=0.2)
+        finally:
+            await manager.disconnect_all()
+
+    results = asyncio.run(scenario())
+    assert [result["index"] for result in results] == list(range(7))
+    assert [result["success"] for result in results] == [True, False, True, False, False, False, False]
+    assert [result.get("error_type") for result in results] == [
+        None, "invalid", None, "invalid", "invalid", "error", "timeout"
+    ]
+    assert results[0]["result"]["content"][0]["text"] == 'a:echo:{"sleep": 0.05}'
+    assert results[2]["result"]["content"][0]["text"] == 'b:fetch:{"n": 1}'
+    assert "工具未找到" in results[4]["error"] and "boom" in results[5]["error"]
+    # 每一项（包括校验失败的项）都带有执行时间
+    assert all("execution_time" in result for result in results)
+
+
+def test_batch_validates_servers_concurrently(fake_transport):
+    fake_transport.connect_delay = 0.2
+
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            # 未使用过的lazy服务器没有目录，校验时需要唤醒
+            for name in ("a", "b", "c"):
+                await manager.add_server(name, dict(STDIO_CONFIG, lifecycle="lazy"), connect=False)
+            begin = time.monotonic()
+            results = await manager.execute_tools_batch(
+                [{"server_id": name, "tool": "echo"} for name in ("a", "b", "c", "a")]
+            )
+            return results, time.monotonic() - begin
+        finally:
+            await manager.disconnect_all()
+
+    results, elapsed = asyncio.run(scenario())
+    assert all(result["success"] for result in results)
+    assert fake_transport.connects == 3
+    # 三个服务器同时唤醒，而不是依次等待
+    assert elapsed < 0.5
+
+
+def test_batch_validation_is_bounded_by_the_batch_timeout(fake_transport):
+    fake_transport.connect_delay = 0.3
+
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("lazy", dict(STDIO_CONFIG, lifecycle="lazy"), connect=False)
+            results = await manager.execute_tools_batch([{"server_id": "lazy", "tool": "echo"}], timeout=0.05)
+            server = await manager.get_server("lazy")
+            # 校验超时后唤醒在后台继续完成
+            await wait_for(lambda: not server.hibernating)
+            return results
+        finally:
+            await manager.disconnect_all()
+
+    [result] = asyncio.run(scenario())
+    assert result["success"] is False and result["error_type"] == "timeout"
+    assert 0.04 <= result["execution_time"] < 0.3
+    assert fake_transport.connects == 1
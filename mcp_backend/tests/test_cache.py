@@ -0,0 +1,68 @@
+from app.utils.cache import MISSING, TTLCache, canonical_arguments
+
+
+def test_canonical_arguments_is_order_independent():
+    assert canonical_arguments({"b": 1, "a": [1, 2]}) == canonical_arguments({"a": [1, 2], "b": 1})
+    assert canonical_arguments(None) == canonical_arguments({}) == "{}"
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache()
+    cache.set("k", "v", ttl=10)
+    clock.advance(9.9)
+    assert cache.get("k") == "v"
+    clock.advance(0.1)
+    assert cache.get("k") is MISSING
+    assert len(cache) == 0
+
+
+def test_none_ttl_never_expires_and_none_value_is_a_hit(clock):
+    cache = TTLCache()
+    cache.set("k", None, ttl=None)
+    clock.advance(1e9)
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1, ttl=None)
+    cache.set("b", 2, ttl=None)
+    cache.get("a")
+    cache.set("c", 3, ttl=None)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_byte_budget_evicts_oldest_and_rejects_oversized():
+    cache = TTLCache(max_entries=10, max_bytes=100)
+    cache.set("a", "x", ttl=None, size=60)
+    cache.set("b", "y", ttl=None, size=30)
+    cache.set("c", "z", ttl=None, size=30)
+    assert cache.get("a") is MISSING
+    assert cache.total_bytes == 60
+
+    assert cache.set("huge", "w", ttl=None, size=101) is False
+    assert cache.get("huge") is MISSING
+    assert cache.total_bytes == 60
+
+
+def test_overwrite_replaces_size():
+    cache = TTLCache(max_bytes=100)
+    cache.set("a", "x", ttl=None, size=60)
+    cache.set("a", "y", ttl=None, size=10)
+    assert cache.total_bytes == 10
+    assert cache.get("a") == "y"
+
+
+def test_purge_with_predicate():
+    cache = TTLCache()
+    cache.set(("s1", "t"), 1, ttl=None, size=5)
+    cache.set(("s2", "t"), 2, ttl=None, size=5)
+    assert cache.purge(lambda key: key[0] == "s1") == 1
+    assert cache.get(("s2", "t")) == 2
+    assert cache.total_bytes == 5
+    assert cache.purge() == 1
+    assert cache.total_bytes == 0
@@ -0,0 +1,60 @@
+import json
+
+from app.utils.chat_stream import ChatStreamAccumulator, parse_sse_data
+
+
+def chunk(delta, finish_reason=None, **extra):
+    return {"id": "c1", "model": "m", "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+
+
+def test_parse_sse_data():
+    assert parse_sse_data('data: {"a":1}') == '{"a":1}'
+    assert parse_sse_data("data:[DONE]") == "[DONE]"
+    assert parse_sse_data(": keep-alive") is None
+    assert parse_sse_data("event: message") is None
+    assert parse_sse_data("") is None
+
+
+def test_content_is_concatenated():
+    acc = ChatStreamAccumulator()
+    assert acc.feed(chunk({"role": "assistant", "content": "你"})) == [{"type": "content", "delta": "你"}]
+    acc.feed(chunk({"content": "好"}))
+    acc.feed(chunk({}, finish_reason="stop"))
+    acc.feed({"id": "c1", "choices": [], "usage": {"total_tokens": 7}})
+    response = acc.response()
+    assert response["choices"][0]["message"] == {"role": "assistant", "content": "你好"}
+    assert response["choices"][0]["finish_reason"] == "stop"
+    assert response["usage"] == {"total_tokens": 7}
+    assert response["id"] == "c1"
+
+
+def test_tool_calls_are_assembled_by_index():
+    acc = ChatStreamAccumulator()
+    acc.feed(chunk({"tool_calls": [
+        {"index": 0, "id": "call_a", "function": {"name": "search", "arguments": ""}},
+        {"index": 1, "id": "call_b", "function": {"name": "read", "arguments": '{"pa'}},
+    ]}))
+    acc.feed(chunk({"tool_calls": [{"index": 0, "function": {"arguments": '{"q":'}}]}))
+    acc.feed(chunk({"tool_calls": [{"index": 1, "function": {"arguments": 'th":"/x"}'}}]}))
+    events = acc.feed(chunk({"tool_calls": [{"index": 0, "function": {"arguments": '"mcp"}'}}]}, "tool_calls"))
+    assert events == [{"type": "tool_call", "index": 0, "id": "call_a", "name": "search", "arguments_delta": '"mcp"}'}]
+
+    calls = acc.response()["choices"][0]["message"]["tool_calls"]
+    assert [call["id"] for call in calls] == ["call_a", "call_b"]
+    assert json.loads(calls[0]["function"]["arguments"]) == {"q": "mcp"}
+    assert json.loads(calls[1]["function"]["arguments"]) == {"path": "/x"}
+
+
+def test_tool_calls_without_index():
+    acc = ChatStreamAccumulator()
+    acc.feed(chunk({"tool_calls": [{"id": "a", "function": {"name": "f", "arguments": '{"x":'}}]}))
+    acc.feed(chunk({"tool_calls": [{"function": {"arguments": "1}"}}]}))
+    acc.feed(chunk({"tool_calls": [{"id": "b", "function": {"name": "g", "arguments": {"y": 2}}}]}))
+    calls = acc.response()["choices"][0]["message"]["tool_calls"]
+    assert [(call["id"], call["function"]["arguments"]) for call in calls] == [("a", '{"x":1}'), ("b", '{"y": 2}')]
+
+
+def test_tool_call_without_arguments_defaults_to_empty_object():
+    acc = ChatStreamAccumulator()
+    acc.feed(chunk({"tool_calls": [{"index": 0, "id": "a", "function": {"name": "now"}}]}))
+    assert acc.response()["choices"][0]["message"]["tool_calls"][0]["function"]["arguments"] == "{}"
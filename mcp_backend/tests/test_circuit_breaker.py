@@ -0,0 +1,76 @@
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure("HTTP 503")
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("p", failure_threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_after == pytest.approx(30)
+    assert breaker.rejected == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("p", failure_threshold=2)
+    breaker.before_call()
+    breaker.record_failure("HTTP 500")
+    breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    breaker.record_failure("HTTP 500")
+    assert breaker.state == "closed"
+
+
+def test_release_does_not_reset_failure_count():
+    breaker = CircuitBreaker("p", failure_threshold=2)
+    breaker.before_call()
+    breaker.record_failure("HTTP 500")
+    breaker.before_call()
+    breaker.release()  # 例如429
+    breaker.before_call()
+    breaker.record_failure("HTTP 500")
+    assert breaker.state == "open"
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=10)
+    open_breaker(breaker)
+    clock.advance(10)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("p", failure_threshold=5, reset_timeout=10)
+    open_breaker(breaker)
+    clock.advance(10)
+    breaker.before_call()
+    breaker.record_failure("timeout")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_probe_keeps_half_open(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=10)
+    open_breaker(breaker)
+    clock.advance(10)
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == "half_open"
+    # 探测名额已释放，下一个请求可以探测
+    breaker.before_call()
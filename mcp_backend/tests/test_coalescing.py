@@ -0,0 +1,73 @@
+import asyncio
+
+from app.services.mcp_client import MCPClientManager, ToolTimeoutError
+
+COALESCED_CONFIG = {"type": "stdio", "command": "fake-mcp-server", "coalesce_tool_calls": True}
+
+
+def test_coalesced_callers_share_one_call_with_their_own_deadlines(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", dict(COALESCED_CONFIG))
+            arguments = {"sleep": 0.2}
+            impatient = asyncio.create_task(manager.execute_tool("demo", "echo", arguments, timeout=0.05))
+            patient = asyncio.create_task(manager.execute_tool("demo", "echo", arguments, timeout=5))
+            impatient_result = (await asyncio.gather(impatient, return_exceptions=True))[0]
+            # 先超时的调用方离开后，共享调用继续为仍在等待的调用方执行
+            return impatient_result, (await patient).text, fake_transport.sessions[0].calls
+        finally:
+            await manager.disconnect_all()
+
+    impatient_result, text, calls = asyncio.run(scenario())
+    assert isinstance(impatient_result, ToolTimeoutError)
+    assert text == 'demo:echo:{"sleep": 0.2}'
+    assert calls == [("echo", {"sleep": 0.2})]
+
+
+def test_coalesced_call_is_cancelled_when_every_caller_times_out(fake_transport):
+    async def scenario():
+        upstream_cancelled = asyncio.Event()
+
+        async def slow_tool(session, name, arguments):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+
+        fake_transport.handler = slow_tool
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", dict(COALESCED_CONFIG))
+            for result in await asyncio.gather(
+                *(manager.execute_tool("demo", "echo", {}, timeout=0.05) for _ in range(3)),
+                return_exceptions=True
+            ):
+                assert isinstance(result, ToolTimeoutError)
+            await asyncio.wait_for(upstream_cancelled.wait(), 1)
+            server = await manager.get_server("demo")
+            return len(fake_transport.sessions[0].calls), server.limiter.in_flight
+        finally:
+            await manager.disconnect_all()
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_distinct_arguments_are_not_coalesced(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", dict(COALESCED_CONFIG))
+            results = await asyncio.gather(
+                manager.execute_tool("demo", "echo", {"n": 1}),
+                manager.execute_tool("demo", "echo", {"n": 2}),
+                manager.execute_tool("demo", "echo", {"n": 1})
+            )
+            return [result.text for result in results], len(fake_transport.sessions[0].calls)
+        finally:
+            await manager.disconnect_all()
+
+    texts, calls = asyncio.run(scenario())
+    assert texts == ['demo:echo:{"n": 1}', 'demo:echo:{"n": 2}', 'demo:echo:{"n": 1}']
+    assert calls == 2
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from app.utils.concurrency import FairLimiter, QueueFullError, SingleFlight
+
+
+def test_single_flight_shares_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert stats == {"in_flight": 0, "started": 1, "shared": 4}
+
+
+def test_single_flight_cancelling_one_waiter_keeps_the_call():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "result"
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await started.wait()
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ("result", True)
+
+
+def test_single_flight_cancels_upstream_when_all_waiters_leave():
+    async def scenario():
+        flight = SingleFlight()
+        upstream_cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(upstream_cancelled.wait(), 1)
+        return len(flight)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_single_flight_propagates_errors_to_all_waiters():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_fair_limiter_round_robins_between_owners():
+    async def scenario():
+        limiter = FairLimiter(max_in_flight=1, max_queue=10)
+        order = []
+        gate = asyncio.Event()
+
+        async def work(owner, label):
+            async with limiter.slot(owner):
+                order.append(label)
+                await gate.wait()
+
+        holder = asyncio.create_task(work("busy", "holder"))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(work("busy", f"busy{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(work("other", "other0")))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *tasks)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    # 另一个调用方的请求不必等待前一个调用方的全部突发请求
+    assert order == ["holder", "busy0", "other0", "busy1", "busy2"]
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert stats["acquired"] == 5
+
+
+def test_fair_limiter_rejects_when_queue_is_full():
+    async def scenario():
+        limiter = FairLimiter(max_in_flight=1, max_queue=1)
+        await limiter.acquire("a")
+        waiter = asyncio.create_task(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await limiter.acquire("c")
+        limiter.release()
+        await waiter
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_fair_limiter_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        limiter = FairLimiter(max_in_flight=1, max_queue=5)
+        await limiter.acquire("a")
+        waiter = asyncio.create_task(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        # 槽位已完全释放，新的请求可以立即获取
+        await asyncio.wait_for(limiter.acquire("c"), 0.1)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 1 and stats["queued"] == 0
+
+
+def test_server_rejects_calls_beyond_its_queue(fake_transport):
+    from app.services.mcp_client import MCPClientManager
+
+    async def scenario():
+        manager = MCPClientManager()
+        config = {"type": "stdio", "command": "fake-mcp-server", "max_in_flight": 1, "max_queue": 1}
+        try:
+            await manager.add_server("demo", config)
+            results = await asyncio.gather(
+                *(manager.execute_tool("demo", "echo", {"sleep": 0.05, "n": n}, caller=f"c{n}") for n in range(3)),
+                return_exceptions=True
+            )
+            server = await manager.get_server("demo")
+            return results, server.limiter.stats()
+        finally:
+            await manager.disconnect_all()
+
+    results, stats = asyncio.run(scenario())
+    # 一个调用执行、一个排队，第三个调用立即返回繁忙错误
+    assert [type(result).__name__ for result in results] == ["ToolResult", "ToolResult", "QueueFullError"]
+    assert stats["rejected"] == 1 and stats["in_flight"] == 0
@@ -0,0 +1,101 @@
+import asyncio
+
+from app.models.mcp_server_config import MCPServerConfig
+from app.services.mcp_client import MCPClientManager
+
+
+def lazy_config(**overrides):
+    fields = {"id": "lazy", "name": "lazy", "type": "stdio", "command": "fake-mcp-server", "lifecycle": "lazy"}
+    fields.update(overrides)
+    return MCPServerConfig(**fields)
+
+
+async def start(manager, *configs):
+    await manager.start_auto_connect(list(configs))
+
+
+def test_lazy_server_is_not_started_until_first_use(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await start(manager, lazy_config())
+            registered = manager.get_readiness()["servers"][0]["status"]
+            before = (fake_transport.connects, manager.is_server_hibernating("lazy"), manager.has_cached_tools("lazy"))
+            result = await manager.execute_tool("lazy", "echo", {})
+            return registered, before, result.text, manager.is_server_hibernating("lazy")
+        finally:
+            await manager.disconnect_all()
+
+    registered, before, text, hibernating_after = asyncio.run(scenario())
+    assert registered == "hibernated"
+    # 没有已保存的目录时只登记，不启动进程
+    assert before == (0, True, False)
+    assert text == "lazy:echo:{}"
+    assert not hibernating_after and fake_transport.connects == 1
+
+
+def test_lazy_server_catalog_is_restored_at_next_startup_without_spawning(fake_transport):
+    fake_transport.tools = ["echo", "search"]
+
+    async def first_run():
+        manager = MCPClientManager()
+        try:
+            await start(manager, lazy_config())
+            await manager.execute_tool("lazy", "echo", {})
+        finally:
+            await manager.disconnect_all()
+
+    async def second_run(config):
+        manager = MCPClientManager()
+        try:
+            await start(manager, config)
+            return (manager.has_cached_tools("lazy"), [tool["name"] for tool in await manager.list_tools("lazy")],
+                    list(manager._tool_routes.get("search", [])))
+        finally:
+            await manager.disconnect_all()
+
+    asyncio.run(first_run())
+    connects = fake_transport.connects
+    restored = asyncio.run(second_run(lazy_config()))
+    # 连接配置变化后不使用旧目录
+    changed = asyncio.run(second_run(lazy_config(args=["--other"])))
+
+    assert restored == (True, ["echo", "search"], ["lazy"])
+    assert changed == (False, [], [])
+    assert fake_transport.connects == connects
+
+
+def test_hibernate_keeps_catalog_and_wakes_on_next_call(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        config = {"type": "stdio", "command": "fake-mcp-server", "lifecycle": "idle_timeout"}
+        try:
+            await manager.add_server("idle", config)
+            server = await manager.get_server("idle")
+            await server.hibernate()
+            hibernated = (server.session is None, manager.resolve_tool("echo"), fake_transport.sessions[0].closed)
+            result = await manager.execute_tool("idle", "echo", {"n": 1})
+            return hibernated, result.text, server.hibernating
+        finally:
+            await manager.disconnect_all()
+
+    hibernated, text, hibernating = asyncio.run(scenario())
+    # 休眠关闭进程但保留目录，工具仍可路由
+    assert hibernated == (True, ("idle", "echo"), True)
+    assert text == 'idle:echo:{"n": 1}' and not hibernating
+    assert fake_transport.connects == 2
+
+
+def test_server_in_use_is_busy_for_the_idle_monitor(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("idle", {"type": "stdio", "command": "fake-mcp-server"})
+            server = await manager.get_server("idle")
+            with server.in_use():
+                busy = server.is_busy
+            return busy, server.is_busy
+        finally:
+            await manager.disconnect_all()
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -0,0 +1,83 @@
+import asyncio
+
+from app.models.llm_model_group import ModelGroupConfig, ModelGroupMember
+from app.models.llm_provider_config import LLMProviderConfig
+from app.services.llm_service import LLMServiceManager
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+OK = {"choices": [{"message": {"role": "assistant", "content": "from b"}}]}
+
+
+def group_manager(first_completion, second_calls):
+    """模型组 g 依次包含供应商 a 和 b：a 按 first_completion 返回，b 总是成功并记录调用"""
+    manager = LLMServiceManager()
+    for name in ("a", "b"):
+        manager.add_provider(LLMProviderConfig(name=name, type="OpenAI", apiKey="key", models=["m"]))
+    manager.set_model_groups([ModelGroupConfig(
+        name="g", members=[ModelGroupMember(provider="a", model="m"), ModelGroupMember(provider="b", model="m")]
+    )])
+
+    async def second_completion(**kwargs):
+        second_calls.append(kwargs["model"])
+        return OK
+
+    async def second_stream(**kwargs):
+        second_calls.append(kwargs["model"])
+        yield {"type": "content", "delta": "from b"}
+        yield {"type": "done", "response": OK}
+
+    manager.providers["a"].get_completion = first_completion
+    manager.providers["b"].get_completion = second_completion
+    manager.providers["b"].stream_completion = second_stream
+    return manager
+
+
+def test_group_fails_over_when_a_member_raises():
+    second_calls = []
+
+    async def crash(**kwargs):
+        raise RuntimeError("unexpected")
+
+    result = asyncio.run(group_manager(crash, second_calls).chat_with_tools("g", "", MESSAGES))
+    assert result == {"content": "from b"} and second_calls == ["m"]
+
+
+def test_group_fails_over_on_an_unparseable_response():
+    second_calls = []
+
+    async def garbage(**kwargs):
+        return {"unexpected": True}
+
+    result = asyncio.run(group_manager(garbage, second_calls).chat_with_tools("g", "", MESSAGES))
+    assert result == {"content": "from b"} and second_calls == ["m"]
+
+
+def test_group_returns_errors_that_would_repeat_on_every_member():
+    second_calls = []
+
+    async def rejected(**kwargs):
+        return {"error": "context too long", "error_type": "bad_request"}
+
+    result = asyncio.run(group_manager(rejected, second_calls).chat_with_tools("g", "", MESSAGES))
+    assert result == {"error": "context too long", "error_type": "bad_request"} and second_calls == []
+
+
+def test_stream_group_fails_over_when_a_member_raises_before_output():
+    second_calls = []
+
+    async def unused(**kwargs):
+        raise AssertionError("not called")
+
+    async def broken_stream(**kwargs):
+        raise RuntimeError("unexpected")
+        yield
+
+    async def scenario():
+        manager = group_manager(unused, second_calls)
+        manager.providers["a"].stream_completion = broken_stream
+        return [event async for event in manager.stream_chat_with_tools("g", "", MESSAGES)]
+
+    events = asyncio.run(scenario())
+    assert events[0] == {"type": "content", "delta": "from b"}
+    assert events[-1] == {"type": "done", "result": {"content": "from b"}}
+    assert second_calls == ["m"]
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from mcp import types as mcp_types
+
+from app.services.mcp_client import MCPClientManager, ToolCancelledError
+from app.utils.progress import ProgressBroker
+
+
+async def collect(broker, token, **kwargs):
+    return [event async for event in broker.subscribe(token, **kwargs)]
+
+
+def test_subscriber_receives_events_until_end():
+    async def scenario():
+        broker = ProgressBroker()
+        # 订阅可以早于调用开始
+        subscriber = asyncio.create_task(collect(broker, "t"))
+        await asyncio.sleep(0)
+        broker.begin("t")
+        broker.publish("t", {"progress": 1})
+        broker.publish("t", {"progress": 2})
+        broker.end("t", {"type": "completed"})
+        return await asyncio.wait_for(subscriber, 1), broker.stats()
+
+    events, stats = asyncio.run(scenario())
+    assert events == [{"progress": 1}, {"progress": 2}, {"type": "completed"}]
+    assert stats == {"active": 0, "subscribers": 0, "finished": 1}
+
+
+def test_late_subscriber_starts_from_the_latest_event():
+    async def scenario():
+        broker = ProgressBroker()
+        broker.begin("t")
+        broker.publish("t", {"progress": 1})
+        broker.publish("t", {"progress": 2})
+        subscriber = asyncio.create_task(collect(broker, "t"))
+        await asyncio.sleep(0)
+        broker.publish("t", {"progress": 3})
+        broker.end("t", {"type": "completed"})
+        return await asyncio.wait_for(subscriber, 1)
+
+    assert asyncio.run(scenario()) == [{"progress": 2}, {"progress": 3}, {"type": "completed"}]
+
+
+def test_subscriber_after_end_gets_the_final_event():
+    async def scenario():
+        broker = ProgressBroker()
+        broker.begin("t")
+        broker.end("t", {"type": "failed", "error": "boom"})
+        return await asyncio.wait_for(collect(broker, "t"), 1)
+
+    assert asyncio.run(scenario()) == [{"type": "failed", "error": "boom"}]
+
+
+def test_token_cannot_be_reused_while_active():
+    broker = ProgressBroker()
+    broker.begin("t")
+    with pytest.raises(ValueError):
+        broker.begin("t")
+    broker.end("t", {"type": "completed"})
+    # 结束后可以重新使用，新的调用不再返回旧的最终事件
+    broker.begin("t")
+    assert broker.is_active("t")
+
+
+def test_slow_subscriber_keeps_only_the_newest_events():
+    async def scenario():
+        broker = ProgressBroker(max_queue=2)
+        broker.begin("t")
+        events = broker.subscribe("t")
+        # 启动订阅（登记队列）后连续发布，消费者尚未读取
+        first = asyncio.create_task(events.__anext__())
+        await asyncio.sleep(0)
+        for progress in range(5):
+            broker.publish("t", {"progress": progress})
+        received = [await first]
+        broker.end("t", {"type": "completed"})
+        received += [event async for event in events]
+        return received
+
+    # 队列只保留最新的事件，最终事件总能送达
+    assert asyncio.run(scenario()) == [{"progress": 3}, {"type": "completed"}]
+
+
+def test_keepalive_yields_none_while_idle():
+    async def scenario():
+        broker = ProgressBroker()
+        broker.begin("t")
+        events = broker.subscribe("t", keepalive=0.01)
+        keepalive = await asyncio.wait_for(events.__anext__(), 1)
+        await events.aclose()
+        return keepalive
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_tool_progress_notifications_reach_subscribers(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", {"type": "stdio", "command": "fake-mcp-server"})
+            server = await manager.get_server("demo")
+
+            async def reporting_tool(session, name, arguments):
+                for progress in (1, 2):
+                    await server._handle_notification(mcp_types.ProgressNotification(
+                        method="notifications/progress",
+                        params=mcp_types.ProgressNotificationParams(progressToken="job", progress=progress, total=2)
+                    ))
+                    await asyncio.sleep(0.01)
+                return mcp_types.CallToolResult(content=[mcp_types.TextContent(type="text", text="done")])
+
+            fake_transport.handler = reporting_tool
+            subscriber = asyncio.create_task(collect(manager.progress, "job"))
+            await asyncio.sleep(0)
+            result = await manager.execute_tool("demo", "echo", {}, progress_token="job")
+            return result.text, await asyncio.wait_for(subscriber, 1)
+        finally:
+            await manager.disconnect_all()
+
+    text, events = asyncio.run(scenario())
+    assert text == "done"
+    assert [event.get("progress") for event in events] == [1, 2, None]
+    assert events[-1] == {"type": "completed"}
+
+
+def test_cancel_tool_call_by_progress_token(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", {"type": "stdio", "command": "fake-mcp-server"})
+            call = asyncio.create_task(manager.execute_tool("demo", "echo", {"sleep": 10}, progress_token="job"))
+            await asyncio.sleep(0.05)
+            cancelled = manager.cancel_tool_call("job")
+            with pytest.raises(ToolCancelledError):
+                await call
+            return cancelled, await asyncio.wait_for(collect(manager.progress, "job"), 1)
+        finally:
+            await manager.disconnect_all()
+
+    assert asyncio.run(scenario()) == (True, [{"type": "cancelled"}])
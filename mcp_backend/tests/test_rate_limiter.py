@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+from app.utils.rate_limiter import RateLimiter, RateLimitWaitError, TokenBucket
+
+
+def test_token_bucket_refills_at_per_minute_rate(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.advance(0.5)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.advance(120)
+    # 补充不超过容量
+    bucket.take(0)
+    assert bucket.tokens == 60
+
+
+def test_token_bucket_request_larger_than_capacity_waits_for_full_bucket(clock):
+    bucket = TokenBucket(600)
+    bucket.take(300)
+    assert bucket.wait_time(10_000) == pytest.approx(30.0)
+
+
+def test_token_bucket_adjust_allows_debt_and_caps_refund(clock):
+    bucket = TokenBucket(60)
+    bucket.take(50)
+    bucket.adjust(30)  # 实际用量比预估多30
+    assert bucket.tokens == -20
+    assert bucket.wait_time(1) == pytest.approx(21.0)
+    bucket.adjust(-1000)
+    assert bucket.tokens == 60
+
+
+def test_rate_limiter_record_usage_and_refund(clock):
+    limiter = RateLimiter("p", tpm=1000)
+    limiter.tpm.take(400)
+    limiter.record_usage(400, 100)
+    assert limiter.tpm.tokens == 900
+    limiter.record_usage(400, None)
+    assert limiter.tpm.tokens == 900
+    limiter.refund(50)
+    assert limiter.tpm.tokens == 950
+    limiter.refund(400)
+    assert limiter.tpm.tokens == 1000
+
+
+def test_rate_limiter_queues_in_order_and_rejects_beyond_max_wait():
+    async def scenario():
+        # 每秒补充10个请求额度：前两个请求分别等待0.1和0.2秒，之后的请求预计等待超过0.25秒
+        limiter = RateLimiter("p", rpm=600, max_wait=0.25)
+        limiter.rpm.tokens = 0
+        order = []
+
+        async def request(index):
+            try:
+                await limiter.acquire()
+                order.append(index)
+            except RateLimitWaitError:
+                order.append(f"rejected{index}")
+
+        await asyncio.gather(*(request(index) for index in range(4)))
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == [0, 1, "rejected2", "rejected3"]
+    assert stats["acquired"] == 2
+    assert stats["rejected"] == 2
+    assert stats["queued"] == 0
+    assert stats["wait"]["count"] == 2
+
+
+def test_rate_limiter_without_limits_does_not_wait():
+    async def scenario():
+        limiter = RateLimiter("p")
+        return [await limiter.acquire(10_000) for _ in range(3)]
+
+    assert all(waited < 0.05 for waited in asyncio.run(scenario()))
+
+
+def test_rate_limiter_release_returns_request_and_tokens(clock):
+    limiter = RateLimiter("p", rpm=10, tpm=1000)
+    limiter.rpm.take(1)
+    limiter.tpm.take(400)
+    limiter.release(400)
+    assert (limiter.rpm.tokens, limiter.tpm.tokens) == (10, 1000)
+
+
+def limited_manager(get_completion):
+    """供应商 p 的模型 m 单独限流（rpm=10, tpm=100000），供应商整体每分钟只允许1个请求"""
+    from app.models.llm_provider_config import LLMProviderConfig, ModelRateLimit
+    from app.services.llm_service import LLMServiceManager
+
+    manager = LLMServiceManager()
+    manager.add_provider(LLMProviderConfig(
+        name="p", type="OpenAI", apiKey="key", models=["m"], rpm=1, rateLimitMaxWait=1,
+        modelRateLimits={"m": ModelRateLimit(rpm=10, tpm=100000)}
+    ))
+    manager.providers["p"].get_completion = get_completion
+    return manager
+
+
+def model_limiter_available(manager):
+    stats = manager.get_rate_limit_stats()["p/m"]
+    return round(stats["rpm_available"]), stats["tpm_available"]
+
+
+async def no_usage_completion(**kwargs):
+    return {"choices": [{"message": {"role": "assistant", "content": "ok"}}]}
+
+
+def test_rejected_by_a_later_limiter_releases_the_earlier_ones():
+    async def scenario():
+        manager = limited_manager(no_usage_completion)
+        first = await manager.chat_with_tools("p", "m", [{"role": "user", "content": "hi"}])
+        # 供应商级别的额度已用完：模型级别的额度获取成功后被归还
+        second = await manager.chat_with_tools("p", "m", [{"role": "user", "content": "hi"}])
+        return first, second, model_limiter_available(manager)
+
+    first, second, available = asyncio.run(scenario())
+    assert first == {"content": "ok"}
+    assert second["error_type"] == "rate_limit"
+    assert available[0] == 9
+
+
+def test_failed_completion_refunds_the_token_estimate():
+    async def crash(**kwargs):
+        raise RuntimeError("unexpected")
+
+    async def scenario():
+        manager = limited_manager(crash)
+        result = await manager.chat_with_tools("p", "m", [{"role": "user", "content": "hi"}])
+        return result, model_limiter_available(manager)
+
+    result, (rpm_available, tpm_available) = asyncio.run(scenario())
+    assert "error" in result
+    # 请求已发出，请求数额度不退还；没有实际用量，预估的token额度退还
+    assert rpm_available == 9 and tpm_available == 100000
+
+
+def test_cancelled_completion_releases_request_and_tokens():
+    async def scenario():
+        in_flight = asyncio.Event()
+
+        async def slow(**kwargs):
+            in_flight.set()
+            await asyncio.sleep(10)
+
+        manager = limited_manager(slow)
+        task = asyncio.create_task(manager.chat_with_tools("p", "m", [{"role": "user", "content": "hi"}]))
+        await in_flight.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return model_limiter_available(manager)
+
+    assert asyncio.run(scenario()) == (10, 100000)
@@ -0,0 +1,50 @@
+import asyncio
+
+from app.services.mcp_client import Server
+from conftest import wait_for
+
+REPLICA_CONFIG = {"type": "stdio", "command": "fake-mcp-server", "replicas": 2}
+
+
+def instance_calls(fake_transport):
+    """每个实例名收到的工具调用数"""
+    counts = {}
+    for session in fake_transport.sessions:
+        counts[session.server_name] = counts.get(session.server_name, 0) + len(session.calls)
+    return counts
+
+
+def test_concurrent_calls_are_spread_across_replicas(fake_transport):
+    async def scenario():
+        server = Server("demo", dict(REPLICA_CONFIG))
+        await server.initialize()
+        try:
+            await wait_for(lambda: all(replica.health_state == "online" for replica in server.replicas))
+            await asyncio.gather(*(server.execute_tool("echo", {"sleep": 0.05, "n": n}) for n in range(4)))
+            return instance_calls(fake_transport)
+        finally:
+            await server.cleanup()
+
+    # 未完成请求最少的实例优先，两个实例各处理一半
+    assert asyncio.run(scenario()) == {"demo": 2, "demo#1": 2}
+
+
+def test_calls_avoid_a_disconnected_replica(fake_transport, monkeypatch):
+    from app.services import mcp_client
+
+    monkeypatch.setattr(mcp_client, "backoff_delay", lambda attempt, base, cap: 10.0)
+
+    async def scenario():
+        server = Server("demo", dict(REPLICA_CONFIG))
+        await server.initialize()
+        try:
+            await wait_for(lambda: all(replica.health_state == "online" for replica in server.replicas))
+            server.replicas[0].mark_connection_lost("broken pipe")
+            await asyncio.gather(*(server.execute_tool("echo", {"sleep": 0.01, "n": n}) for n in range(3)))
+            return instance_calls(fake_transport), server.replicas[0].health_state
+        finally:
+            await server.cleanup()
+
+    calls, replica_state = asyncio.run(scenario())
+    assert calls == {"demo": 3, "demo#1": 0}
+    assert replica_state == "offline"
@@ -0,0 +1,39 @@
+import asyncio
+
+from mcp import types as mcp_types
+
+from app.services.mcp_client import MCPClientManager
+
+STDIO_CONFIG = {"type": "stdio", "command": "fake-mcp-server"}
+URI = "file:///notes.txt"
+
+
+def test_subscribed_resource_is_cached_until_updated(fake_transport):
+    fake_transport.resources[URI] = "你好"
+    fake_transport.capabilities = mcp_types.ServerCapabilities(
+        resources=mcp_types.ResourcesCapability(subscribe=True)
+    )
+
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", dict(STDIO_CONFIG))
+            first = await manager.read_resource_contents("demo", URI)
+            await manager.read_resource_contents("demo", URI)
+            reads_before_update = fake_transport.resource_reads
+            cached_bytes = manager.get_resource_cache_stats()["bytes"]
+
+            fake_transport.resources[URI] = "updated"
+            server = await manager.get_server("demo")
+            server._resource_updated(URI)
+            second = await manager.read_resource_contents("demo", URI)
+            return first, second, reads_before_update, cached_bytes
+        finally:
+            await manager.disconnect_all()
+
+    first, second, reads_before_update, cached_bytes = asyncio.run(scenario())
+    assert first[0]["text"] == "你好" and second[0]["text"] == "updated"
+    assert reads_before_update == 1
+    assert fake_transport.subscriptions == [URI]
+    # 缓存按UTF-8字节数计算大小，而不是字符数
+    assert cached_bytes == len("你好".encode("utf-8"))
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.services import mcp_client
+from app.services.mcp_client import Server
+from conftest import wait_for
+
+STDIO_CONFIG = {"type": "stdio", "command": "fake-mcp-server"}
+
+
+def test_initialize_connects_and_caches_tools(fake_transport):
+    async def scenario():
+        server = Server("demo", dict(STDIO_CONFIG))
+        await server.initialize()
+        try:
+            state = (server.health_state, server.is_supervised, list(server._tools_by_name))
+        finally:
+            await server.cleanup()
+        return state, server.is_supervised
+
+    state, supervised_after_cleanup = asyncio.run(scenario())
+    assert state == ("online", True, ["echo"])
+    assert not supervised_after_cleanup
+    # 传输连接在监管任务内关闭
+    assert fake_transport.sessions[0].closed
+
+
+def test_first_connect_failure_stops_supervisor(fake_transport):
+    fake_transport.fail_connects = 1
+
+    async def scenario():
+        server = Server("demo", dict(STDIO_CONFIG))
+        with pytest.raises(ConnectionError):
+            await server.initialize()
+        # 留出时间确认没有后台重连
+        await asyncio.sleep(0.05)
+        return server.is_supervised
+
+    assert asyncio.run(scenario()) is False
+    assert fake_transport.connects == 1
+
+
+def test_reconnects_after_connection_lost(fake_transport):
+    async def scenario():
+        server = Server("demo", dict(STDIO_CONFIG))
+        sessions_started = []
+        server.on_session_started = sessions_started.append
+        await server.initialize()
+        first = server.session
+        try:
+            server.mark_connection_lost("broken pipe")
+            # 等待就绪的请求在重连完成后继续
+            await server.wait_until_ready(timeout=2.0)
+            await wait_for(lambda: server.health_state == "online")
+            result = await server.execute_tool("echo", {"n": 1})
+            return first, server.session, server.reconnect_attempts, len(sessions_started), result.text
+        finally:
+            await server.cleanup()
+
+    first, second, reconnects, sessions_started, text = asyncio.run(scenario())
+    assert first is not second and first.closed
+    assert reconnects == 1 and sessions_started == 2
+    assert text == 'demo:echo:{"n": 1}'
+    assert second.calls == [("echo", {"n": 1})]
+
+
+def test_reconnect_backoff_grows_and_resets_after_success(fake_transport, monkeypatch):
+    attempts = []
+
+    def record_backoff(attempt, base, cap):
+        attempts.append(attempt)
+        return 0.001
+
+    monkeypatch.setattr(mcp_client, "backoff_delay", record_backoff)
+
+    async def scenario():
+        server = Server("demo", dict(STDIO_CONFIG))
+        await server.initialize()
+        try:
+            fake_transport.fail_connects = 3
+            server.mark_connection_lost("broken pipe")
+            await wait_for(lambda: fake_transport.connects == 5 and server.health_state == "online")
+            failed_attempts = list(attempts)
+            server.mark_connection_lost("broken pipe")
+            await wait_for(lambda: fake_transport.connects == 6 and server.health_state == "online")
+            return failed_attempts, list(attempts), server.last_error
+        finally:
+            await server.cleanup()
+
+    failed_attempts, all_attempts, last_error = asyncio.run(scenario())
+    # 连续失败时退避次数递增，连接成功后从头开始
+    assert failed_attempts == [0, 1, 2, 3]
+    assert all_attempts == [0, 1, 2, 3, 0]
+    assert last_error is None
+
+
+def test_cleanup_during_backoff_stops_reconnecting(fake_transport, monkeypatch):
+    monkeypatch.setattr(mcp_client, "backoff_delay", lambda attempt, base, cap: 10.0)
+
+    async def scenario():
+        server = Server("demo", dict(STDIO_CONFIG))
+        await server.initialize()
+        server.mark_connection_lost("broken pipe")
+        await wait_for(lambda: server.session is None)
+        # 停止信号打断退避等待，不必等到退避结束
+        await asyncio.wait_for(server.cleanup(), 1.0)
+        return server.is_supervised
+
+    assert asyncio.run(scenario()) is False
+    assert fake_transport.connects == 1
@@ -0,0 +1,77 @@
+import asyncio
+
+from app.services import mcp_client
+from app.services.mcp_client import Server
+from conftest import wait_for
+
+STANDBY_CONFIG = {"type": "stdio", "command": "fake-mcp-server", "warm_standby": True}
+
+
+def standby_ready(server):
+    return server.standby is not None and server.standby.health_state == "online"
+
+
+def test_standby_takes_over_when_primary_disconnects(fake_transport, monkeypatch):
+    delays = {"value": 10.0}
+    monkeypatch.setattr(mcp_client, "backoff_delay", lambda attempt, base, cap: delays["value"])
+
+    async def scenario():
+        server = Server("demo", dict(STANDBY_CONFIG))
+        await server.initialize()
+        try:
+            await wait_for(lambda: standby_ready(server))
+            standby = server.standby
+            server.mark_connection_lost("broken pipe")
+            await wait_for(lambda: server.failovers == 1)
+            promoted = ([replica.name for replica in server.replicas], server.pick_replica() is standby)
+            result = await server.execute_tool("echo", {})
+            # 新的热备进程在后台补充
+            await wait_for(lambda: standby_ready(server) and server.standby is not standby)
+            return promoted, result.text
+        finally:
+            await server.cleanup()
+
+    promoted, text = asyncio.run(scenario())
+    assert promoted == (["demo~promoted"], True)
+    # 调用由提升的实例处理，不等待主实例重连
+    assert text == "demo~standby:echo:{}"
+
+
+def test_promoted_instance_is_released_when_primary_recovers(fake_transport, monkeypatch):
+    monkeypatch.setattr(mcp_client, "backoff_delay", lambda attempt, base, cap: 0.1)
+
+    async def scenario():
+        server = Server("demo", dict(STANDBY_CONFIG))
+        await server.initialize()
+        try:
+            await wait_for(lambda: standby_ready(server))
+            server.mark_connection_lost("broken pipe")
+            await wait_for(lambda: server.failovers == 1)
+            await wait_for(lambda: server.health_state == "online" and not server._promoted)
+            await wait_for(lambda: standby_ready(server))
+            return list(server.replicas), server.standby.name, server.get_load_stats()["failovers"]
+        finally:
+            await server.cleanup()
+
+    replicas, standby_name, failovers = asyncio.run(scenario())
+    assert replicas == [] and standby_name == "demo~standby" and failovers == 1
+
+
+def test_standby_replaces_a_disconnected_replica(fake_transport, monkeypatch):
+    monkeypatch.setattr(mcp_client, "backoff_delay", lambda attempt, base, cap: 10.0)
+
+    async def scenario():
+        server = Server("demo", dict(STANDBY_CONFIG, replicas=2))
+        await server.initialize()
+        try:
+            await wait_for(lambda: standby_ready(server) and server.replicas[0].health_state == "online")
+            lost, standby = server.replicas[0], server.standby
+            lost.mark_connection_lost("broken pipe")
+            await wait_for(lambda: server.failovers == 1)
+            # 断开的副本被回收，不再在后台重连
+            await wait_for(lambda: not lost.is_supervised)
+            return server.replicas == [standby], standby.name
+        finally:
+            await server.cleanup()
+
+    assert asyncio.run(scenario()) == (True, "demo#1")
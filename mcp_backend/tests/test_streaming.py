@@ -0,0 +1,57 @@
+import base64
+
+import pytest
+
+from app.utils.streaming import decode_base64_to_spool, iter_file_range, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("items=0-1", None),
+    ("bytes=0-1,4-5", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-1000", (0, 99)),
+    ("bytes=90-1000", (90, 99)),
+    ("BYTES=5-5", (5, 5)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=100-",
+    "bytes=50-10",
+    "bytes=-0",
+    "bytes=abc",
+    "bytes=a-b",
+    "bytes=-",
+])
+def test_parse_range_unsatisfiable_or_invalid(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+def test_parse_range_empty_content():
+    with pytest.raises(ValueError):
+        parse_range("bytes=0-", 0)
+
+
+def test_decode_base64_in_chunks_and_read_range():
+    payload = bytes(range(256)) * 10
+    encoded = base64.b64encode(payload).decode()
+    # 插入换行，块大小不是4的倍数
+    encoded = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+    spool = decode_base64_to_spool(encoded, max_memory=100, chunk_size=7)
+    assert b"".join(iter_file_range(spool, 0, len(payload) - 1, chunk_size=33)) == payload
+    assert spool.closed
+
+    spool = decode_base64_to_spool(encoded, max_memory=100, chunk_size=7)
+    assert b"".join(iter_file_range(spool, 10, 19)) == payload[10:20]
+
+
+def test_decode_invalid_base64():
+    with pytest.raises(ValueError):
+        decode_base64_to_spool("not base64!!", max_memory=100)
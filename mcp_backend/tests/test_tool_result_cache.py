@@ -0,0 +1,31 @@
+import asyncio
+
+from app.services.mcp_client import MCPClientManager
+from conftest import wait_for
+
+CACHED_CONFIG = {"type": "stdio", "command": "fake-mcp-server", "tool_cache": {"echo": 60}}
+
+
+def test_cached_tool_result_is_reused_until_a_new_session(fake_transport):
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            await manager.add_server("demo", dict(CACHED_CONFIG))
+            server = await manager.get_server("demo")
+            first = await manager.execute_tool("demo", "echo", {"q": 1})
+            second = await manager.execute_tool("demo", "echo", {"q": 1})
+            await manager.execute_tool("demo", "echo", {"q": 2})
+            calls_before_reconnect = len(fake_transport.sessions[0].calls)
+
+            # 新进程不继承旧进程的状态，缓存结果在重连后失效
+            server.mark_connection_lost("broken pipe")
+            await wait_for(lambda: len(fake_transport.sessions) == 2 and server.health_state == "online")
+            await manager.execute_tool("demo", "echo", {"q": 1})
+            return first is second, calls_before_reconnect, fake_transport.sessions[1].calls
+        finally:
+            await manager.disconnect_all()
+
+    shared, calls_before_reconnect, calls_after_reconnect = asyncio.run(scenario())
+    assert shared
+    assert calls_before_reconnect == 2
+    assert calls_after_reconnect == [("echo", {"q": 1})]
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.services.mcp_client import MCPClientManager
+
+STDIO_CONFIG = {"type": "stdio", "command": "fake-mcp-server"}
+
+
+def run_with_servers(fake_transport, server_tools, check):
+    """连接若干模拟服务器后执行检查，结束时断开全部服务器"""
+    fake_transport.server_tools.update(server_tools)
+
+    async def scenario():
+        manager = MCPClientManager()
+        try:
+            for name in server_tools:
+                await manager.add_server(name, dict(STDIO_CONFIG))
+            return await check(manager)
+        finally:
+            await manager.disconnect_all()
+
+    return asyncio.run(scenario())
+
+
+def test_resolve_tool_by_unique_name_namespace_and_preference(fake_transport):
+    async def check(manager):
+        return (
+            manager.resolve_tool("search"),
+            manager.resolve_tool("b/echo"),
+            manager.resolve_tool("echo", preferred_server="a"),
+        )
+
+    result = run_with_servers(fake_transport, {"a": ["echo", "search"], "b": ["echo", "fetch"]}, check)
+    assert result == (("a", "search"), ("b", "echo"), ("a", "echo"))
+
+
+def test_resolve_tool_rejects_ambiguous_and_unknown_names(fake_transport):
+    async def check(manager):
+        with pytest.raises(ValueError, match="多个服务器"):
+            manager.resolve_tool("echo")
+        with pytest.raises(ValueError, match="找不到"):
+            manager.resolve_tool("missing")
+        with pytest.raises(ValueError, match="找不到"):
+            manager.resolve_tool("a/fetch")
+
+    run_with_servers(fake_transport, {"a": ["echo"], "b": ["echo", "fetch"]}, check)
+
+
+def test_routes_follow_catalog_changes_and_disconnects(fake_transport):
+    async def check(manager):
+        server = await manager.get_server("b")
+        server._set_tools([{"name": "echo", "description": None, "input_schema": {}}])
+        with pytest.raises(ValueError):
+            manager.resolve_tool("fetch")
+        await manager.disconnect_from_server("a")
+        return manager.resolve_tool("echo")
+
+    assert run_with_servers(fake_transport, {"a": ["echo"], "b": ["echo", "fetch"]}, check) == ("b", "echo")
@@ -35,7 +35,7 @@ export class JSONRPCClient {
 
   private endpoint: string;
 
-  public async request<T = any>(method: string, params?: any): Promise<T> {
+  public async request<T = any>(method: string, params?: any, options?: { timeout?: number }): Promise<T> {
     // 对参数进行深拷贝以去除循环引用
     const safeParams = params ? JSON.parse(JSON.stringify(params)) : undefined;
     
@@ -47,7 +47,7 @@ export class JSONRPCClient {
     };
 
     try {
-      const response = await this.axios.post(this.endpoint, request);
+      const response = await this.axios.post(this.endpoint, request, options);
 
       if (response.data.error) {
         throw new Error(`JSONRPC Error [${response.data.error.code}]: ${response.data.error.message}`);
@@ -92,12 +92,60 @@ export class JSONRPCClient {
     return this.request('mcp.list_tools', { server_id: serverId });
   }
 
-  public async callTool(serverId: string, toolName: string, arguments_: any) {
-    return this.request('mcp.call_tool', { 
+  public async callTool(serverId: string, toolName: string, arguments_: any, progressToken?: string) {
+    const params: any = { 
       server_id: serverId, 
       tool_name: toolName, 
       arguments: arguments_ 
+    };
+    if (progressToken) {
+      params.progress_token = progressToken;
+    }
+    // 长时间运行的工具由后端按工具时限控制，请求本身不设超时
+    return this.request('mcp.call_tool', params, progressToken ? { timeout: 0 } : undefined);
+  }
+
+  public async cancelToolCall(progressToken: string) {
+    return this.request('mcp.cancel_tool_call', { progress_token: progressToken });
+  }
+
+  // 订阅工具调用进度（SSE），返回关闭订阅的函数
+  public subscribeToolProgress(progressToken: string, onEvent: (event: any) => void): () => void {
+    const source = new EventSource(`/api/v1/tools/progress/${encodeURIComponent(progressToken)}`);
+    const finalTypes = ['completed', 'failed', 'timeout', 'cancelled'];
+    for (const type of ['progress', ...finalTypes]) {
+      source.addEventListener(type, (message: MessageEvent) => {
+        onEvent(JSON.parse(message.data));
+        if (finalTypes.includes(type)) {
+          source.close();
+        }
+      });
+    }
+    return () => source.close();
+  }
+
+  // 订阅对话的流式输出（SSE），需要在调用chatWithTools之前订阅
+  // 返回关闭订阅的函数，以及连接建立（或超过1秒）后完成的opened
+  public subscribeChatStream(
+    streamToken: string,
+    onEvent: (event: any) => void
+  ): { close: () => void; opened: Promise<void> } {
+    const source = new EventSource(`/api/v1/chat/stream/${encodeURIComponent(streamToken)}`);
+    const opened = new Promise<void>((resolve) => {
+      source.addEventListener('open', () => resolve(), { once: true });
+      source.addEventListener('error', () => resolve(), { once: true });
+      setTimeout(resolve, 1000);
     });
+    const finalTypes = ['completed', 'failed'];
+    for (const type of ['content', 'tool_call', 'tool', ...finalTypes]) {
+      source.addEventListener(type, (message: MessageEvent) => {
+        onEvent(JSON.parse(message.data));
+        if (finalTypes.includes(type)) {
+          source.close();
+        }
+      });
+    }
+    return { close: () => source.close(), opened };
   }
 
   public async listResources(serverId: string) {
@@ -216,7 +264,8 @@ export class JSONRPCClient {
     message: string, 
     provider: string,
     model: string,
-    serverId?: string
+    serverId?: string,
+    streamToken?: string
   ): Promise<any> {
     console.log('chatWithTools参数:');
     console.log(`- sessionId: '${sessionId}'`);
@@ -242,9 +291,14 @@ export class JSONRPCClient {
       console.warn('警告: serverId参数无效:', serverId);
     }
     
+    // 流式输出通过 subscribeChatStream 接收，请求本身不设超时
+    if (streamToken) {
+      params.stream_token = streamToken;
+    }
+    
     console.log('chatWithTools最终参数:', params);
     // 使用正确的方法名称：chat.with_tools
-    return this.request('chat.with_tools', params);
+    return this.request('chat.with_tools', params, streamToken ? { timeout: 0 } : undefined);
   }
 
   // 添加生成会话标题的方法
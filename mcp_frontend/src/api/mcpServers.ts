@@ -3,7 +3,7 @@ import jsonrpc from './jsonrpc';
 export interface MCPServer {
   id: string;
   name: string;
-  type: 'stdio' | 'sse';
+  type: 'stdio' | 'sse' | 'streamable_http';
   command?: string;
   args?: string[];
   url?: string;
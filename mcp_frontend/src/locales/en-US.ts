@@ -42,10 +42,12 @@ export default {
     connected: 'Connected',
     disconnected: 'Disconnected',
     connecting: 'Connecting',
+    hibernated: 'Hibernated',
     errorConnecting: 'Connection Error',
     stdioServer: 'Standard I/O Server',
     httpServer: 'HTTP Server',
     sseServer: 'SSE Server',
+    streamableHttpServer: 'Streamable HTTP Server',
     command: 'Command',
     arguments: 'Arguments',
     environmentVariables: 'Environment Variables',
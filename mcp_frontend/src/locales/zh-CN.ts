@@ -42,10 +42,12 @@ export default {
     connected: '已连接',
     disconnected: '未连接',
     connecting: '连接中',
+    hibernated: '休眠',
     errorConnecting: '连接错误',
     stdioServer: '标准输入输出服务器',
     httpServer: 'HTTP 服务器',
     sseServer: 'SSE 服务器',
+    streamableHttpServer: 'Streamable HTTP 服务器',
     command: '命令',
     arguments: '参数',
     environmentVariables: '环境变量',
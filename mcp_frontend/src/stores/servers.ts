@@ -17,7 +17,7 @@ export interface MCPServer {
   args?: string[];
   env?: Record<string, string>;
   url?: string;
-  status?: 'online' | 'offline' | 'error' | 'connecting';
+  status?: 'online' | 'offline' | 'error' | 'connecting' | 'hibernated';
   error?: string;
   tools?: ServerTool[];
   resources_count?: number;
@@ -576,6 +576,7 @@ export const useSessionStore = defineStore('sessions', () => {
     
     const sessionId = currentSession.value.id;
     const messageId = generateMessageId();
+    let closeStream: (() => void) | null = null;
     sending.value = true;
     isLoadingResponse.value = true;
     responseError.value = null;
@@ -604,6 +605,31 @@ export const useSessionStore = defineStore('sessions', () => {
         }
       }, 100);
       
+      // 订阅流式输出：LLM的文本在生成时逐段显示，完成后以刷新的消息列表为准
+      const streamToken = `${sessionId}-${messageId}`;
+      const streamingMessage: Message = {
+        id: `${messageId}_stream`,
+        role: 'assistant',
+        content: '',
+        timestamp: Date.now()
+      };
+      messages.value.push(streamingMessage);
+      const streamingIndex = messages.value.length - 1;
+      const stream = jsonrpc.subscribeChatStream(streamToken, (event) => {
+        const target = messages.value[streamingIndex];
+        if (!target || target.id !== streamingMessage.id) {
+          return;
+        }
+        if (event.type === 'content') {
+          target.content += event.delta;
+        } else if (event.type === 'tool') {
+          // 工具执行完成后的总结会继续追加在后面
+          target.content += `${target.content ? '\n\n' : ''}[${event.tool}] ...\n\n`;
+        }
+      });
+      closeStream = stream.close;
+      await stream.opened;
+      
       // 使用MCP工具进行对话
       let response;
       
@@ -647,7 +673,9 @@ export const useSessionStore = defineStore('sessions', () => {
             sessionIdStr,    // 会话ID
             contentStr,      // 用户消息内容
             llmProviderStr,  // LLM提供商
-            llmModelStr      // 模型参数
+            llmModelStr,     // 模型参数
+            undefined,       // 不使用MCP服务器
+            streamToken      // 流式输出令牌
           );
         } else {
           console.log(`发送消息使用MCP服务器: ${mcpServerIdStr}`);
@@ -656,7 +684,8 @@ export const useSessionStore = defineStore('sessions', () => {
             contentStr,      // 用户消息内容
             llmProviderStr,  // LLM提供商
             llmModelStr,     // 模型参数
-            mcpServerIdStr   // 服务器ID参数
+            mcpServerIdStr,  // 服务器ID参数
+            streamToken      // 流式输出令牌
           );
         }
       } else {
@@ -665,7 +694,9 @@ export const useSessionStore = defineStore('sessions', () => {
           sessionIdStr,    // 会话ID
           contentStr,      // 用户消息内容
           llmProviderStr,  // LLM提供商
-          llmModelStr      // 模型参数
+          llmModelStr,     // 模型参数
+          undefined,       // 不使用MCP服务器
+          streamToken      // 流式输出令牌
         );
       }
       
@@ -686,6 +717,9 @@ export const useSessionStore = defineStore('sessions', () => {
       
       throw e;
     } finally {
+      if (closeStream) {
+        closeStream();
+      }
       sending.value = false;
       isLoadingResponse.value = false;
     }
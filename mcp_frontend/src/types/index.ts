@@ -2,7 +2,7 @@
 export interface MCPServer {
   id: string;
   name: string;
-  type: string; // "stdio" | "sse"
+  type: string; // "stdio" | "sse" | "streamable_http"
   command?: string;
   args?: string[];
   url?: string;